@@ -1,5 +1,5 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_file
-from data_loader import loader
+from data_loader import get_loader
 from datetime import datetime
 import pandas as pd
 from pandas import DataFrame
@@ -13,21 +13,28 @@ import hashlib
 import secrets
 from functools import wraps
 import io
+import re
 import zipfile
+import numpy as np
 from typing import Optional, Dict, Any, List
+from result_cache import ResultCache, file_version
+from score_kernels import import_speed_scores, comprehensive_scores
 
 # 配置日志 - 支持文件输出
 def setup_logging():
     """设置日志配置"""
     log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    # 日志目录可通过TSBS_LOG_DIR指定（测试中指向临时目录，不写入工作目录）
+    log_dir = os.environ.get('TSBS_LOG_DIR') or 'logs'
+    os.makedirs(log_dir, exist_ok=True)
     
     # 创建文件处理器
-    file_handler = logging.FileHandler('logs/app.log', encoding='utf-8')
+    file_handler = logging.FileHandler(os.path.join(log_dir, 'app.log'), encoding='utf-8')
     file_handler.setFormatter(log_formatter)
     file_handler.setLevel(logging.INFO)
     
     # 创建错误文件处理器
-    error_handler = logging.FileHandler('logs/app_error.log', encoding='utf-8')
+    error_handler = logging.FileHandler(os.path.join(log_dir, 'app_error.log'), encoding='utf-8')
     error_handler.setFormatter(log_formatter)
     error_handler.setLevel(logging.ERROR)
     
@@ -80,8 +87,28 @@ MASTER_CONFIG_FILE = 'config/master_config.json'
 MASTER_SECONDARY_CONFIG_FILE = 'config/master_secondary_config.json'  # Master第二基准值配置文件
 ENTERPRISE_CONFIG_FILE = 'config/enterprise_config.json'  # 企业发版基准值配置文件
 OPENSOURCE_CONFIG_FILE = 'config/opensource_config.json'  # 开源发版基准值配置文件
+BASELINE_CONFIG_FILES = {
+    'master': MASTER_CONFIG_FILE,
+    'master_secondary': MASTER_SECONDARY_CONFIG_FILE,
+    'enterprise': ENTERPRISE_CONFIG_FILE,
+    'opensource': OPENSOURCE_CONFIG_FILE
+}
 PID_FILE = 'logs/app.pid'
 
+# /data响应的结果缓存：键包含筛选条件、数据版本和所用基准值配置的版本，新run或基准值修改后旧条目不再命中
+result_cache = ResultCache(max_entries=int(os.environ.get('TSBS_RESULT_CACHE_SIZE') or 32))
+# 进程内保存基准值配置的次数（文件修改时间精度较低时，连续两次保存也能区分版本）
+_baseline_saves: Dict[str, int] = {}
+
+def bump_baseline_version(config_file):
+    """基准值配置保存后递增其版本"""
+    _baseline_saves[config_file] = _baseline_saves.get(config_file, 0) + 1
+
+def baseline_version(baseline_type):
+    """所用基准值配置的版本：进程内保存次数 + 文件的修改时间/大小（也能发现在进程外编辑的配置文件）"""
+    config_file = BASELINE_CONFIG_FILES.get(baseline_type, MASTER_CONFIG_FILE)
+    return config_file, _baseline_saves.get(config_file, 0), file_version(config_file)
+
 def write_pid_file():
     """写入PID文件"""
     try:
@@ -155,7 +182,7 @@ def index():
         if not session.get('user_id'):
             return redirect(url_for('login'))
             
-        options = loader.get_options()
+        options = get_loader().get_options()
         return render_template('index.html', 
                                branches=options['branches'],
                                query_types=options['query_types'],
@@ -218,6 +245,43 @@ def check_auth():
     else:
         return jsonify({'authenticated': False})
 
+@app.route('/api/load-progress', methods=['GET'])
+def load_progress():
+    """数据加载进度和就绪检查（无需登录，便于部署脚本探测）；加载完成前返回503"""
+    try:
+        progress = get_loader().get_load_progress()
+        return jsonify(progress), (200 if progress['ready'] else 503)
+    except Exception as e:
+        logging.error(f"Error in load progress route: {str(e)}")
+        return jsonify({'ready': False, 'error': str(e)}), 500
+
+@app.route('/api/watch-status', methods=['GET'])
+def watch_status():
+    """文件监控状态：监控方式、当前watch数和等待结果的run数（无需登录，便于运维检查inotify占用）"""
+    try:
+        return jsonify(get_loader().get_watch_info())
+    except Exception as e:
+        logging.error(f"Error in watch status route: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/ingest-report', methods=['GET'])
+def ingest_report():
+    """各结果根目录的加载吞吐（目录数、行数、耗时、队列事件），便于发现较慢的挂载点"""
+    try:
+        return jsonify(get_loader().get_ingest_report())
+    except Exception as e:
+        logging.error(f"Error in ingest report route: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/result-cache', methods=['GET'])
+def result_cache_status():
+    """/data结果缓存的命中/未命中计数和占用"""
+    try:
+        return jsonify(result_cache.get_info())
+    except Exception as e:
+        logging.error(f"Error in result cache route: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/data', methods=['POST'])
 @login_required
 def get_data():
@@ -225,71 +289,28 @@ def get_data():
     try:
         filters = request.json or {}
         
-        # 获取当前数据集
-        df = loader.get_data()
+        # 命中结果缓存时直接返回序列化好的响应
+        # 同一请求中的筛选和分组统计都基于同一个数据快照
+        loader = get_loader()
+        snapshot = loader.get_snapshot()
+        cache_key = result_cache.make_key(filters, snapshot.version, baseline_version(filters.get('baseline_type', 'master')))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return app.response_class(cached, mimetype='application/json')
         
-        if df.empty:
-            return jsonify({
+        # 获取筛选后的数据集：目录级条件先在runs表上计算，再关联查询结果
+        filtered = loader.get_filtered_data(filters, snapshot)
+        
+        if filtered.empty:
+            response = jsonify({
                 'table_data': [],
                 'chart_data': {}
             })
+            result_cache.put(cache_key, response.get_data())
+            return response
         
-        # 应用筛选条件
-        filtered = df.copy()
-        
-        # 标准化列名
-        if 'query_type' not in filtered.columns and 'query type' in filtered.columns:
-            filtered.rename(columns={'query type': 'query_type'}, inplace=True)
-        
-        # 应用筛选
-        if filters.get('branches'):
-            filtered = filtered[filtered['branch'].astype(str).isin(filters['branches'])]
-        
-        if filters.get('start_date'):
-            try:
-                start_date = datetime.strptime(filters['start_date'], '%Y-%m-%d')
-                filtered = filtered[filtered['datetime'] >= start_date]
-            except:
-                pass
-        
-        if filters.get('end_date'):
-            try:
-                end_date = datetime.strptime(filters['end_date'], '%Y-%m-%d')
-                next_day = end_date + pd.Timedelta(days=1)
-                filtered = filtered[filtered['datetime'] <= next_day]
-            except:
-                pass
-        
-        if filters.get('scales'):
-            try:
-                scales = [int(s) for s in filters['scales']]
-                filtered = filtered[filtered['scale'].isin(scales)]  # type: ignore
-            except:
-                pass
-            
-        if filters.get('clusters'):
-            try:
-                clusters = [int(c) for c in filters['clusters']]
-                filtered = filtered[filtered['cluster'].isin(clusters)]  # type: ignore
-            except:
-                pass
-            
-        if filters.get('query_types'):
-            if 'query_type' in filtered.columns:  # type: ignore
-                filtered = filtered[filtered['query_type'].isin(filters['query_types'])]  # type: ignore
-            
-        if filters.get('workers'):
-            try:
-                workers = [int(w) for w in filters['workers']]
-                filtered = filtered[filtered['worker'].isin(workers)]  # type: ignore
-            except:
-                pass
-        if filters.get('execution_types'):
-            if 'phase' in filtered.columns:  # type: ignore
-                filtered = filtered[filtered['phase'].astype(str).isin(filters['execution_types'])]  # type: ignore
-        
-        # 转换时间为北京时间用于表格显示
-        table_data = filtered.copy()
+        # 转换时间为北京时间用于表格显示（浅拷贝：写时复制只复制被修改的列）
+        table_data = filtered.copy(deep=False)
         if 'datetime' in table_data.columns:  # type: ignore
             table_data['datetime'] = table_data['datetime'].apply(format_datetime_for_display)  # type: ignore
         
@@ -310,27 +331,40 @@ def get_data():
         
         # 对筛选后的数据进行分组统计和评分计算
         if baselines and len(filtered) > 0:
-            # 按照分组维度进行统计
-            grouped_stats = calculate_grouped_statistics(filtered)
+            # 按照分组维度进行统计：合并加载时维护的(分组, 日期)聚合桶，不再扫描筛选后的原始行
+            grouped_stats = calculate_grouped_statistics(filtered, loader.get_group_statistics(filters, snapshot))
             
             # 计算评分并添加到原始数据中
             table_data = add_scoring_to_table_data(table_data, grouped_stats, baselines)
         
         # 返回数据
-        return jsonify({
+        response = jsonify({
             'table_data': table_data.replace({pd.NaT: None}).to_dict(orient='records'),  # type: ignore
             'chart_data': prepare_chart_data(filtered, filters.get('metric', 'mean_ms'))
         })
+        result_cache.put(cache_key, response.get_data())
+        return response
     except Exception as e:
         logging.error(f"Error in data route: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-def calculate_grouped_statistics(df):
+def sort_categorical_columns(df, columns):
+    """将分类列的类别按值排序（去除未使用的类别），使分组和排序结果与普通字符串列一致"""
+    updates = {}
+    for col in columns:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            column = df[col].cat.remove_unused_categories()
+            updates[col] = column.cat.reorder_categories(sorted(column.cat.categories))
+    return df.assign(**updates) if updates else df
+
+def calculate_grouped_statistics(df, group_aggregates=None):
     """
     对筛选后的数据进行分组统计
     
     Args:
         df: 筛选后的数据DataFrame
+        group_aggregates: 与df相同筛选条件下由分组聚合桶合并得到的各分组统计量（loader.get_group_statistics），
+            提供时不再对df的原始行分组聚合
         
     Returns:
         dict: 分组统计结果
@@ -352,15 +386,19 @@ def calculate_grouped_statistics(df):
     if not available_columns:
         return {}
     
-    grouped_stats = {}
-    
     try:
-        # 按分组维度分组
-        for group_key, group_df in df.groupby(available_columns):
-            # 构建分组键
+        # 分组列可能是分类类型：按值排序类别，保证分组顺序与普通字符串列一致；只统计实际出现的组合
+        if group_aggregates is not None and available_columns != group_columns:
+            group_aggregates = None
+        if group_aggregates is None:
+            df = sort_categorical_columns(df, available_columns)
+        stats = aggregate_group_statistics(df, available_columns, group_aggregates)
+        
+        grouped_stats = {}
+        # 按分组顺序写入：同一统计键下的重复指标（不同分支、名称相同的查询类型）以排在最后的分组为准
+        for group_key, row in zip(stats.index, stats.itertuples(index=False)):
             if len(available_columns) == 1:
                 group_key = [group_key]
-            
             group_dict = dict(zip(available_columns, group_key))
             
             # 构建统计键（与基准值配置键格式一致）
@@ -370,21 +408,13 @@ def calculate_grouped_statistics(df):
             if stats_key not in grouped_stats:
                 grouped_stats[stats_key] = {}
             
-            # 计算查询性能统计指标
-            if query_type and len(group_df) > 0:
-                query_stats = calculate_improved_aggregation(group_df)
-                
-                if query_stats:
-                    # 将查询类型名称转换为metric key格式
-                    import re
-                    metric_key = re.sub(r'[^a-zA-Z0-9_-]', '-', str(query_type)).lower().replace('_', '-')
-                    grouped_stats[stats_key][metric_key] = query_stats
+            # 查询性能统计指标（组内没有有效均值时为None）
+            if query_type and row.query_stats is not None:
+                grouped_stats[stats_key][metric_key_for(query_type)] = row.query_stats
             
-            # 计算导入速度统计指标
-            if 'import_speed' in group_df.columns:
-                import_speeds = group_df['import_speed'].dropna()
-                if len(import_speeds) > 0:
-                    grouped_stats[stats_key]['import_speed'] = float(import_speeds.mean())
+            # 导入速度统计指标
+            if 'import_speed' in df.columns and not pd.isna(row.import_speed):
+                grouped_stats[stats_key]['import_speed'] = float(row.import_speed)
         
         logging.info(f"Calculated grouped statistics for {len(grouped_stats)} groups")
         return grouped_stats
@@ -393,6 +423,89 @@ def calculate_grouped_statistics(df):
         logging.error(f"Error calculating grouped statistics: {str(e)}")
         return {}
 
+# 查询类型名称 -> metric key（查询类型只有几十种，缓存转换结果）
+_metric_keys: Dict[str, str] = {}
+
+def metric_key_for(query_type):
+    """将查询类型名称转换为metric key格式"""
+    query_type = str(query_type)
+    metric_key = _metric_keys.get(query_type)
+    if metric_key is None:
+        metric_key = re.sub(r'[^a-zA-Z0-9_-]', '-', query_type).lower().replace('_', '-')
+        _metric_keys[query_type] = metric_key
+    return metric_key
+
+def aggregate_group_statistics(df, group_columns, merged=None):
+    """
+    一次groupby聚合计算所有分组的统计指标，与逐组调用calculate_improved_aggregation的结果一致
+    
+    Args:
+        merged: 已合并的各分组统计量（按分组排序，列名与下面的聚合结果相同），提供时直接使用，不再聚合df
+        
+    Returns:
+        DataFrame: 按分组排序，每组一行；query_stats列为该组的统计指标字典（没有有效均值时为None），
+        import_speed列为导入速度均值
+    """
+    # 指标列以float32存储，统一按float64聚合（与逐组计算的差异在float32精度以内）
+    metric_columns = [col for col in ('mean_ms', 'med_ms', 'min_ms', 'max_ms', 'import_speed') if col in df.columns]
+    has_mean = 'mean_ms' in df.columns
+    has_min_max = 'min_ms' in df.columns and 'max_ms' in df.columns
+    
+    aggregations = {}
+    if has_mean:
+        aggregations.update(mean_ms=('mean_ms', 'mean'), mean_count=('mean_ms', 'count'),
+                            mean_std=('mean_ms', 'std'), mean_max=('mean_ms', 'max'), mean_min=('mean_ms', 'min'))
+        if 'med_ms' in df.columns:
+            aggregations['med_ms'] = ('med_ms', 'median')
+        if has_min_max:
+            aggregations.update(min_ms=('min_ms', 'min'), max_ms=('max_ms', 'max'))
+    if 'import_speed' in df.columns:
+        aggregations['import_speed'] = ('import_speed', 'mean')
+    if merged is not None:
+        agg = merged[list(aggregations)]
+    else:
+        df = df[group_columns + metric_columns].astype({col: np.float64 for col in metric_columns})
+        grouped = df.groupby(group_columns, observed=True, sort=True)
+        agg = grouped.agg(**aggregations) if aggregations else pd.DataFrame(index=grouped.size().index)
+    
+    result = pd.DataFrame(index=agg.index)
+    result['import_speed'] = agg['import_speed'] if 'import_speed' in agg.columns else np.nan
+    if not has_mean:
+        result['query_stats'] = None
+        return result
+    
+    count = agg['mean_count']
+    # 中位数的中位数；组内没有中位数数据时使用均值
+    med = agg['med_ms'].fillna(agg['mean_ms']) if 'med_ms' in agg.columns else agg['mean_ms']
+    # 极差：有min/max时使用所有测试的真实最小值和最大值，否则使用均值的极差（只有一个均值时为0）
+    mean_range = (agg['mean_max'] - agg['mean_min']).where(count > 1, 0.0)
+    if has_min_max:
+        has_bounds = agg['min_ms'].notna() & agg['max_ms'].notna()
+        bounds_range = agg['max_ms'] - agg['min_ms']
+        range_ms = bounds_range.where(has_bounds, mean_range)
+        # 标准差：多个均值时取均值的标准差，只有一个均值时按range/4估算
+        std = agg['mean_std'].where(count > 1, (bounds_range / 4.0).where(has_bounds, 0.0))
+    else:
+        has_bounds = pd.Series(False, index=agg.index)
+        range_ms = mean_range
+        std = agg['mean_std'].where(count > 1, 0.0)
+    
+    columns = [agg['mean_ms'], med, std, range_ms]
+    if has_min_max:
+        columns += [agg['min_ms'], agg['max_ms']]
+    query_stats = []
+    for valid, bounded, values in zip((count > 0).tolist(), has_bounds.tolist(), zip(*[c.tolist() for c in columns])):
+        if not valid:
+            query_stats.append(None)
+            continue
+        stats = {'mean_ms': values[0], 'med_ms': values[1], 'std_ms': values[2], 'range_ms': values[3]}
+        if bounded:
+            stats['min_ms'] = values[4]
+            stats['max_ms'] = values[5]
+        query_stats.append(stats)
+    result['query_stats'] = query_stats
+    return result
+
 def calculate_improved_aggregation(group_df):
     """
     改进的聚合计算方法 - 从原始数据的均值、最大值、最小值、中位数计算标准差
@@ -438,7 +551,7 @@ def calculate_improved_aggregation(group_df):
     if len(mean_values) > 1:
         # 方法1：如果有多个测试数据，计算均值的标准差
         query_stats['std_ms'] = float(mean_values.std())
-        logging.info(f"从多个均值计算标准差：mean_count={len(mean_values)}, std_ms={query_stats['std_ms']:.4f}")
+        logging.debug(f"从多个均值计算标准差：mean_count={len(mean_values)}, std_ms={query_stats['std_ms']:.4f}")
     elif len(mean_values) == 1 and has_min_max:
         # 方法2：如果只有一个均值但有最大值最小值，从range估算标准差
         min_vals = group_df['min_ms'].dropna()
@@ -447,14 +560,14 @@ def calculate_improved_aggregation(group_df):
             # 使用经验公式：标准差 ≈ range/4 (基于正态分布的近似)
             range_val = max_vals.max() - min_vals.min()
             query_stats['std_ms'] = float(range_val / 4.0)
-            logging.info(f"从单个测试的min-max估算标准差：range={range_val:.4f}, std_ms={query_stats['std_ms']:.4f}")
+            logging.debug(f"从单个测试的min-max估算标准差：range={range_val:.4f}, std_ms={query_stats['std_ms']:.4f}")
         else:
             query_stats['std_ms'] = 0.0
-            logging.warning(f"单个测试且无min/max数据，标准差设置为0")
+            logging.debug(f"单个测试且无min/max数据，标准差设置为0")
     else:
         # 方法3：如果只有一个均值且无min/max，标准差设为0
         query_stats['std_ms'] = 0.0
-        logging.warning(f"无法计算标准差（只有一个数据点且无min/max），设置为0：mean_values_count={len(mean_values)}")
+        logging.debug(f"无法计算标准差（只有一个数据点且无min/max），设置为0：mean_values_count={len(mean_values)}")
     
     # 4. 计算聚合极差（最准确的方法）
     if has_min_max:
@@ -465,15 +578,15 @@ def calculate_improved_aggregation(group_df):
             query_stats['range_ms'] = float(max_values.max() - min_values.min())
             query_stats['min_ms'] = float(min_values.min())
             query_stats['max_ms'] = float(max_values.max())
-            logging.info(f"从min/max计算极差：min={query_stats['min_ms']:.4f}, max={query_stats['max_ms']:.4f}, range={query_stats['range_ms']:.4f}")
+            logging.debug(f"从min/max计算极差：min={query_stats['min_ms']:.4f}, max={query_stats['max_ms']:.4f}, range={query_stats['range_ms']:.4f}")
         else:
             # 如果没有min/max数据，使用均值的极差作为下限估计
             query_stats['range_ms'] = float(mean_values.max() - mean_values.min()) if len(mean_values) > 1 else 0.0
-            logging.info(f"从均值计算极差：range={query_stats['range_ms']:.4f}")
+            logging.debug(f"从均值计算极差：range={query_stats['range_ms']:.4f}")
     else:
         # 如果没有min/max数据，使用均值的极差作为下限估计
         query_stats['range_ms'] = float(mean_values.max() - mean_values.min()) if len(mean_values) > 1 else 0.0
-        logging.info(f"无min/max数据，从均值计算极差：range={query_stats['range_ms']:.4f}")
+        logging.debug(f"无min/max数据，从均值计算极差：range={query_stats['range_ms']:.4f}")
     
     return query_stats
 
@@ -495,107 +608,173 @@ def add_scoring_to_table_data(table_data, grouped_stats, baselines):
         return table_data
     
     try:
-        for idx, row in table_data.iterrows():  # type: ignore
-            # 构建统计键
+        # 每行的评分只取决于(统计键, 查询类型)：按这些列的组合分组，每组只计算一次评分
+        key_columns = ['scale', 'cluster', 'phase', 'worker', 'query_type']
+        group_codes, first_rows = factorize_rows(table_data, [col for col in key_columns if col in table_data.columns])
+        groups = []
+        for first_row in first_rows.tolist():
+            row = {col: table_data[col].iat[first_row] for col in key_columns if col in table_data.columns}
             stats_key = f"{row.get('scale', '')}_{row.get('cluster', '')}_{row.get('phase', '')}_{row.get('worker', '')}"
-            query_type = row.get('query_type', '')
-            
-            # 获取对应的统计数据和基准数据
-            if stats_key in grouped_stats and stats_key in baselines:
-                baseline_data = baselines[stats_key]
-                stats_data = grouped_stats[stats_key]
-                
-                # 导入速度评分
-                if 'import_speed' in baseline_data and 'import_speed' in stats_data:
-                    baseline_import = baseline_data['import_speed']
-                    actual_import = stats_data['import_speed']
-                    
-                    if baseline_import and baseline_import > 0:
-                        # 计算百分比
-                        percentage = calculate_performance_percentage(actual_import, baseline_import)
-                        if percentage is not None:
-                            table_data.at[idx, 'import_speed_baseline_pct'] = round(percentage, 2)  # type: ignore
-                        
-                        # 计算评分
-                        import_score = calculate_import_speed_score(actual_import, baseline_import)
-                        if import_score is not None:
-                            table_data.at[idx, 'import_speed_score'] = import_score  # type: ignore
-                            
-                        logging.info(f"Import speed - Baseline: {baseline_import}, Actual: {actual_import}, Percentage: {percentage}%, Score: {import_score}")
-                
-                # 查询类型评分
-                if query_type:
-                    import re
-                    metric_key = re.sub(r'[^a-zA-Z0-9_-]', '-', str(query_type)).lower().replace('_', '-')
-                    
-                    if metric_key in baseline_data and metric_key in stats_data:
-                        baseline_metrics = baseline_data[metric_key]
-                        actual_metrics = stats_data[metric_key]
-                        
-                        # 检查是否是Master基准值（直接存储数值而非字典）
-                        if isinstance(baseline_metrics, (int, float)) and isinstance(actual_metrics, dict):
-                            # Master基准值：baseline是数值，actual是字典
-                            baseline_mean = float(baseline_metrics)
-                            actual_mean = actual_metrics.get('mean_ms', 0)
-                            if baseline_mean > 0:
-                                percentage = calculate_performance_percentage_reverse(actual_mean, baseline_mean)
-                                if percentage is not None:
-                                    table_data.at[idx, 'mean_ms_baseline_pct'] = round(percentage, 2)  # type: ignore
-                                    logging.info(f"Master baseline query {query_type}: actual={actual_mean}, baseline={baseline_mean}, percentage={percentage}%")
-                        
-                        elif isinstance(baseline_metrics, dict) and isinstance(actual_metrics, dict):
-                            # 其他基准值：都是字典结构
-                            # 计算综合评分
-                            score_info = calculate_comprehensive_score(actual_metrics, baseline_metrics)
-                            if score_info:
-                                table_data.at[idx, 'query_comprehensive_score'] = score_info['comprehensive_score']  # type: ignore
-                                table_data.at[idx, 'query_is_passed'] = score_info['is_passed']  # type: ignore
-                                table_data.at[idx, 'query_mean_score'] = score_info['detail_scores']['mean_score']  # type: ignore
-                                table_data.at[idx, 'query_median_score'] = score_info['detail_scores']['median_score']  # type: ignore
-                                table_data.at[idx, 'query_std_score'] = score_info['detail_scores']['std_score']  # type: ignore
-                                table_data.at[idx, 'query_range_score'] = score_info['detail_scores']['range_score']  # type: ignore
-                                
-                                # 添加偏差率数据
-                                table_data.at[idx, 'query_mean_deviation'] = score_info['deviation_rates']['mean_deviation']  # type: ignore
-                                table_data.at[idx, 'query_median_deviation'] = score_info['deviation_rates']['median_deviation']  # type: ignore
-                                table_data.at[idx, 'query_std_deviation'] = score_info['deviation_rates']['std_deviation']  # type: ignore
-                                table_data.at[idx, 'query_range_deviation'] = score_info['deviation_rates']['range_deviation']  # type: ignore
-                            
-                            # 无论score_info是否为None，都要设置基准值数据，这样前端可以显示说明信息
-                            table_data.at[idx, 'query_mean_baseline'] = baseline_metrics.get('mean_ms', 0)  # type: ignore
-                            table_data.at[idx, 'query_median_baseline'] = baseline_metrics.get('med_ms', 0)  # type: ignore
-                            table_data.at[idx, 'query_std_baseline'] = baseline_metrics.get('std_ms', 0)  # type: ignore
-                            table_data.at[idx, 'query_range_baseline'] = baseline_metrics.get('range_ms', 0)  # type: ignore
-                            
-                            # 确保实际测试数据的标准差字段总是有值
-                            if 'std_ms' in actual_metrics:
-                                table_data.at[idx, 'std_ms'] = actual_metrics.get('std_ms', 0.0)  # type: ignore
-                            else:
-                                table_data.at[idx, 'std_ms'] = 0.0  # type: ignore
-                                
-                            if score_info:
-                                logging.info(f"Query {query_type} comprehensive score: {score_info['comprehensive_score']}, passed: {score_info['is_passed']}")
-                            
-                            # 计算平均延迟百分比对比
-                            if 'mean_ms' in baseline_metrics and 'mean_ms' in actual_metrics:
-                                baseline_mean = baseline_metrics['mean_ms']
-                                actual_mean = actual_metrics['mean_ms']
-                                if baseline_mean and baseline_mean > 0:
-                                    percentage = calculate_performance_percentage_reverse(actual_mean, baseline_mean)
-                                    if percentage is not None:
-                                        table_data.at[idx, 'mean_ms_baseline_pct'] = round(percentage, 2)  # type: ignore
-        
+            groups.append((stats_key, row.get('query_type', '')))
+        group_scores = score_table_groups(groups, grouped_stats, baselines)
+        
+        # 按分组编码把评分展开到各行（相当于按分组键做一次左连接），列按首次出现的顺序添加
+        columns = list(dict.fromkeys(col for scores in group_scores for col in scores))
+        for col in columns:
+            assigned = np.array([col in scores for scores in group_scores])[group_codes]
+            values = np.array([scores.get(col) for scores in group_scores], dtype=object)[group_codes]
+            if col in table_data.columns:
+                table_data[col] = table_data[col].mask(assigned, pd.Series(values, index=table_data.index))
+                continue
+            column = pd.Series(np.where(assigned, values, np.nan), index=table_data.index).infer_objects()
+            if pd.api.types.is_integer_dtype(column.dtype):
+                column = column.astype(np.float64)
+            table_data[col] = column
+        
+        logging.info(f"Scored {len(group_scores)} groups for {len(table_data)} rows")
         return table_data
         
     except Exception as e:
         logging.error(f"Error adding scoring to table data: {str(e)}")
         return table_data
 
-@app.route('/options', methods=['GET'])
+def factorize_rows(df, columns):
+    """
+    按若干列的取值组合对行编码
+    
+    Returns:
+        (每行的组合编码, 每个组合首次出现的行位置)，组合按首次出现的顺序编号；缺失值作为普通取值参与分组
+    """
+    combined = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        combined = combined * len(uniques) + codes
+    _, first_rows, group_codes = np.unique(combined, return_index=True, return_inverse=True)
+    # np.unique按组合编码排序，重新按首次出现的顺序编号
+    order = np.argsort(first_rows, kind='stable')
+    renumber = np.empty_like(order)
+    renumber[order] = np.arange(len(order))
+    return renumber[group_codes], first_rows[order]
+
+def score_table_groups(groups, grouped_stats, baselines):
+    """
+    计算各组(统计键, 查询类型)的评分列
+    
+    先按评分方式收集各组的实际值和基准值，再用数组版本的评分函数一次计算所有组
+    
+    Args:
+        groups: [(统计键, 查询类型)]
+        
+    Returns:
+        list: 每组一个字典（列名 -> 值，按赋值顺序排列）；没有对应统计数据或基准值的组为空字典
+    """
+    group_scores = [{} for _ in groups]
+    imports = []         # (组序号, 实际导入速度, 基准导入速度)
+    master_queries = []  # Master基准值（数值）：(组序号, 实际平均延迟, 基准平均延迟)
+    queries = []         # 其他基准值（字典）：(组序号, 实际指标, 基准指标)
+    for i, (stats_key, query_type) in enumerate(groups):
+        if stats_key not in grouped_stats or stats_key not in baselines:
+            continue
+        baseline_data = baselines[stats_key]
+        stats_data = grouped_stats[stats_key]
+        
+        # 导入速度评分
+        if 'import_speed' in baseline_data and 'import_speed' in stats_data:
+            baseline_import = baseline_data['import_speed']
+            if baseline_import and baseline_import > 0:
+                imports.append((i, stats_data['import_speed'], baseline_import))
+        
+        # 查询类型评分
+        if query_type:
+            metric_key = metric_key_for(query_type)
+            if metric_key in baseline_data and metric_key in stats_data:
+                baseline_metrics = baseline_data[metric_key]
+                actual_metrics = stats_data[metric_key]
+                if isinstance(baseline_metrics, (int, float)) and isinstance(actual_metrics, dict):
+                    if float(baseline_metrics) > 0:
+                        master_queries.append((i, actual_metrics.get('mean_ms', 0), float(baseline_metrics)))
+                elif isinstance(baseline_metrics, dict) and isinstance(actual_metrics, dict):
+                    queries.append((i, actual_metrics, baseline_metrics))
+    
+    if imports:
+        index, actual, baseline = zip(*imports)
+        actual, baseline = np.array(actual, dtype=np.float64), np.array(baseline, dtype=np.float64)
+        percentages = [round(percentage, 2) for percentage in (((actual - baseline) / baseline) * 100).tolist()]
+        import_scores = import_speed_scores(actual, baseline).tolist()
+        for i, percentage, import_score in zip(index, percentages, import_scores):
+            group_scores[i]['import_speed_baseline_pct'] = percentage
+            group_scores[i]['import_speed_score'] = import_score
+    
+    if master_queries:
+        index, actual, baseline = zip(*master_queries)
+        actual, baseline = np.array(actual, dtype=np.float64), np.array(baseline, dtype=np.float64)
+        percentages = [round(percentage, 2) for percentage in (((baseline - actual) / baseline) * 100).tolist()]
+        for i, percentage in zip(index, percentages):
+            group_scores[i]['mean_ms_baseline_pct'] = percentage
+    
+    if queries:
+        # 实际指标或基准指标为空时不计算综合评分
+        scored = [(i, actual, baseline) for i, actual, baseline in queries if actual and baseline]
+        score_columns = {}
+        if scored:
+            actual_metrics = [actual for _, actual, _ in scored]
+            baseline_metrics = [baseline for _, _, baseline in scored]
+            score_columns = comprehensive_scores(
+                {key: metric_values(actual_metrics, key, 0, np.nan) for key in ('mean_ms', 'med_ms', 'range_ms')}
+                | {'std_ms': metric_values(actual_metrics, 'std_ms', None, np.nan)},
+                {key: metric_values(baseline_metrics, key, 0, 0) for key in ('mean_ms', 'med_ms', 'std_ms', 'range_ms')}
+            )
+            score_columns = {name: values.tolist() for name, values in score_columns.items()}
+        score_positions = {i: position for position, (i, _, _) in enumerate(scored)}
+        
+        # 平均延迟百分比对比（基准平均延迟大于0时）
+        compared = [(i, actual['mean_ms'], baseline['mean_ms']) for i, actual, baseline in queries
+                    if 'mean_ms' in baseline and 'mean_ms' in actual and baseline['mean_ms'] and baseline['mean_ms'] > 0]
+        percentages = {}
+        if compared:
+            index, actual, baseline = zip(*compared)
+            actual, baseline = np.array(actual, dtype=np.float64), np.array(baseline, dtype=np.float64)
+            percentages = {i: round(percentage, 2) for i, percentage in zip(index, (((baseline - actual) / baseline) * 100).tolist())}
+        
+        for i, actual_metrics, baseline_metrics in queries:
+            scores = group_scores[i]
+            position = score_positions.get(i)
+            if position is not None:
+                for column in QUERY_SCORE_COLUMNS:
+                    scores[f'query_{column}'] = score_columns[column][position]
+            
+            # 无论是否计算了综合评分，都要设置基准值数据，这样前端可以显示说明信息
+            scores['query_mean_baseline'] = baseline_metrics.get('mean_ms', 0)
+            scores['query_median_baseline'] = baseline_metrics.get('med_ms', 0)
+            scores['query_std_baseline'] = baseline_metrics.get('std_ms', 0)
+            scores['query_range_baseline'] = baseline_metrics.get('range_ms', 0)
+            
+            # 确保实际测试数据的标准差字段总是有值
+            scores['std_ms'] = actual_metrics.get('std_ms', 0.0)
+            
+            if i in percentages:
+                scores['mean_ms_baseline_pct'] = percentages[i]
+    
+    logging.debug(f"Scored {len(imports)} import speed groups, {len(master_queries)} master query groups, "
+                  f"{len(queries)} query groups")
+    return group_scores
+
+# 综合评分的结果列（表格中的列名加query_前缀）
+QUERY_SCORE_COLUMNS = ['comprehensive_score', 'is_passed', 'mean_score', 'median_score', 'std_score', 'range_score',
+                       'mean_deviation', 'median_deviation', 'std_deviation', 'range_deviation']
+
+def metric_values(metrics_list, key, default, missing):
+    """取出各组指标字典中的某一指标为数组，缺失（None）的值用missing代替"""
+    values = [metrics.get(key, default) for metrics in metrics_list]
+    return np.array([missing if value is None else value for value in values], dtype=np.float64)
+
+@app.route('/options', methods=['GET', 'POST'])
 @login_required
 def get_options():
+    """获取筛选选项；POST携带当前筛选条件时返回交叉筛选后的选项及行数"""
     try:
-        options = loader.get_options()
+        filters = (request.get_json(silent=True) or {}) if request.method == 'POST' else None
+        options = get_loader().get_options(filters)
         
         # 确保所有选项都是可JSON序列化的
         options['scales'] = [int(scale) for scale in options['scales']]
@@ -619,11 +798,11 @@ def prepare_chart_data(df, metric):
             df.rename(columns={'query type': 'query_type'}, inplace=True)
         # 对于import_speed，按分支、查询类型、时间取均值（或最大值）
         if metric == 'import_speed':
-            grouped = df.groupby(['branch', 'query_type', 'datetime'])[metric].max().reset_index()
+            grouped = df.groupby(['branch', 'query_type', 'datetime'], observed=True)[metric].max().reset_index()
         else:
-            grouped = df.groupby(['branch', 'query_type', 'datetime'])[metric].mean().reset_index()
+            grouped = df.groupby(['branch', 'query_type', 'datetime'], observed=True)[metric].mean().reset_index()
         chart_data = {}
-        for (branch, query_type), group in grouped.groupby(['branch', 'query_type']):
+        for (branch, query_type), group in grouped.groupby(['branch', 'query_type'], observed=True):
             key = f"{branch}_{query_type}"
             chart_data[key] = {
                 'name': f"{branch} - {query_type}",
@@ -653,6 +832,7 @@ def save_master_config(config):
     try:
         with open(MASTER_CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
+        bump_baseline_version(MASTER_CONFIG_FILE)
         return True
     except Exception as e:
         logging.error(f"保存Master基准值配置失败: {e}")
@@ -673,6 +853,7 @@ def save_master_secondary_config(config):
     try:
         with open(MASTER_SECONDARY_CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
+        bump_baseline_version(MASTER_SECONDARY_CONFIG_FILE)
         return True
     except Exception as e:
         logging.error(f"保存Master第二基准值配置失败: {e}")
@@ -695,6 +876,7 @@ def save_enterprise_config(config):
     try:
         with open(ENTERPRISE_CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
+        bump_baseline_version(ENTERPRISE_CONFIG_FILE)
         return True
     except Exception as e:
         logging.error(f"保存企业发版基准值配置失败: {e}")
@@ -715,6 +897,7 @@ def save_opensource_config(config):
     try:
         with open(OPENSOURCE_CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=2, ensure_ascii=False)
+        bump_baseline_version(OPENSOURCE_CONFIG_FILE)
         return True
     except Exception as e:
         logging.error(f"保存开源发版基准值配置失败: {e}")
@@ -741,10 +924,10 @@ def calculate_deviation_score(actual_value, baseline_value):
     """
     if baseline_value is None or baseline_value == 0:
         if actual_value == 0:
-            logging.info(f"偏差得分计算: actual=0, baseline=0, 完美匹配，得分=100")
+            logging.debug(f"偏差得分计算: actual=0, baseline=0, 完美匹配，得分=100")
             return 100.0
         else:
-            logging.info(f"偏差得分计算: actual={actual_value}, baseline=0, 有变异，得分=0")
+            logging.debug(f"偏差得分计算: actual={actual_value}, baseline=0, 有变异，得分=0")
             return 0.0
     
     # 计算偏差率（类似于均值）
@@ -756,7 +939,7 @@ def calculate_deviation_score(actual_value, baseline_value):
     else:
         score = max(0, 100 - (deviation_rate - 10) * 10)
     
-    logging.info(f"偏差得分计算: actual={actual_value}, baseline={baseline_value}, deviation_rate={deviation_rate:.2f}%, score={score}")
+    logging.debug(f"偏差得分计算: actual={actual_value}, baseline={baseline_value}, deviation_rate={deviation_rate:.2f}%, score={score}")
     return round(score, 2)
 
 def calculate_comprehensive_score(actual_metrics, baseline_metrics):
@@ -790,12 +973,12 @@ def calculate_comprehensive_score(actual_metrics, baseline_metrics):
     
     if actual_std is not None:
         std_score = calculate_deviation_score(actual_std, baseline_std)
-        logging.info(f"标准差计算 - 实际值: {actual_std}, 基准值: {baseline_std}, 得分: {std_score}")
+        logging.debug(f"标准差计算 - 实际值: {actual_std}, 基准值: {baseline_std}, 得分: {std_score}")
     else:
         # 如果实际标准差为None，设置为0并计算得分
         actual_std = 0.0
         std_score = calculate_deviation_score(actual_std, baseline_std) if baseline_std > 0 else 100.0
-        logging.info(f"标准差数据缺失，设置为0 - 实际值: {actual_std}, 基准值: {baseline_std}, 得分: {std_score}")
+        logging.debug(f"标准差数据缺失，设置为0 - 实际值: {actual_std}, 基准值: {baseline_std}, 得分: {std_score}")
     
     range_score = calculate_deviation_score(
         actual_metrics.get('range_ms', 0), 
@@ -1717,6 +1900,9 @@ if __name__ == '__main__':
         logging.info(f"PID: {os.getpid()}")
         logging.info("Application will be available at http://0.0.0.0:5001")
         
+        # 启动时创建加载器并开始后台加载（导入应用模块时不创建）
+        get_loader()
+        
         app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
     except Exception as e:
         logging.error(f"Failed to start application: {e}")
@@ -0,0 +1,136 @@
+"""
+冷数据分区
+
+内存中的查询结果超过内存预算时，加载器把较早的run按月份溢写为列式文件（与分段缓存相同的格式），
+内存中只保留runs表中的元数据；查询涉及这些run时再按需读取（列式文件通过内存映射读取）。
+溢写文件只在当前进程内有效：每个加载器使用独立的子目录，启动时清理已退出进程留下的子目录。
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import logging
+from typing import Dict, Any, List, Tuple, Iterable
+
+import pandas as pd
+
+from segment_store import write_frame, read_frame, concat_frames, pa
+
+
+class ColdStore:
+    """按月份溢写的冷数据分区，记录 run_id -> (文件名, 行数)"""
+
+    def __init__(self, root_dir: str) -> None:
+        os.makedirs(root_dir, exist_ok=True)
+        self._remove_stale_dirs(root_dir)
+        self.spill_dir = tempfile.mkdtemp(prefix=f'{os.getpid()}-', dir=root_dir)
+        self.file_ext = 'arrow' if pa is not None else 'pkl'
+        self._refs: Dict[int, Tuple[str, int]] = {}
+        self._file_runs: Dict[str, set] = {}  # 文件名 -> 文件中仍有效的run_id
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _remove_stale_dirs(root_dir: str) -> None:
+        """删除已退出进程留下的溢写目录"""
+        for name in os.listdir(root_dir):
+            try:
+                pid = int(name.split('-', 1)[0])
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                shutil.rmtree(os.path.join(root_dir, name), ignore_errors=True)
+            except (ValueError, OSError):
+                continue
+
+    def spill(self, partitions: Dict[int, pd.DataFrame], label: str) -> None:
+        """把一组run的查询结果写入一个新的冷数据文件"""
+        if not partitions:
+            return
+        with self._lock:
+            self._seq += 1
+            fname = f'cold-{label}-{self._seq:06d}.{self.file_ext}'
+        write_frame(concat_frames(list(partitions.values())), os.path.join(self.spill_dir, fname))
+        with self._lock:
+            for run_id, frame in partitions.items():
+                self._refs[run_id] = (fname, len(frame))
+            self._file_runs[fname] = set(partitions)
+
+    def remove(self, run_ids: Iterable[int]) -> int:
+        """移除run（刷新或删除目录时），文件中的run全部失效后删除文件，返回移除的行数"""
+        removed_rows = 0
+        dead_files = []
+        with self._lock:
+            for run_id in run_ids:
+                ref = self._refs.pop(run_id, None)
+                if ref is None:
+                    continue
+                fname, rows = ref
+                removed_rows += rows
+                live = self._file_runs.get(fname)
+                if live is not None:
+                    live.discard(run_id)
+                    if not live:
+                        del self._file_runs[fname]
+                        dead_files.append(fname)
+        for fname in dead_files:
+            try:
+                os.remove(os.path.join(self.spill_dir, fname))
+            except OSError:
+                pass
+        return removed_rows
+
+    def refs(self) -> Dict[int, Tuple[str, int]]:
+        """当前冷数据run的引用副本（发布到快照中）"""
+        with self._lock:
+            return dict(self._refs)
+
+    def read(self, refs: Dict[int, Tuple[str, int]]) -> List[pd.DataFrame]:
+        """按引用读取冷数据run的查询结果（同一文件只读取一次）"""
+        by_file: Dict[str, List[int]] = {}
+        for run_id, (fname, _) in refs.items():
+            by_file.setdefault(fname, []).append(run_id)
+
+        frames = []
+        for fname, run_ids in by_file.items():
+            try:
+                df = read_frame(os.path.join(self.spill_dir, fname))
+            except (OSError, IOError) as e:
+                # 读取旧快照时文件可能已因目录删除被清理
+                logging.warning(f"Cold partition file unavailable: {fname}: {str(e)}")
+                continue
+            frames.append(df[df['run_id'].isin(run_ids)])
+        return frames
+
+    def clear(self) -> None:
+        """删除所有冷数据文件"""
+        with self._lock:
+            self._refs = {}
+            self._file_runs = {}
+            for fname in os.listdir(self.spill_dir):
+                try:
+                    os.remove(os.path.join(self.spill_dir, fname))
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """删除本加载器的溢写目录"""
+        with self._lock:
+            self._refs = {}
+            self._file_runs = {}
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def get_info(self) -> Dict[str, Any]:
+        with self._lock:
+            size = 0
+            for fname in self._file_runs:
+                try:
+                    size += os.path.getsize(os.path.join(self.spill_dir, fname))
+                except OSError:
+                    pass
+            return {
+                'cold_runs': len(self._refs),
+                'cold_rows': int(sum(rows for _, rows in self._refs.values())),
+                'cold_files': len(self._file_runs),
+                'cold_bytes': size
+            }
@@ -0,0 +1,8 @@
+"""
+pytest公共配置：导入app时日志文件写入临时目录，不写入仓库的logs/目录
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault('TSBS_LOG_DIR', tempfile.mkdtemp(prefix='tsbs-test-logs-'))
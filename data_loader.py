@@ -1,5 +1,7 @@
 import os
 import re
+import sys
+import numpy as np
 import pandas as pd
 import time
 from datetime import datetime
@@ -8,12 +10,22 @@ from watchdog.events import FileSystemEventHandler
 import threading
 import logging
 import csv
-import pickle
 import tempfile
 from typing import Optional, Dict, Any, List, Union
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 import gc
 import weakref
+import mmap
+from functools import lru_cache
+
+from segment_store import SegmentStore, concat_frames, unify_categories
+from ingest_queue import DebouncedIngestQueue
+from facet_index import FacetIndex
+from cold_store import ColdStore
+from filter_index import FilterIndex
+from group_aggregates import GroupAggregates, GroupBuckets, EMPTY_BUCKETS
+from run_watcher import RunWatchRegistry
 
 # 配置日志格式，但不强制设置级别（让父级控制）
 if not logging.getLogger().handlers:
@@ -21,14 +33,747 @@ if not logging.getLogger().handlers:
         format='%(asctime)s - %(levelname)s - %(message)s',
     )
 
+# 必需的数据列
+REQUIRED_COLUMNS = [
+    'branch', 'query_type', 'scale', 'worker',
+    'min_ms', 'mean_ms', 'max_ms', 'med_ms'
+]
+
+# 列名标准化映射
+COLUMN_MAPPING = {
+    'query_type': 'query_type',
+    'query-type': 'query_type',
+    'querytype': 'query_type',
+    'query': 'query_type',
+    'min(ms)': 'min_ms',
+    'mean(ms)': 'mean_ms',
+    'max(ms)': 'max_ms',
+    'med(ms)': 'med_ms',
+    'worker': 'worker',
+    'scale': 'scale',
+    'query_count': 'query_count'
+}
+
+NUMERIC_COLUMNS = ['min_ms', 'mean_ms', 'max_ms', 'med_ms', 'worker', 'query_count', 'scale', 'cluster', 'dop', 'replica', 'import_speed']
+
+# 紧凑数据模式：低基数字符串列存为分类类型，整数和延迟列在无损时向下转换
+CATEGORICAL_COLUMNS = ['branch', 'phase', 'test_type', 'wal', 'dir_name', 'time', 'query_type']
+INTEGER_COLUMNS = ['scale', 'cluster', 'dop', 'replica', 'worker', 'query_count', 'year', 'month', 'day']
+FLOAT_COLUMNS = ['min_ms', 'mean_ms', 'max_ms', 'med_ms', 'import_speed']
+
+# 快速CSV读取路径中已知列的显式类型（按标准化后的列名）
+FAST_PATH_DTYPES = {
+    'min_ms': 'float64',
+    'mean_ms': 'float64',
+    'max_ms': 'float64',
+    'med_ms': 'float64',
+    'worker': 'int64',
+    'query_count': 'int64'
+}
+
+# 表头签名 -> 读取计划（标准化列名和显式类型）的缓存
+_CSV_PLAN_CACHE: Dict[tuple, Dict[str, Any]] = {}
+
+
+# 目录名格式（预编译，避免每个目录都重新编译正则）
+DIR_NAME_PATTERN = re.compile(
+    r'(\d{4})_(\d{2})(\d{2})_(\d{6})_(.*?)_scale(\d+)_cluster(\d+)_([a-zA-Z]+?\d*)_([a-zA-Z]+)_(wal\d+)_replica(\d+)_dop(\d+)'
+)
+# 宽松格式：无法获取test_type/phase/wal/replica
+DIR_NAME_LOOSE_PATTERN = re.compile(r'(\d{4})_(\d{2})(\d{2})_(\d{6})_(.*?)_scale(\d+)_cluster(\d+)_.+_dop(\d+)')
+
+# 导入日志中的导入速度行，通常位于日志末尾
+IMPORT_SPEED_MARKER = b'actually rate '
+IMPORT_SPEED_PATTERN = re.compile(rb'actually rate ([\d.]+) rows/sec without ddl time')
+
+
+def _parse_run_datetime(year, month, day, time_str):
+    """按'%Y%m%d_%H%M%S'语义构造时间（直接构造datetime，避免strptime的格式解析开销）"""
+    if len(time_str) != 6 or not time_str.isdigit():
+        raise ValueError(f"Invalid time: {time_str}")
+    return datetime(year, month, day, int(time_str[0:2]), int(time_str[2:4]), int(time_str[4:6]))
+
+
+@lru_cache(maxsize=65536)
+def _parse_directory_name_cached(dir_name):
+    """解析目录名（按目录名缓存结果，目录名相同则元数据相同）"""
+    try:
+        match = DIR_NAME_PATTERN.match(dir_name)
+        if not match:
+            # 尝试更宽松的匹配
+            match = DIR_NAME_LOOSE_PATTERN.match(dir_name)
+            if not match:
+                logging.warning(f"Directory name pattern mismatch: {dir_name}")
+                return None
+
+            year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+            return {
+                'year': year,
+                'month': month,
+                'day': day,
+                'time': match.group(4),
+                'branch': match.group(5),
+                'scale': int(match.group(6)),
+                'cluster': int(match.group(7)),
+                'dop': int(match.group(8)),
+                'phase': 'unknown',  # 宽松匹配中无法获取phase，设为unknown
+                'dir_name': dir_name,
+                'datetime': _parse_run_datetime(year, month, day, match.group(4))
+            }
+
+        year, month, day = int(match.group(1)), int(match.group(2)), int(match.group(3))
+        return {
+            'year': year,
+            'month': month,
+            'day': day,
+            'time': match.group(4),
+            'branch': match.group(5),
+            'scale': int(match.group(6)),
+            'cluster': int(match.group(7)),
+            'test_type': match.group(8),
+            'phase': match.group(9),
+            'wal': match.group(10),
+            'replica': int(match.group(11)),
+            'dop': int(match.group(12)),
+            'dir_name': dir_name,
+            'datetime': _parse_run_datetime(year, month, day, match.group(4))
+        }
+    except Exception as e:
+        logging.error(f"Error parsing directory name {dir_name}: {str(e)}")
+        return None
+
+
+def parse_directory_name(dir_name):
+    """解析目录名提取元数据，增加容错处理（结果按目录名缓存，返回副本供调用方修改）"""
+    meta = _parse_directory_name_cached(dir_name)
+    return dict(meta) if meta else None
+
+
+def validate_dataframe(df, required_columns=REQUIRED_COLUMNS):
+    """验证数据框是否包含必需的列"""
+    missing_cols = [col for col in required_columns if col not in df.columns]
+    if missing_cols:
+        logging.warning(f"Missing required columns: {', '.join(missing_cols)}")
+        return False
+
+    if df.empty:
+        logging.warning("DataFrame is empty")
+        return False
+
+    return True
+
+
+def normalize_column_name(name):
+    """标准化列名：去除首尾空格、空格转下划线、转小写并应用列名映射"""
+    normalized = str(name).strip().replace(' ', '_').lower()
+    return COLUMN_MAPPING.get(normalized, normalized)
+
+
+def enforce_schema(df):
+    """
+    对解析后的数据应用紧凑数据模式（原地修改并返回）
+
+    - 低基数字符串列转为分类类型，合并时由concat_frames统一字典
+    - 整数列向下转换为最小的整数类型
+    - 浮点列在float32可以精确表示所有值时转为float32
+    """
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in INTEGER_COLUMNS:
+        if col in df.columns and pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    for col in FLOAT_COLUMNS:
+        if col in df.columns and df[col].dtype == 'float64':
+            values = df[col].to_numpy()
+            downcast = values.astype('float32')
+            if np.array_equal(downcast.astype('float64'), values, equal_nan=True):
+                df[col] = downcast
+    return df
+
+
+def frame_nbytes(df):
+    """估算分区占用的内存字节数（分类列只计编码，字典由所有分区共用）"""
+    total = 0
+    for col in df.columns:
+        column = df[col]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            total += column.cat.codes.to_numpy().nbytes
+        elif pd.api.types.is_numeric_dtype(column) or pd.api.types.is_datetime64_any_dtype(column):
+            total += int(column.memory_usage(index=False, deep=False))
+        else:
+            total += int(column.memory_usage(index=False, deep=True))
+    return total
+
+
+def estimate_unoptimized_bytes(frames, weights=None):
+    """
+    估算数据在未应用紧凑模式（字符串为object、数值为64位）时占用的内存字节数
+
+    frames为一个DataFrame或多个列相同的DataFrame（例如results的各个分区），逐个统计后累加，不需要合并；
+    weights为每行重复的次数（只用于单个DataFrame，例如runs表的行在宽表中按其查询结果行数展开）
+    """
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+    total = 0
+    for df in frames:
+        rows = len(df) if weights is None else int(weights.sum())
+        for col in df.columns:
+            column = df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                # 每个取值按出现次数计一个独立的字符串对象，缺失值计为float对象
+                counts = np.bincount(column.cat.codes.to_numpy() + 1, weights=weights,
+                                     minlength=len(column.cat.categories) + 1)
+                total += rows * 8
+                for i in np.flatnonzero(counts).tolist():
+                    value = column.cat.categories[i - 1] if i else np.nan
+                    total += sys.getsizeof(value) * int(counts[i])
+            elif pd.api.types.is_numeric_dtype(column):
+                total += rows * 8
+            else:
+                deep = int(column.memory_usage(index=False, deep=True))
+                total += deep if weights is None else int(deep * rows / max(1, len(column)))
+    return total
+
+
+def build_runs_frame(records):
+    """由目录级元数据记录（每个目录一条，含run_id和import_speed）构建紧凑的runs维度表"""
+    runs = pd.DataFrame.from_records(records)
+    for col in NUMERIC_COLUMNS:
+        if col in runs.columns and not pd.api.types.is_numeric_dtype(runs[col]):
+            runs[col] = pd.to_numeric(runs[col], errors='coerce')
+    return enforce_schema(runs)
+
+
+def join_runs(runs, results):
+    """按run_id把runs表的目录元数据关联回results表，得到每行带元数据的宽表视图"""
+    if results.empty:
+        return pd.DataFrame()
+    positions = pd.Index(runs['run_id']).get_indexer(results['run_id'])
+    run_part = runs.drop(columns='run_id').take(positions)
+    run_part.index = results.index
+    return pd.concat([results.drop(columns='run_id'), run_part], axis=1)
+
+
+def parse_date_range(filters):
+    """
+    解析/data接口的日期条件，返回(开始时间, 结束时间)，缺失或无法解析的一端为None
+
+    与原有筛选一致：结束时间为end_date次日零点，两端都包含
+    """
+    start = end = None
+    if filters.get('start_date'):
+        try:
+            start = datetime.strptime(filters['start_date'], '%Y-%m-%d')
+        except:
+            pass
+    if filters.get('end_date'):
+        try:
+            end = datetime.strptime(filters['end_date'], '%Y-%m-%d') + pd.Timedelta(days=1)
+        except:
+            pass
+    return start, end
+
+
+def select_runs(runs, filters):
+    """
+    在runs表上计算目录级筛选条件（分支、日期、规模、集群、执行类型）
+
+    没有目录级筛选条件时返回None，否则返回命中的run_id数组；
+    条件的解析方式与/data接口一致，无法解析的条件被忽略
+    """
+    mask = None
+
+    def apply(condition):
+        nonlocal mask
+        condition = np.asarray(condition, dtype=bool)
+        mask = condition if mask is None else mask & condition
+
+    if filters.get('branches'):
+        apply(runs['branch'].astype(str).isin(filters['branches']))
+
+    start_date, next_day = parse_date_range(filters)
+    if start_date is not None:
+        apply(runs['datetime'] >= start_date)
+    if next_day is not None:
+        apply(runs['datetime'] <= next_day)
+
+    if filters.get('scales'):
+        try:
+            scales = [int(s) for s in filters['scales']]
+            apply(runs['scale'].isin(scales))
+        except:
+            pass
+
+    if filters.get('clusters'):
+        try:
+            clusters = [int(c) for c in filters['clusters']]
+            apply(runs['cluster'].isin(clusters))
+        except:
+            pass
+
+    if filters.get('execution_types') and 'phase' in runs.columns:
+        apply(runs['phase'].astype(str).isin(filters['execution_types']))
+
+    if mask is None:
+        return None
+    return runs['run_id'].to_numpy()[mask]
+
+
+def _get_csv_plan(header):
+    """根据表头签名获取（并缓存）读取计划"""
+    signature = tuple(header)
+    plan = _CSV_PLAN_CACHE.get(signature)
+    if plan is None:
+        names = [normalize_column_name(col) for col in header]
+        plan = {
+            'names': names,
+            'dtype': {raw: FAST_PATH_DTYPES[name] for raw, name in zip(header, names) if name in FAST_PATH_DTYPES}
+        }
+        _CSV_PLAN_CACHE[signature] = plan
+    return plan
+
+
+def fast_csv_loader(csv_path):
+    """
+    快速CSV读取路径：只读取一次表头确定读取计划，再用C引擎按显式类型解析
+
+    返回已标准化列名的DataFrame，无法按计划解析时返回None
+    """
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            header = next(csv.reader([f.readline()]))
+        if len(header) <= 1:
+            return None
+
+        plan = _get_csv_plan(header)
+        df = pd.read_csv(csv_path, sep=',', engine='c', encoding='utf-8', dtype=plan['dtype'])
+        if df.empty or len(df.columns) != len(plan['names']):
+            return None
+
+        df.columns = pd.Index(plan['names'])
+        return df
+    except Exception as e:
+        logging.debug(f"Fast CSV parsing failed for {csv_path}: {str(e)}")
+        return None
+
+
+def robust_csv_loader(csv_path):
+    """强大的CSV加载器，处理各种格式问题"""
+    # 尝试1: 使用Python csv模块手动解析
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            data = list(reader)
+
+        # 如果标题行只有一个元素，尝试分割
+        if len(header) == 1:
+            header = header[0].split(',')
+
+        # 创建DataFrame
+        df = pd.DataFrame(data, columns=pd.Index(header))
+        return df
+    except Exception as e:
+        logging.warning(f"Manual CSV parsing failed: {str(e)}")
+
+    # 尝试2: 使用pandas自动检测分隔符
+    try:
+        return pd.read_csv(csv_path, sep=None, engine='python', encoding='utf-8')
+    except:
+        pass
+
+    # 尝试3: 使用不同编码
+    encodings = ['utf-8', 'utf-8-sig', 'latin1', 'iso-8859-1']
+    for encoding in encodings:
+        try:
+            return pd.read_csv(csv_path, sep=',', encoding=encoding)
+        except:
+            continue
+
+    # 尝试4: 作为纯文本处理并分割
+    try:
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+        # 跳过空行
+        lines = [line.strip() for line in lines if line.strip()]
+        header = lines[0].split(',')
+        data = [line.split(',') for line in lines[1:]]
+
+        # 确保所有行长度相同
+        max_cols = len(header)
+        for i, row in enumerate(data):
+            if len(row) < max_cols:
+                data[i] = row + [''] * (max_cols - len(row))
+            elif len(row) > max_cols:
+                data[i] = row[:max_cols]
+
+        return pd.DataFrame(data, columns=pd.Index(header))
+    except Exception as e:
+        logging.error(f"All CSV parsing methods failed: {str(e)}")
+        return pd.DataFrame()
+
+
+def scan_log_for_import_speed(log_path):
+    """
+    从日志末尾向前查找导入速度行，命中第一个完整匹配后立即返回（找不到时返回None）
+
+    通过内存映射读取，由rfind在C层从尾部反向搜索，不逐行解码整个日志
+    """
+    with open(log_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm)
+            while end > 0:
+                pos = mm.rfind(IMPORT_SPEED_MARKER, 0, end)
+                if pos < 0:
+                    return None
+                m = IMPORT_SPEED_PATTERN.match(mm, pos)
+                if m:
+                    return float(m.group(1))
+                end = pos + len(IMPORT_SPEED_MARKER) - 1
+    return None
+
+
+def extract_import_speed(dir_path):
+    """从load_result目录下的日志中提取导入速度import_speed"""
+    import_speed = None
+    try:
+        load_result_dir = os.path.join(dir_path, 'load_result')
+        if os.path.isdir(load_result_dir):
+            for fname in os.listdir(load_result_dir):
+                if fname.endswith('.log'):
+                    import_speed = scan_log_for_import_speed(os.path.join(load_result_dir, fname))
+                if import_speed is not None:
+                    break
+    except Exception as e:
+        logging.warning(f"Error extracting import_speed from log: {str(e)}")
+    return import_speed
+
+
+def load_result_directory(dir_path, required_columns=REQUIRED_COLUMNS, stats=None):
+    """
+    解析单个测试结果目录，返回(目录元数据, 查询结果DataFrame)（失败时返回None）
+
+    该函数不依赖加载器状态，可在进程池的工作进程中执行；
+    传入stats字典时累计CSV快速路径和回退路径的使用次数
+    """
+    dir_name = os.path.basename(dir_path)
+
+    meta = parse_directory_name(dir_name)
+    if not meta:
+        logging.warning(f"Skipping directory due to parse failure: {dir_name}")
+        return None
+
+    csv_path = os.path.join(dir_path, 'query_result', 'TSBS_TEST_RESULT.csv')
+    if not os.path.exists(csv_path):
+        logging.warning(f"CSV file not found: {csv_path}")
+        return None
+
+    try:
+        # 优先使用快速路径，失败时回退到强大的CSV加载器
+        df_new = fast_csv_loader(csv_path)
+        if df_new is not None:
+            if stats is not None:
+                stats['csv_fast_path'] = stats.get('csv_fast_path', 0) + 1
+        else:
+            if stats is not None:
+                stats['csv_fallback'] = stats.get('csv_fallback', 0) + 1
+            logging.debug(f"Falling back to robust CSV loader: {csv_path}")
+            df_new = robust_csv_loader(csv_path)
+
+            if df_new.empty:
+                logging.error(f"Failed to load CSV: {csv_path}")
+                return None
+
+            # 只在调试模式下输出详细列信息
+            logging.debug(f"Loaded CSV from {csv_path}. Columns: {df_new.columns.tolist()}")
+
+            # 标准化列名（移除空格和下划线）
+            df_new.columns = df_new.columns.str.strip().str.replace(' ', '_').str.lower()
+
+            # 应用列名映射
+            df_new.rename(columns=lambda x: COLUMN_MAPPING.get(x, x), inplace=True)
+
+            # 只在调试模式下输出详细列信息
+            logging.debug(f"After renaming columns: {df_new.columns.tolist()}")
+
+        # 目录元数据和导入速度只保存一份（作为runs表中的一行），不再复制到每个查询结果行
+        run = dict(meta)
+        run['import_speed'] = extract_import_speed(dir_path)
+
+        # CSV中与目录元数据同名的列以目录元数据为准
+        df_new = df_new.drop(columns=[col for col in df_new.columns if col in run])
+
+        for col in NUMERIC_COLUMNS:
+            # 快速路径已按显式类型解析的列无需再次转换
+            if col in df_new.columns and not pd.api.types.is_numeric_dtype(df_new[col]):
+                try:
+                    df_new[col] = pd.to_numeric(df_new[col], errors='coerce')
+                except Exception as e:
+                    logging.warning(f"Error converting column {col} to numeric: {str(e)}")
+
+        # 验证数据（目录元数据已提供的列不要求出现在CSV中）
+        result_columns = [col for col in required_columns if col not in run]
+        if not validate_dataframe(df_new, result_columns):
+            logging.error(f"Validation failed for {csv_path}")
+            # 尝试修复缺失列
+            for col in result_columns:
+                if col not in df_new.columns:
+                    df_new[col] = None
+                    logging.warning(f"Added missing column: {col}")
+
+            # 再次验证
+            if not validate_dataframe(df_new, result_columns):
+                logging.error(f"Validation still failed, skipping directory: {dir_name}")
+                return None
+
+        return run, enforce_schema(df_new)
+    except Exception as e:
+        logging.error(f"Error loading {csv_path}: {str(e)}")
+        import traceback
+        logging.error(traceback.format_exc())
+        return None
+
+
+def directory_fingerprint(dir_path):
+    """
+    计算目录的文件指纹：CSV的mtime/大小/inode，以及load_result下各日志的mtime/大小
+
+    CSV不存在时返回None；返回值只包含列表和数字，可直接写入JSON清单
+    """
+    csv_path = os.path.join(dir_path, 'query_result', 'TSBS_TEST_RESULT.csv')
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+
+    logs = []
+    load_result_dir = os.path.join(dir_path, 'load_result')
+    try:
+        with os.scandir(load_result_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.log'):
+                    log_st = entry.stat()
+                    logs.append([entry.name, log_st.st_mtime_ns, log_st.st_size])
+    except OSError:
+        pass
+
+    return [st.st_mtime_ns, st.st_size, st.st_ino, sorted(logs)]
+
+
+def _load_result_directory_task(dir_path):
+    """进程池任务入口：返回(目录名, (目录元数据, 查询结果)或None, 解析统计, 目录指纹)"""
+    stats = {}
+    # 先计算指纹再解析，解析期间文件发生变化时下次启动会重新加载
+    fingerprint = directory_fingerprint(dir_path)
+    return os.path.basename(dir_path), load_result_directory(dir_path, stats=stats), stats, fingerprint
+
+
+class DataSnapshot:
+    """
+    某一版本数据集的不可变快照
+
+    加载器每次数据变化时发布一个新快照并原子替换引用，读取方无需加锁即可持有一致的数据；
+    合并后的results表和宽表视图只包含内存中的(热)分区，在首次访问时生成并缓存在快照内；
+    results中的分区按run时间排序，任意日期范围（按月、按周）都对应一段连续的行，由row_range二分查找；
+    已溢写到磁盘的(冷)run只在查询涉及时由load_results按需读取，不缓存。
+    快照中的DataFrame不可修改，需要修改时先浅拷贝（写时复制，不复制数据）。
+    """
+
+    def __init__(self, version: int, runs: pd.DataFrame, partitions: Dict[int, pd.DataFrame],
+                 cold: Optional[Dict[int, tuple]] = None, cold_store: Optional[ColdStore] = None,
+                 group_buckets: Optional[GroupBuckets] = None) -> None:
+        self.version = version
+        self.runs = runs
+        self.partitions = partitions  # run_id -> 查询结果分区（只读）
+        self.cold = cold or {}  # run_id -> (冷数据文件名, 行数)
+        self.cold_store = cold_store
+        self.group_buckets = group_buckets or EMPTY_BUCKETS  # 按(分组, 日期)合并的分组聚合（包括冷数据run）
+        self._results: Optional[pd.DataFrame] = None
+        self._run_times: Optional[np.ndarray] = None  # 按时间排序的run时间（不含缺失时间的run）
+        self._row_offsets: Optional[np.ndarray] = None  # 排序后第i个run在results中的起始行
+        self._ordered_run_ids: List[int] = []  # results中分区的排列顺序
+        self._filter_index: Optional[FilterIndex] = None
+        self._view: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()  # 只保护本快照的惰性合并，不阻塞加载器的写入
+
+    @property
+    def results(self) -> pd.DataFrame:
+        """内存中所有分区按run时间顺序合并后的results表"""
+        if self._results is None:
+            with self._lock:
+                if self._results is None:
+                    self._build_results()
+        return self._results
+
+    def _build_results(self) -> None:
+        """按(run时间, run_id)排列分区后合并，并记录每个run的起始行（调用方持有锁）"""
+        if self.runs.empty or not self.partitions:
+            self._run_times = np.array([], dtype='datetime64[ns]')
+            self._row_offsets = np.zeros(1, dtype=np.int64)
+            self._results = concat_frames(list(self.partitions.values()))
+            return
+        hot = self.runs[self.runs['run_id'].isin(list(self.partitions))]
+        hot = hot.sort_values(['datetime', 'run_id'], kind='stable', na_position='last')
+        self._ordered_run_ids = hot['run_id'].tolist()
+        frames = [self.partitions[run_id] for run_id in self._ordered_run_ids]
+        offsets = np.zeros(len(frames) + 1, dtype=np.int64)
+        np.cumsum([len(frame) for frame in frames], out=offsets[1:])
+        times = hot['datetime'].to_numpy()
+        self._run_times = times[:len(times) - int(np.isnat(times).sum())]
+        self._row_offsets = offsets
+        self._results = concat_frames(frames)
+
+    @property
+    def filter_index(self) -> FilterIndex:
+        """results上的筛选索引（首次筛选时生成）"""
+        if self._filter_index is None:
+            results = self.results
+            with self._lock:
+                if self._filter_index is None:
+                    self._filter_index = FilterIndex(self.runs, results, self._ordered_run_ids, self._row_offsets)
+        return self._filter_index
+
+    def row_range(self, start=None, end=None) -> tuple:
+        """
+        日期范围[start, end]在results中对应的行范围[lo, hi)
+
+        results按run时间排序，只需在run时间上二分查找，不必为每一行计算日期掩码；
+        指定了任一端时不包含缺失时间的run，与按列比较的结果一致
+        """
+        self.results
+        times = self._run_times
+        lo = 0 if start is None else int(np.searchsorted(times, np.datetime64(start).astype(times.dtype), 'left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, np.datetime64(end).astype(times.dtype), 'right'))
+        return int(self._row_offsets[lo]), int(self._row_offsets[max(lo, hi)])
+
+    @property
+    def view(self) -> pd.DataFrame:
+        """runs表按run_id关联回内存中查询结果后的宽表"""
+        if self._view is None:
+            results = self.results
+            with self._lock:
+                if self._view is None:
+                    self._view = join_runs(self.runs, results)
+        return self._view
+
+    @property
+    def record_count(self) -> int:
+        return sum(len(part) for part in self.partitions.values()) + sum(rows for _, rows in self.cold.values())
+
+    def cold_refs(self, run_ids=None) -> Dict[int, tuple]:
+        """被选中的冷数据run（run_ids为None表示所有run）"""
+        if not self.cold or run_ids is None:
+            return self.cold
+        return {int(run_id): self.cold[int(run_id)] for run_id in run_ids if int(run_id) in self.cold}
+
+    def load_results(self, run_ids=None) -> pd.DataFrame:
+        """
+        获取查询结果：内存中的分区加上被选中的冷数据run（按需从磁盘读取）
+
+        run_ids为None时返回所有run；返回的内存分区部分未按run_ids筛选，由调用方按run_id筛选
+        """
+        refs = self.cold_refs(run_ids)
+        if not refs:
+            return self.results
+        return concat_frames([self.results] + self.cold_store.read(refs))
+
+
+def _get_ingest_mp_context():
+    """
+    选择工作进程的启动方式
+
+    单线程时优先使用fork，避免子进程重新导入应用模块；后台加载时进程中已有监控等线程，
+    fork可能继承被其他线程持有的锁，此时改用forkserver（默认加载器由get_loader()按需创建，
+    forkserver启动的工作进程重新导入模块时不会创建加载器）
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if 'fork' in methods and threading.active_count() == 1:
+        return multiprocessing.get_context('fork')
+    if 'forkserver' in methods:
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context()
+
+
+def list_run_directories(roots: List[str]):
+    """
+    列出多个根目录下的run目录
+
+    Returns:
+        (目录名 -> 目录路径, 无法访问的根目录列表)；同名目录出现在多个根目录时只保留第一个
+    """
+    dirs: Dict[str, str] = {}
+    failed = []
+    for root in roots:
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        continue
+                    if entry.name in dirs:
+                        logging.warning(f"Duplicate run directory {entry.name} in {root}, "
+                                        f"keeping {os.path.dirname(dirs[entry.name])}")
+                        continue
+                    dirs[entry.name] = entry.path
+        except OSError as e:
+            logging.error(f"Cannot list result root {root}: {str(e)}")
+            failed.append(root)
+    return dirs, failed
+
+
+def sort_newest_first(dir_names):
+    """按目录名中的时间戳从新到旧排序，无法解析时间的目录排在最后"""
+    def sort_key(dir_name):
+        meta = parse_directory_name(dir_name)
+        return meta['datetime'] if meta else datetime.min
+    return sorted(dir_names, key=sort_key, reverse=True)
+
+
 class TSBSDataLoader:
-    def __init__(self, base_path: str) -> None:
-        self.base_path = base_path
-        self.df: pd.DataFrame = pd.DataFrame()  # 修复类型注解
+    def __init__(self, base_path: Union[str, List[str]], ingest_workers: Optional[int] = None,
+                 cache_dir: Optional[str] = None, background_load: bool = False,
+                 memory_budget_mb: Optional[float] = None, watch_mode: Optional[str] = None,
+                 reconcile_interval: Optional[float] = None) -> None:
+        # 结果根目录：可以是多个磁盘或挂载点，每个根目录独立扫描、监控，并有各自的加载队列和工作线程
+        self.base_paths: List[str] = [base_path] if isinstance(base_path, str) else list(base_path)
+        self.base_path = self.base_paths[0]
+        self._root_index = {os.path.normpath(root): root for root in self.base_paths}
+        self._dir_roots: Dict[str, str] = {}  # 目录名 -> 所在根目录
+        self.root_stats: Dict[str, Dict[str, Any]] = {
+            root: {'dirs_loaded': 0, 'rows_loaded': 0, 'load_seconds': 0.0, 'failed': 0} for root in self.base_paths
+        }
+        # 规范化存储：每个目录一行的runs维度表（目录元数据和导入速度）加上只含查询结果的results事实表，
+        # 两者通过整数run_id关联，避免把目录元数据复制到每个查询结果行
+        self.runs: pd.DataFrame = pd.DataFrame()
+        self._next_run_id = 1
+        # 查询结果按run_id分区保存，刷新或删除目录只替换/丢弃对应分区，不重建整个数据集
+        self._partitions: Dict[int, pd.DataFrame] = {}
+        self._categories: Dict[str, pd.Index] = {}  # 分区共用的分类字典（只追加），合并时无需重新编码
+        # 当前发布的不可变快照，版本号随每次数据变化单调递增
+        self._snapshot = DataSnapshot(0, self.runs, {})
+        # 筛选选项的分面索引，随目录加载和删除增量更新
+        self.facets = FacetIndex()
+        self.group_aggregates = GroupAggregates()
         self.last_scan_time = time.time()
         self.lock = threading.RLock()  # 使用RLock避免死锁
         self._save_lock = threading.Lock()  # 在初始化时就创建保存锁
         self._save_pending = False  # 标记是否有待保存的数据
+        
+        # 批量提交：解析完成的目录先进入暂存区，按批次大小或时间间隔统一合并，避免每个目录都复制整个数据集
+        self.commit_batch_size = 256  # 暂存目录数达到该值时立即提交
+        self.commit_interval = 2.0  # 暂存数据最多等待的秒数
+        self._staging: Dict[str, tuple] = {}  # 目录名 -> (目录元数据, 查询结果, 目录指纹)
+        self._commit_timer: Optional[threading.Timer] = None
+        
+        # CSV解析统计：快速路径命中次数和回退到多重尝试解析的次数
+        self.csv_stats = {'csv_fast_path': 0, 'csv_fallback': 0}
         self.known_dirs = set()
         self.required_columns = [
             'branch', 'query_type', 'scale', 'worker', 
@@ -38,34 +783,136 @@ class TSBSDataLoader:
         # 使用线程池管理异步任务，限制线程数量
         self._thread_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tsbs-cache')
         
-        # 设置持久化文件路径 - 使用临时目录避免权限问题
-        temp_dir = tempfile.gettempdir()
-        self.cache_file = os.path.join(temp_dir, '.tsbs_data_cache.pkl')
-        self.metadata_file = os.path.join(temp_dir, '.tsbs_metadata.pkl')
+        # 冷启动并行解析配置：进程数可通过参数或环境变量TSBS_INGEST_WORKERS指定，<=1表示串行
+        if ingest_workers is None:
+            ingest_workers = int(os.environ.get('TSBS_INGEST_WORKERS', 0)) or min(8, os.cpu_count() or 1)
+        self.ingest_workers = max(1, ingest_workers)
+        self._parallel_ingest_threshold = 20  # 目录数少于该值时串行加载，避免进程池启动开销
+        
+        # 设置持久化目录 - 默认使用临时目录避免权限问题
+        # 缓存按目录追加写入不可变段文件，保存新数据的开销只与新增行数相关
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), '.tsbs_cache')
+        self.store = SegmentStore(self.cache_dir)
+        self._unsaved: Dict[str, tuple] = {}  # 已提交但尚未写入缓存段的目录数据：(目录元数据, 查询结果)
+        self._unsaved_removed: Dict[str, int] = {}  # 已删除但尚未记录墓碑的目录及其行数
+        self._cache_rewrite_pending = False  # 强制重新加载后需要整体重写缓存
+        self._fingerprints: Dict[str, Any] = {}  # 已加载目录的文件指纹，用于启动时识别变化的目录
+        
+        # 内存预算：内存中的查询结果超过预算时，把最早的run按月份溢写到磁盘（冷数据），查询时按需读取
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.environ.get('TSBS_MEMORY_BUDGET_MB') or 0) or 512
+        self.memory_budget_mb = memory_budget_mb
+        self._partition_bytes: Dict[int, int] = {}  # run_id -> 内存分区字节数
+        self._hot_bytes = 0
+        self.cold = ColdStore(os.path.join(self.cache_dir, 'cold'))
+        
+        # 文件监控事件进入各根目录的防抖队列，由各自的后台线程等待文件稳定后批量加载，
+        # 较慢的挂载点不会阻塞其他根目录
+        self._ingest_queues: Dict[str, DebouncedIngestQueue] = {
+            root: DebouncedIngestQueue(self.ingest_directories, quiet_period=2.0, name=f'tsbs-ingest-{i}')
+            for i, root in enumerate(self.base_paths)
+        }
+        # 监控方式：targeted只监控顶层目录和未提交run的query_result，recursive递归监控整个目录树
+        self.watch_mode = watch_mode or os.environ.get('TSBS_WATCH_MODE') or 'targeted'
+        self._observers: Dict[str, Any] = {}  # 根目录 -> Observer
+        self._run_watches: Dict[str, RunWatchRegistry] = {}
+        # 定期对账：按目录mtime发现遗漏事件的新增、删除和变化的run（NFS上事件可能丢失），<=0表示关闭
+        if reconcile_interval is None:
+            reconcile_interval = float(os.environ.get('TSBS_RECONCILE_INTERVAL') or 300)
+        self.reconcile_interval = reconcile_interval
+        self._reconcile_mtimes: Dict[str, Dict[str, Optional[int]]] = {}  # 根目录 -> {run目录名: query_result目录的mtime}
+        self._reconcile_stop: Optional[threading.Event] = None
+        self.reconcile_stats = {'sweeps': 0, 'new': 0, 'changed': 0, 'removed': 0, 'last_sweep_seconds': None}
         
         # 添加内存监控
         self._max_memory_mb = 1024  # 最大内存使用限制(MB)
         self._last_gc_time = time.time()
         
-        logging.info(f"Initializing TSBSDataLoader for path: {base_path}")
+        # 初始加载进度，供就绪检查和进度接口使用
+        self._progress: Dict[str, Any] = {
+            'state': 'loading', 'phase': None, 'dirs_total': 0, 'dirs_done': 0,
+            'started_at': time.time(), 'phase_started_at': time.time(), 'finished_at': None, 'error': None
+        }
+        self._ready_event = threading.Event()
+        
+        logging.info(f"Initializing TSBSDataLoader for path: {', '.join(self.base_paths)}")
         
-        # 先尝试加载缓存数据
-        if self.load_cached_data():
-            logging.info("Loaded data from cache")
-            # 检查是否有新的目录需要加载
-            self.load_new_directories()
+        if background_load:
+            # 后台加载：构造函数立即返回，Web服务在加载期间即可响应（返回已加载的部分数据）
+            self.start_file_monitor()
+            threading.Thread(target=self._initial_load, name='tsbs-initial-load', daemon=True).start()
         else:
-            logging.info("No cache found, loading all data")
-            self.load_existing_data()
-            
-        self.start_file_monitor()
-        logging.info("Data loader initialized successfully")
+            self._initial_load()
+            self.start_file_monitor()
+            logging.info("Data loader initialized successfully")
+    
+    def _initial_load(self) -> None:
+        """初始加载：优先加载缓存并按目录指纹对账，没有缓存时加载所有目录（新目录优先）"""
+        try:
+            # 先尝试加载缓存数据
+            self._progress_start('cache', 0)
+            if self.load_cached_data():
+                logging.info("Loaded data from cache")
+                # 根据目录指纹检查新增、变化和删除的目录
+                self.load_new_directories()
+            else:
+                logging.info("No cache found, loading all data")
+                self.load_existing_data()
+            self._progress['state'] = 'ready'
+        except Exception as e:
+            logging.error(f"Initial data loading failed: {str(e)}")
+            self._progress['state'] = 'error'
+            self._progress['error'] = str(e)
+        finally:
+            self._progress['finished_at'] = time.time()
+            self._ready_event.set()
+    
+    def _progress_start(self, phase: str, total: int) -> None:
+        self._progress.update(phase=phase, dirs_total=total, dirs_done=0, phase_started_at=time.time())
+    
+    def _progress_advance(self, count: int = 1) -> None:
+        self._progress['dirs_done'] += count
+    
+    def is_ready(self) -> bool:
+        """初始加载是否已完成"""
+        return self._ready_event.is_set()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready_event.wait(timeout)
+    
+    def get_load_progress(self) -> Dict[str, Any]:
+        """获取初始加载进度：已处理/总目录数、耗时和预计剩余时间"""
+        progress = dict(self._progress)
+        now = progress['finished_at'] or time.time()
+        done = progress['dirs_done']
+        total = progress['dirs_total']
+        phase_elapsed = now - progress.pop('phase_started_at')
+        
+        eta = None
+        if not self.is_ready() and total > 0:
+            eta = phase_elapsed / done * (total - done) if done > 0 else None
+        elif self.is_ready():
+            eta = 0.0
+        
+        progress.update({
+            'ready': self.is_ready(),
+            'percent': round(100.0 * done / total, 1) if total > 0 else (100.0 if self.is_ready() else 0.0),
+            'elapsed_seconds': round(now - progress['started_at'], 2),
+            'eta_seconds': round(eta, 2) if eta is not None else None,
+            'records_count': self._snapshot.record_count,
+            'data_version': self._snapshot.version
+        })
+        return progress
     
     def __del__(self):
         """析构函数，确保线程池正确关闭"""
         try:
+            for queue in getattr(self, '_ingest_queues', {}).values():
+                queue.stop(timeout=0)
             if hasattr(self, '_thread_pool'):
                 self._thread_pool.shutdown(wait=False)
+            if hasattr(self, 'cold'):
+                self.cold.close()
         except:
             pass
     
@@ -93,254 +940,107 @@ class TSBSDataLoader:
     
     def parse_directory_name(self, dir_name):
         """解析目录名提取元数据，增加容错处理"""
-        try:
-            # 更灵活的正则表达式，适应不同格式
-            pattern = r'(\d{4})_(\d{2})(\d{2})_(\d{6})_(.*?)_scale(\d+)_cluster(\d+)_([a-zA-Z]+?\d*)_([a-zA-Z]+)_(wal\d+)_replica(\d+)_dop(\d+)'
-            match = re.match(pattern, dir_name)
-            if not match:
-                # 尝试更宽松的匹配
-                pattern = r'(\d{4})_(\d{2})(\d{2})_(\d{6})_(.*?)_scale(\d+)_cluster(\d+)_.+_dop(\d+)'
-                match = re.match(pattern, dir_name)
-                if not match:
-                    logging.warning(f"Directory name pattern mismatch: {dir_name}")
-                    return None
-                
-                return {
-                    'year': int(match.group(1)),
-                    'month': int(match.group(2)),
-                    'day': int(match.group(3)),
-                    'time': match.group(4),
-                    'branch': match.group(5),
-                    'scale': int(match.group(6)),
-                    'cluster': int(match.group(7)),
-                    'dop': int(match.group(8)),
-                    'phase': 'unknown',  # 宽松匹配中无法获取phase，设为unknown
-                    'dir_name': dir_name,
-                    'datetime': datetime.strptime(
-                        f"{match.group(1)}{match.group(2)}{match.group(3)}_{match.group(4)}", 
-                        '%Y%m%d_%H%M%S'
-                    )
-                }
-                
-            return {
-                'year': int(match.group(1)),
-                'month': int(match.group(2)),
-                'day': int(match.group(3)),
-                'time': match.group(4),
-                'branch': match.group(5),
-                'scale': int(match.group(6)),
-                'cluster': int(match.group(7)),
-                'test_type': match.group(8),
-                'phase': match.group(9),
-                'wal': match.group(10),
-                'replica': int(match.group(11)),
-                'dop': int(match.group(12)),
-                'dir_name': dir_name,
-                'datetime': datetime.strptime(
-                    f"{match.group(1)}{match.group(2)}{match.group(3)}_{match.group(4)}", 
-                    '%Y%m%d_%H%M%S'
-                )
-            }
-        except Exception as e:
-            logging.error(f"Error parsing directory name {dir_name}: {str(e)}")
-            return None
+        return parse_directory_name(dir_name)
     
     def validate_dataframe(self, df):
         """验证数据框是否包含必需的列"""
-        missing_cols = [col for col in self.required_columns if col not in df.columns]
-        if missing_cols:
-            logging.warning(f"Missing required columns: {', '.join(missing_cols)}")
-            return False
-            
-        if df.empty:
-            logging.warning("DataFrame is empty")
-            return False
-            
-        return True
+        return validate_dataframe(df, self.required_columns)
     
     def robust_csv_loader(self, csv_path):
         """强大的CSV加载器，处理各种格式问题"""
-        # 尝试1: 使用Python csv模块手动解析
-        try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                header = next(reader)
-                data = list(reader)
-            
-            # 如果标题行只有一个元素，尝试分割
-            if len(header) == 1:
-                header = header[0].split(',')
-                
-            # 创建DataFrame
-            df = pd.DataFrame(data, columns=pd.Index(header))
-            return df
-        except Exception as e:
-            logging.warning(f"Manual CSV parsing failed: {str(e)}")
-        
-        # 尝试2: 使用pandas自动检测分隔符
-        try:
-            return pd.read_csv(csv_path, sep=None, engine='python', encoding='utf-8')
-        except:
-            pass
-        
-        # 尝试3: 使用不同编码
-        encodings = ['utf-8', 'utf-8-sig', 'latin1', 'iso-8859-1']
-        for encoding in encodings:
-            try:
-                return pd.read_csv(csv_path, sep=',', encoding=encoding)
-            except:
-                continue
-        
-        # 尝试4: 作为纯文本处理并分割
-        try:
-            with open(csv_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # 跳过空行
-            lines = [line.strip() for line in lines if line.strip()]
-            header = lines[0].split(',')
-            data = [line.split(',') for line in lines[1:]]
-            
-            # 确保所有行长度相同
-            max_cols = len(header)
-            for i, row in enumerate(data):
-                if len(row) < max_cols:
-                    data[i] = row + [''] * (max_cols - len(row))
-                elif len(row) > max_cols:
-                    data[i] = row[:max_cols]
-            
-            return pd.DataFrame(data, columns=pd.Index(header))
-        except Exception as e:
-            logging.error(f"All CSV parsing methods failed: {str(e)}")
-            return pd.DataFrame()
+        return robust_csv_loader(csv_path)
+    
+    def _root_of(self, dir_path: str) -> str:
+        """run目录所在的根目录（run目录是根目录的直接子目录）"""
+        parent = os.path.dirname(os.path.normpath(dir_path))
+        return self._root_index.get(parent, parent)
+    
+    def _queue_for(self, dir_path: str) -> DebouncedIngestQueue:
+        """run目录所在根目录的加载队列"""
+        return self._ingest_queues.get(self._root_of(dir_path)) or self._ingest_queues[self.base_paths[0]]
+    
+    def _record_root_stats(self, root: str, parsed: Optional[tuple], seconds: float = 0.0) -> None:
+        """累计根目录的加载吞吐统计"""
+        stats = self.root_stats.setdefault(root, {'dirs_loaded': 0, 'rows_loaded': 0, 'load_seconds': 0.0, 'failed': 0})
+        stats['load_seconds'] += seconds
+        if parsed is None:
+            stats['failed'] += 1
+        else:
+            stats['dirs_loaded'] += 1
+            stats['rows_loaded'] += len(parsed[1])
     
     def load_single_directory(self, dir_path):
-        """加载单个目录的数据，增加健壮性处理"""
+        """加载单个目录的数据并放入暂存区，由批量提交统一合并到数据集"""
         dir_name = os.path.basename(dir_path)
+        root = self._root_of(dir_path)
+        
+        start_time = time.time()
+        stats = {}
+        fingerprint = directory_fingerprint(dir_path)
+        parsed = load_result_directory(dir_path, self.required_columns, stats=stats)
+        self._record_csv_stats(stats)
+        self._record_root_stats(root, parsed, time.time() - start_time)
+        if parsed is None:
+            return
         
-        # 防止重复加载同一目录
+        self._stage_run(dir_name, parsed, fingerprint, root)
+    
+    def ingest_directories(self, dir_paths: List[str]) -> None:
+        """加载一批目录（各根目录防抖队列的回调），整批只提交一次"""
+        start_time = time.time()
+        for dir_path in dir_paths:
+            logging.info(f"Loading new or modified directory: {dir_path}")
+            self.load_single_directory(dir_path)
+        self.commit_staged()
+        root = self._root_of(dir_paths[0]) if dir_paths else self.base_path
+        logging.info(f"Ingested {len(dir_paths)} queued directories from {root} in {time.time() - start_time:.2f}s")
+    
+    def _record_csv_stats(self, stats: Dict[str, int]) -> None:
+        """累计CSV解析统计"""
+        for key, count in stats.items():
+            self.csv_stats[key] = self.csv_stats.get(key, 0) + count
+    
+    def _stage_run(self, dir_name: str, parsed: tuple, fingerprint: Any = None, root: Optional[str] = None) -> None:
+        """暂存单个目录的解析结果，达到批次大小时立即提交，否则等待定时提交"""
         with self.lock:
+            if root is not None:
+                self._dir_roots[dir_name] = root
             if dir_name in self.known_dirs:
                 logging.info(f"Directory already loaded, refreshing data: {dir_name}")
-                # 先移除旧数据
-                filtered_df = self.df[self.df['dir_name'] != dir_name]
-                self.df = filtered_df.copy() if isinstance(filtered_df, pd.DataFrame) else pd.DataFrame()
-                self.known_dirs.discard(dir_name)
-        
-        meta = self.parse_directory_name(dir_name)
-        if not meta:
-            logging.warning(f"Skipping directory due to parse failure: {dir_name}")
-            return
-            
-        csv_path = os.path.join(dir_path, 'query_result', 'TSBS_TEST_RESULT.csv')
-        if not os.path.exists(csv_path):
-            logging.warning(f"CSV file not found: {csv_path}")
-            return
+            # 同一目录的重复事件只保留最新结果
+            run, results = parsed
+            self._staging[dir_name] = (run, results, fingerprint)
             
-        try:
-            # 使用强大的CSV加载器
-            df_new = self.robust_csv_loader(csv_path)
+            if len(self._staging) >= self.commit_batch_size:
+                self.commit_staged()
+            elif self._commit_timer is None:
+                self._commit_timer = threading.Timer(self.commit_interval, self.commit_staged)
+                self._commit_timer.daemon = True
+                self._commit_timer.start()
+    
+    def commit_staged(self) -> None:
+        """将暂存区中的所有目录一次性合并到数据集"""
+        with self.lock:
+            if self._commit_timer is not None:
+                self._commit_timer.cancel()
+                self._commit_timer = None
             
-            if df_new.empty:
-                logging.error(f"Failed to load CSV: {csv_path}")
+            if not self._staging:
                 return
-                
-            # 只在调试模式下输出详细列信息
-            logging.debug(f"Loaded CSV from {csv_path}. Columns: {df_new.columns.tolist()}")
-            
-            # 标准化列名（移除空格和下划线）
-            df_new.columns = df_new.columns.str.strip().str.replace(' ', '_').str.lower()
-            
-            # 重命名列以适应标准化
-            column_mapping = {
-                'query_type': 'query_type',
-                'query-type': 'query_type',
-                'querytype': 'query_type',
-                'query': 'query_type',
-                'min(ms)': 'min_ms',
-                'mean(ms)': 'mean_ms',
-                'max(ms)': 'max_ms',
-                'med(ms)': 'med_ms',
-                'worker': 'worker',
-                'scale': 'scale',
-                'query_count': 'query_count'
-            }
             
-            # 应用列名映射
-            df_new.rename(columns=lambda x: column_mapping.get(x, x), inplace=True)
-            
-            # 只在调试模式下输出详细列信息  
-            logging.debug(f"After renaming columns: {df_new.columns.tolist()}")
-            
-            # 添加元数据列
-            for key, value in meta.items():
-                df_new[key] = value
+            staged = self._staging
+            self._staging = {}
             
-            # 新增：提取导入速度import_speed
-            import_speed = None
             try:
-                load_result_dir = os.path.join(dir_path, 'load_result')
-                if os.path.isdir(load_result_dir):
-                    for fname in os.listdir(load_result_dir):
-                        if fname.endswith('.log'):
-                            log_path = os.path.join(load_result_dir, fname)
-                            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                for line in f:
-                                    m = re.search(r'actually rate ([\d.]+) rows/sec without ddl time', line)
-                                    if m:
-                                        import_speed = float(m.group(1))
-                                        break
-                        if import_speed is not None:
-                            break
-            except Exception as e:
-                logging.warning(f"Error extracting import_speed from log: {str(e)}")
-            df_new['import_speed'] = import_speed
-            
-            numeric_cols = ['min_ms', 'mean_ms', 'max_ms', 'med_ms', 'worker', 'query_count', 'scale', 'cluster', 'dop', 'replica', 'import_speed']
-            for col in numeric_cols:
-                if col in df_new.columns:
-                    try:
-                        df_new[col] = pd.to_numeric(df_new[col], errors='coerce')
-                    except Exception as e:
-                        logging.warning(f"Error converting column {col} to numeric: {str(e)}")
-            
-            # 验证数据
-            if not self.validate_dataframe(df_new):
-                logging.error(f"Validation failed for {csv_path}")
-                # 尝试修复缺失列
-                for col in self.required_columns:
-                    if col not in df_new.columns:
-                        df_new[col] = None
-                        logging.warning(f"Added missing column: {col}")
-                
-                # 再次验证
-                if not self.validate_dataframe(df_new):
-                    logging.error(f"Validation still failed, skipping directory: {dir_name}")
-                    return
-                
-            with self.lock:
-                # 使用更高效的concat方式
-                if not self.df.empty:
-                    self.df = pd.concat([self.df, df_new], ignore_index=True, copy=False)
-                else:
-                    self.df = df_new.copy()
+                self._commit_runs(staged)
+                logging.debug(f"Committed {len(staged)} staged directories")
                 
-                self.known_dirs.add(dir_name)
-                logging.debug(f"Successfully loaded data from: {dir_name}")
-                
-                # 标记需要保存缓存
-                self._save_pending = True
-                
-                # 使用线程池异步保存缓存，避免创建过多线程
+                # 每个批次只提交一次延迟保存任务
                 self._thread_pool.submit(self._delayed_save_cache)
-                
-                # 检查内存使用
-                self._check_memory_usage()
-                
-        except Exception as e:
-            logging.error(f"Error loading {csv_path}: {str(e)}")
-            import traceback
-            logging.error(traceback.format_exc())
+            except Exception as e:
+                logging.error(f"Error committing staged directories: {str(e)}")
+                import traceback
+                logging.error(traceback.format_exc())
     
     def _delayed_save_cache(self):
         """延迟保存缓存，避免频繁保存"""
@@ -349,103 +1049,271 @@ class TSBSDataLoader:
             self.save_cache()
     
     def load_existing_data(self):
-        """加载所有现有数据，增加进度日志"""
-        if not os.path.exists(self.base_path):
-            logging.error(f"Base path does not exist: {self.base_path}")
-            return
-            
-        dir_list = [d for d in os.listdir(self.base_path) 
-                   if os.path.isdir(os.path.join(self.base_path, d))]
+        """加载所有根目录中的现有数据，目录较多时使用进程池并行解析，输出进度和耗时日志"""
+        dir_paths_by_name, _ = list_run_directories(self.base_paths)
+        
+        # 所有根目录的目录按目录名中的时间戳从新到旧加载，最近的数据最先可用
+        dir_list = sort_newest_first(dir_paths_by_name)
         total = len(dir_list)
+        self._progress_start('load', total)
         
         # 只在有大量目录时才显示详细进度信息
         if total > 50:
             logging.debug(f"Found {total} directories to load")
         
-        for i, dir_name in enumerate(dir_list):
-            dir_path = os.path.join(self.base_path, dir_name)
-            self.load_single_directory(dir_path)
-            
-            # 减少进度日志的频率：每处理50个目录才显示一次进度
-            if total > 50 and ((i + 1) % 50 == 0 or (i + 1) == total):
-                logging.debug(f"Loading progress: {i+1}/{total} directories processed")
+        start_time = time.time()
+        workers = self.ingest_workers if total >= self._parallel_ingest_threshold else 1
+        
+        if workers > 1:
+            dir_paths = [dir_paths_by_name[d] for d in dir_list]
+            if not self._load_directories_parallel(dir_paths, workers):
+                workers = 1
+        
+        if workers <= 1:
+            self._progress_start('load', total)
+            for i, dir_name in enumerate(dir_list):
+                self.load_single_directory(dir_paths_by_name[dir_name])
+                self._progress_advance()
+                
+                # 减少进度日志的频率：每处理50个目录才显示一次进度
+                if total > 50 and ((i + 1) % 50 == 0 or (i + 1) == total):
+                    logging.debug(f"Loading progress: {i+1}/{total} directories processed")
         
-        # 完成时输出总结信息
+        self.commit_staged()
+        
+        # 完成时输出总结信息（包含吞吐量，便于对比串行/并行加载速度）
         if total > 0:
-            logging.info(f"Data loading completed: {total} directories processed, {len(self.df)} records loaded")
+            elapsed = time.time() - start_time
+            rate = total / elapsed if elapsed > 0 else float(total)
+            logging.info(f"Data loading completed: {total} directories processed in {elapsed:.2f}s "
+                         f"({rate:.1f} dirs/sec, workers={workers}), {self._snapshot.record_count} records loaded")
+            if self.csv_stats.get('csv_fallback'):
+                logging.info(f"CSV fast path fell back to robust loader {self.csv_stats['csv_fallback']} times")
             # 使用线程池异步保存缓存
             self._thread_pool.submit(self.save_cache)
     
+    def _load_directories_parallel(self, dir_paths: List[str], workers: int) -> bool:
+        """使用进程池并行解析目录（CSV及load_result日志），解析结果交给主进程按批次提交"""
+        total = len(dir_paths)
+        chunksize = max(1, min(64, total // (workers * 4)))
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_get_ingest_mp_context()) as pool:
+                results = pool.map(_load_result_directory_task, dir_paths, chunksize=chunksize)
+                for i, (dir_path, (dir_name, parsed, stats, fingerprint)) in enumerate(zip(dir_paths, results)):
+                    self._progress_advance()
+                    self._record_csv_stats(stats)
+                    # 并行解析的耗时无法按根目录拆分，只统计目录数和行数
+                    root = self._root_of(dir_path)
+                    self._record_root_stats(root, parsed)
+                    if parsed is not None:
+                        self._stage_run(dir_name, parsed, fingerprint, root)
+                    
+                    if total > 50 and ((i + 1) % 500 == 0 or (i + 1) == total):
+                        logging.debug(f"Parallel loading progress: {i+1}/{total} directories parsed")
+        except Exception as e:
+            logging.error(f"Parallel loading failed, falling back to serial loading: {str(e)}")
+            return False
+        
+        return True
+    
+    def _commit_runs(self, staged: Dict[str, tuple]) -> None:
+        """将多个目录的解析结果一次性合并：目录元数据追加到runs表，查询结果追加到results表"""
+        if not staged:
+            return
+        
+        with self.lock:
+            # 已加载过的目录先移除旧数据，保证刷新语义一致；新旧数据在同一个快照中替换，读者不会看到run暂时缺失
+            stale_dirs = self.known_dirs.intersection(staged)
+            if stale_dirs:
+                self._drop_runs(stale_dirs, publish=False)
+            
+            records = []
+            frames = []
+            for dir_name, (run, results, fingerprint) in staged.items():
+                run = dict(run, run_id=self._next_run_id)
+                self._next_run_id += 1
+                results = results.assign(run_id=np.full(len(results), run['run_id'], dtype=np.int32))
+                records.append(run)
+                frames.append(results)
+                
+                # 记录待写入缓存段的目录
+                self._unsaved[dir_name] = (run, results)
+                self._unsaved_removed.pop(dir_name, None)
+                self._fingerprints[dir_name] = fingerprint
+            
+            # 分类列与现有数据共用同一份字典，合并后保持紧凑类型
+            self._share_categories(frames)
+            for run, results in zip(records, frames):
+                self._add_partition(run['run_id'], results)
+                self.facets.add_run(run['run_id'], run, results)
+            new_runs = build_runs_frame(records)
+            self.group_aggregates.add_runs(new_runs, frames)
+            self.runs = concat_frames([self.runs, new_runs])
+            self.known_dirs.update(staged)
+            self._enforce_memory_budget()
+            self._publish()
+            self._save_pending = True
+            self._check_memory_usage()
+        
+        for registry in list(self._run_watches.values()):
+            # 已提交的run不再需要临时watch；observer分发事件时持有自身的锁并可能等待加载器的锁，
+            # 因此在线程池中移除，不在持有加载器锁的线程中操作observer
+            self._thread_pool.submit(registry.release, list(staged))
+    
+    def _add_partition(self, run_id: int, results: pd.DataFrame) -> None:
+        """登记内存分区并累计内存占用（调用方持有锁）"""
+        self._partitions[run_id] = results
+        nbytes = frame_nbytes(results)
+        self._partition_bytes[run_id] = nbytes
+        self._hot_bytes += nbytes
+    
+    def _pop_partition(self, run_id: int) -> int:
+        """移除run的内存分区或冷数据，返回移除的行数（调用方持有锁）"""
+        partition = self._partitions.pop(run_id, None)
+        self._hot_bytes -= self._partition_bytes.pop(run_id, 0)
+        if partition is not None:
+            return len(partition)
+        return self.cold.remove([run_id])
+    
+    def _enforce_memory_budget(self) -> None:
+        """
+        内存中的查询结果超过预算时，从最早的run开始溢写到磁盘，直到降到预算的80%以下
+        
+        同一个月份的run写入同一个冷数据文件；调用方持有锁，并在之后发布新快照
+        """
+        budget = self.memory_budget_mb * 1024 * 1024
+        if self._hot_bytes <= budget or self.runs.empty:
+            return
+        
+        target = budget * 0.8
+        hot = self.runs[self.runs['run_id'].isin(list(self._partitions))]
+        hot = hot.sort_values('datetime', kind='stable')
+        evicted: Dict[str, Dict[int, pd.DataFrame]] = {}
+        hot_bytes = self._hot_bytes
+        for run_id, run_time in zip(hot['run_id'].tolist(), hot['datetime'].tolist()):
+            if hot_bytes <= target:
+                break
+            label = run_time.strftime('%Y%m') if not pd.isna(run_time) else 'unknown'
+            evicted.setdefault(label, {})[run_id] = self._partitions[run_id]
+            hot_bytes -= self._partition_bytes.get(run_id, 0)
+        
+        spilled = 0
+        for label, partitions in evicted.items():
+            try:
+                self.cold.spill(partitions, label)
+            except Exception as e:
+                logging.error(f"Failed to spill cold partitions for {label}: {str(e)}")
+                continue
+            for run_id in partitions:
+                del self._partitions[run_id]
+                self._hot_bytes -= self._partition_bytes.pop(run_id, 0)
+            spilled += len(partitions)
+        
+        if spilled:
+            logging.info(f"Memory budget {self.memory_budget_mb}MB exceeded: spilled {spilled} runs "
+                         f"({', '.join(sorted(evicted))}) to disk, "
+                         f"{self._hot_bytes / 1024 / 1024:.1f}MB kept in memory")
+    
+    def _share_categories(self, frames: List[pd.DataFrame]) -> None:
+        """让新分区的分类列使用分区共用的字典（新类别追加在末尾，已有分区的编码保持有效）"""
+        template = pd.DataFrame({col: pd.Categorical([], categories=categories)
+                                 for col, categories in self._categories.items()})
+        unify_categories([template] + frames)
+        for frame in frames:
+            for col in frame.columns:
+                if isinstance(frame[col].dtype, pd.CategoricalDtype):
+                    self._categories[col] = frame[col].cat.categories
+    
+    def _publish(self) -> None:
+        """数据变化后发布新版本快照（调用方持有锁），替换引用本身是原子操作"""
+        self._snapshot = DataSnapshot(self._snapshot.version + 1, self.runs, dict(self._partitions),
+                                      self.cold.refs(), self.cold, self.group_aggregates.buckets)
+    
+    def _drop_runs(self, dir_names, publish: bool = True) -> int:
+        """丢弃目录对应的分区并从runs表中移除，返回移除的查询结果行数；publish为False时由调用方发布快照"""
+        with self.lock:
+            if self.runs.empty:
+                return 0
+            dropped = self.runs['dir_name'].isin(dir_names)
+            if not dropped.any():
+                return 0
+            removed_rows = 0
+            run_ids = [int(run_id) for run_id in self.runs.loc[dropped, 'run_id']]
+            for run_id in run_ids:
+                removed_rows += self._pop_partition(run_id)
+                self.facets.remove_run(run_id)
+            self.group_aggregates.remove_runs(run_ids)
+            self.runs = self.runs[~dropped]
+            if publish:
+                self._publish()
+            return removed_rows
+    
+    @property
+    def results(self) -> pd.DataFrame:
+        """当前快照中所有run的results表（包括按需读取的冷数据）"""
+        return self._snapshot.load_results()
+    
+    @property
+    def version(self) -> int:
+        """当前数据版本号，每次加载、刷新或删除目录后递增"""
+        return self._snapshot.version
+    
+    def get_snapshot(self) -> DataSnapshot:
+        """获取当前数据快照（零拷贝，无需加锁）"""
+        return self._snapshot
+    
     def remove_directory_data(self, dir_path):
         """移除被删除目录的数据"""
         dir_name = os.path.basename(dir_path)
         with self.lock:
+            # 尚未提交的暂存数据也一并丢弃
+            self._staging.pop(dir_name, None)
             if dir_name in self.known_dirs:
-                before_count = len(self.df)
-                filtered_df = self.df[self.df['dir_name'] != dir_name]
-                self.df = filtered_df.copy() if isinstance(filtered_df, pd.DataFrame) else pd.DataFrame()
+                removed_rows = self._drop_runs([dir_name])
                 self.known_dirs.discard(dir_name)
-                after_count = len(self.df)
-                logging.info(f"Removed data for deleted directory: {dir_name}, rows removed: {before_count - after_count}")
+                # 缓存中只记录墓碑，不重写已有段
+                self._unsaved.pop(dir_name, None)
+                self._unsaved_removed[dir_name] = removed_rows
+                self._fingerprints.pop(dir_name, None)
+                self._dir_roots.pop(dir_name, None)
+                logging.info(f"Removed data for deleted directory: {dir_name}, rows removed: {removed_rows}")
                 # 使用线程池异步保存缓存
                 self._thread_pool.submit(self.save_cache)
             else:
                 logging.info(f"Deleted directory not in known_dirs: {dir_name}")
 
     def start_file_monitor(self):
-        """启动文件系统监控，监控TSBS_TEST_RESULT.csv文件的生成和删除"""
-        if not os.path.exists(self.base_path):
-            logging.error(f"Cannot start file monitor, path does not exist: {self.base_path}")
-            return
-            
+        """
+        启动文件系统监控，监控TSBS_TEST_RESULT.csv文件的生成和删除
+        
+        每个根目录使用独立的observer和加载队列。
+        targeted模式（默认）只非递归监控顶层目录，新run目录出现时临时监控其query_result，
+        CSV提交后移除，watch数量只与未提交的run数相关；已提交run的CSV被修改或单独删除不产生事件。
+        recursive模式递归监控整个目录树，每个子目录都占用一个inotify watch
+        """
         class CSVFileHandler(FileSystemEventHandler):
             def __init__(self, loader):
                 self.loader = weakref.ref(loader)  # 使用弱引用避免循环引用
-                self._processing = set()  # 记录正在处理的文件，避免重复处理
             
-            def on_created(self, event):
+            def _enqueue(self, event):
                 loader = self.loader()
                 if loader is None:
                     return
                     
                 if not event.is_directory and str(event.src_path).endswith('TSBS_TEST_RESULT.csv'):
-                    if event.src_path in self._processing:
-                        return
-                    self._processing.add(event.src_path)
-                    
-                    try:
-                        # 等待文件完全写入
-                        time.sleep(5)
-                        logging.info(f"New CSV file detected: {event.src_path}")
-                        # 获取包含该CSV文件的目录 - CSV文件一定在query_result子目录中
-                        dir_path = os.path.dirname(os.path.dirname(event.src_path))  # 向上两级到主目录
-                        loader.load_single_directory(dir_path)
-                    finally:
-                        self._processing.discard(event.src_path)
+                    # 只登记到防抖队列，不在observer线程中等待或解析；同一目录的重复事件会被合并
+                    # CSV文件一定在query_result子目录中，向上两级到主目录
+                    dir_path = os.path.dirname(os.path.dirname(event.src_path))
+                    logging.debug(f"CSV file event queued: {event.src_path}")
+                    loader._queue_for(dir_path).submit(dir_path)
+            
+            def on_created(self, event):
+                self._enqueue(event)
             
             def on_modified(self, event):
-                loader = self.loader()
-                if loader is None:
-                    return
-                    
-                if not event.is_directory and str(event.src_path).endswith('TSBS_TEST_RESULT.csv'):
-                    if event.src_path in self._processing:
-                        return
-                    self._processing.add(event.src_path)
-                    
-                    try:
-                        # CSV文件被修改时重新加载
-                        time.sleep(2)
-                        logging.info(f"CSV file modified: {event.src_path}")
-                        # CSV文件一定在query_result子目录中
-                        dir_path = os.path.dirname(os.path.dirname(event.src_path))  # 向上两级到主目录
-                        # 先移除旧数据再重新加载
-                        dir_name = os.path.basename(dir_path)
-                        if dir_name in loader.known_dirs:
-                            loader.remove_directory_data(dir_path)
-                        loader.load_single_directory(dir_path)
-                    finally:
-                        self._processing.discard(event.src_path)
+                # 重新加载时，旧数据在批量提交时被替换
+                self._enqueue(event)
             
             def on_deleted(self, event):
                 loader = self.loader()
@@ -456,89 +1324,385 @@ class TSBSDataLoader:
                     logging.info(f"CSV file deleted: {event.src_path}")
                     # 获取包含该CSV文件的目录并移除数据 - CSV文件一定在query_result子目录中
                     dir_path = os.path.dirname(os.path.dirname(event.src_path))  # 向上两级到主目录
+                    loader._queue_for(dir_path).discard(dir_path)
                     loader.remove_directory_data(dir_path)
                 elif event.is_directory:
                     # 目录被删除时也要移除数据
                     logging.info(f"Directory deleted: {event.src_path}")
+                    loader._queue_for(event.src_path).discard(event.src_path)
                     loader.remove_directory_data(event.src_path)
         
+        class TargetedRunHandler(CSVFileHandler):
+            """定向模式：顶层目录中出现新run目录、run目录中出现query_result时注册临时watch"""
+            
+            def __init__(self, loader, root):
+                super().__init__(loader)
+                self.root = root
+            
+            def _watch(self, dir_path):
+                loader = self.loader()
+                registry = loader._run_watches.get(self.root) if loader is not None else None
+                if registry is None:
+                    return
+                if registry.watch_run(dir_path):
+                    loader._queue_for(dir_path).submit(dir_path)
+            
+            def _on_directory(self, path):
+                path = str(path)
+                parent = os.path.dirname(path)
+                if os.path.normpath(parent) == os.path.normpath(self.root):
+                    self._watch(path)
+                elif os.path.basename(path) == 'query_result':
+                    self._watch(parent)
+            
+            def on_created(self, event):
+                if event.is_directory:
+                    self._on_directory(event.src_path)
+                else:
+                    self._enqueue(event)
+            
+            def on_moved(self, event):
+                # run目录或CSV被移动（重命名）到监控范围内
+                if event.is_directory:
+                    self._on_directory(event.dest_path)
+                elif str(event.dest_path).endswith('TSBS_TEST_RESULT.csv'):
+                    loader = self.loader()
+                    if loader is not None:
+                        dir_path = os.path.dirname(os.path.dirname(str(event.dest_path)))
+                        loader._queue_for(dir_path).submit(dir_path)
+            
+            def on_deleted(self, event):
+                super().on_deleted(event)
+                loader = self.loader()
+                registry = loader._run_watches.get(self.root) if loader is not None else None
+                if registry is not None and event.is_directory:
+                    registry.release([os.path.basename(str(event.src_path))])
+        
+        for root in self.base_paths:
+            if root in self._observers:
+                continue
+            if not os.path.exists(root):
+                logging.error(f"Cannot start file monitor, path does not exist: {root}")
+                continue
+            try:
+                self._ingest_queues[root].start()
+                observer = Observer()
+                if self.watch_mode == 'recursive':
+                    # 递归监控，以便捕获深层目录中的CSV文件变化
+                    observer.schedule(CSVFileHandler(self), root, recursive=True)
+                else:
+                    event_handler = TargetedRunHandler(self, root)
+                    self._run_watches[root] = RunWatchRegistry(observer, event_handler)
+                    observer.schedule(event_handler, root, recursive=False)
+                observer.start()
+                self._observers[root] = observer
+                if root in self._run_watches:
+                    self._watch_pending_runs(root)
+                logging.info(f"File system monitoring started for {root} ({self.watch_mode} mode, "
+                             f"{len(observer.emitters)} watches)")
+            except Exception as e:
+                logging.error(f"Failed to start file monitor for {root}: {str(e)}")
+        self._start_reconciler()
+    
+    def _watch_pending_runs(self, root: str) -> None:
+        """定向模式启动时，为还没有生成CSV的run目录（正在运行的测试）注册临时watch"""
+        registry = self._run_watches[root]
+        watched = 0
         try:
-            event_handler = CSVFileHandler(self)
-            observer = Observer()
-            # 递归监控，以便捕获深层目录中的CSV文件变化
-            observer.schedule(event_handler, self.base_path, recursive=True)
-            observer.start()
-            logging.info("File system monitoring started (monitoring CSV files)")
-        except Exception as e:
-            logging.error(f"Failed to start file monitor: {str(e)}")
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if not entry.is_dir() or parse_directory_name(entry.name) is None:
+                        continue
+                    if os.path.exists(os.path.join(entry.path, 'query_result', 'TSBS_TEST_RESULT.csv')):
+                        continue
+                    if registry.watch_run(entry.path):
+                        # 扫描期间CSV刚好生成
+                        self._ingest_queues[root].submit(entry.path)
+                    watched += 1
+        except OSError as e:
+            logging.error(f"Error scanning {root} for pending runs: {str(e)}")
+        if watched:
+            logging.info(f"Watching {watched} runs without results yet in {root}")
     
-    def get_data(self):
-        """获取当前数据集（线程安全）"""
+    def get_watch_info(self) -> Dict[str, Any]:
+        """文件监控状态：监控方式、observer上的watch数和等待结果的run数（合计及各根目录）"""
+        roots = []
+        for root in self.base_paths:
+            observer = self._observers.get(root)
+            registry = self._run_watches.get(root)
+            roots.append({
+                'root': root,
+                'running': observer is not None and observer.is_alive(),
+                # recursive模式只有一个watch，但底层会为每个子目录注册inotify watch
+                'active_watches': len(observer.emitters) if observer is not None else 0,
+                'pending_runs': registry.watched_runs() if registry is not None else 0,
+                'queued_dirs': self._ingest_queues[root].pending_count()
+            })
+        return {
+            'mode': self.watch_mode,
+            'running': any(r['running'] for r in roots),
+            'active_watches': sum(r['active_watches'] for r in roots),
+            'pending_runs': sum(r['pending_runs'] for r in roots),
+            'queued_dirs': sum(r['queued_dirs'] for r in roots),
+            'reconcile_interval': self.reconcile_interval,
+            'reconcile': dict(self.reconcile_stats),
+            'roots': roots
+        }
+    
+    def get_ingest_report(self) -> Dict[str, Any]:
+        """
+        各根目录的加载吞吐：已加载目录数、行数、加载耗时和吞吐率，以及加载队列的事件统计
+        
+        load_seconds只统计逐个目录加载（加载队列和串行加载）的耗时，初始并行加载只计入目录数和行数
+        """
+        roots = []
         with self.lock:
-            # 确保返回标准化的列名
-            if 'query_type' not in self.df.columns:
-                # 尝试查找可能的列名变体
-                possible_names = ['query_type', 'query type', 'query-type', 'querytype', 'query']
-                for name in possible_names:
-                    if name in self.df.columns:
-                        self.df = self.df.rename(columns={name: 'query_type'})
-                        break
-            
-            # 确保时间列是datetime类型
-            if 'datetime' in self.df.columns and not pd.api.types.is_datetime64_any_dtype(self.df['datetime']):
-                try:
-                    self.df['datetime'] = pd.to_datetime(self.df['datetime'])
-                except:
-                    pass
-                    
-            return self.df.copy()
+            dirs_per_root: Dict[str, int] = {}
+            for dir_name in self.known_dirs:
+                root = self._dir_roots.get(dir_name)
+                dirs_per_root[root] = dirs_per_root.get(root, 0) + 1
+        for root in self.base_paths:
+            stats = dict(self.root_stats.get(root, {}))
+            seconds = stats.get('load_seconds', 0.0)
+            queue = self._ingest_queues[root]
+            stats.update({
+                'root': root,
+                'reachable': os.path.isdir(root),
+                'runs': dirs_per_root.get(root, 0),
+                'load_seconds': round(seconds, 3),
+                'dirs_per_second': round(stats.get('dirs_loaded', 0) / seconds, 2) if seconds > 0 else None,
+                'rows_per_second': round(stats.get('rows_loaded', 0) / seconds, 1) if seconds > 0 else None,
+                'queued_dirs': queue.pending_count(),
+                'queue': dict(queue.stats)
+            })
+            roots.append(stats)
+        return {'roots': roots}
+    
+    def stop_file_monitor(self) -> None:
+        """停止文件系统监控、对账线程和防抖队列"""
+        observers = getattr(self, '_observers', {})
+        for observer in observers.values():
+            observer.stop()
+        for observer in observers.values():
+            observer.join(timeout=5)
+        self._observers = {}
+        self._run_watches = {}
+        if self._reconcile_stop is not None:
+            self._reconcile_stop.set()
+            self._reconcile_stop = None
+        for queue in self._ingest_queues.values():
+            queue.stop(timeout=5)
+    
+    def _start_reconciler(self) -> None:
+        """为每个根目录启动后台对账线程（线程只持有加载器的弱引用），较慢的挂载点不影响其他根目录"""
+        if self.reconcile_interval <= 0 or self._reconcile_stop is not None:
+            return
+        self._reconcile_stop = threading.Event()
+        for i, root in enumerate(self.base_paths):
+            threading.Thread(target=TSBSDataLoader._reconcile_loop, name=f'tsbs-reconciler-{i}', daemon=True,
+                             args=(weakref.ref(self), self._reconcile_stop, self.reconcile_interval, root)).start()
     
-    def get_options(self):
-        """获取筛选选项，增加空数据保护和强制去重"""
-        df = self.get_data()
-        options = {'branches': [], 'query_types': [], 'scales': [], 'clusters': [], 'execution_types': [], 'workers': []}
+    @staticmethod
+    def _reconcile_loop(loader_ref, stop_event: threading.Event, interval: float, root: str) -> None:
+        while not stop_event.wait(interval):
+            loader = loader_ref()
+            if loader is None:
+                return
+            try:
+                if loader.is_ready():
+                    loader.reconcile_once(root)
+            except Exception as e:
+                logging.error(f"Error reconciling directories in {root}: {str(e)}")
+            finally:
+                del loader
+    
+    def reconcile_once(self, root: Optional[str] = None) -> Dict[str, int]:
+        """
+        对账一次：发现文件监控遗漏的新增、删除和变化的run，交给正常的加载路径
+        
+        只用os.scandir列出顶层目录（不stat），每个run只stat一次query_result目录；
+        query_result的mtime与上次对账相比变化时才计算完整的目录指纹。
+        新增和变化的目录进入防抖加载队列，删除的目录直接移除。
+        第一次对账只记录已加载目录的mtime（启动时已按指纹对账）
+        
+        Args:
+            root: 只对账该根目录，None表示依次对账所有根目录
+        """
+        if root is None:
+            total = {'new': 0, 'changed': 0, 'removed': 0}
+            for base_path in self.base_paths:
+                for key, count in self.reconcile_once(base_path).items():
+                    total[key] += count
+            return total
+        
+        start_time = time.time()
+        with self.lock:
+            root_dirs = {dir_name for dir_name in self.known_dirs if self._dir_roots.get(dir_name) == root}
+            known_dirs = set(self.known_dirs)
+            staged_dirs = set(self._staging)
+            fingerprints = dict(self._fingerprints)
+        
+        previous = self._reconcile_mtimes.get(root)
+        mtimes: Dict[str, Optional[int]] = {}
+        new_dirs, changed_dirs = [], []
+        removed_dirs = set()
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if not entry.is_dir():
+                        continue
+                    try:
+                        mtime = os.stat(os.path.join(entry.path, 'query_result')).st_mtime_ns
+                    except OSError:
+                        mtime = None  # 还没有结果
+                    mtimes[entry.name] = mtime
+                    if mtime is None or entry.name in staged_dirs:
+                        continue
+                    if entry.name not in known_dirs:
+                        # 加载失败的目录在结果变化之前不重复提交
+                        if previous is None or previous.get(entry.name) != mtime:
+                            new_dirs.append(entry.path)
+                    elif previous is not None and previous.get(entry.name, mtime) != mtime:
+                        fingerprint = directory_fingerprint(entry.path)
+                        if fingerprint is None:
+                            # CSV已被删除，按删除处理
+                            removed_dirs.add(entry.name)
+                        elif fingerprint != fingerprints.get(entry.name):
+                            changed_dirs.append(entry.path)
+        except OSError as e:
+            # 根目录暂时无法访问（例如挂载点断开）时不移除其中的数据
+            logging.error(f"Error scanning {root} for reconciliation: {str(e)}")
+            return {'new': 0, 'changed': 0, 'removed': 0}
+        self._reconcile_mtimes[root] = mtimes
+        
+        queue = self._ingest_queues[root]
+        removed_dirs |= root_dirs - set(mtimes)
+        for dir_name in removed_dirs:
+            queue.discard(os.path.join(root, dir_name))
+            self.remove_directory_data(os.path.join(root, dir_name))
+        for dir_path in new_dirs + changed_dirs:
+            queue.submit(dir_path)
         
-        if df.empty:
+        elapsed = time.time() - start_time
+        result = {'new': len(new_dirs), 'changed': len(changed_dirs), 'removed': len(removed_dirs)}
+        for key, count in result.items():
+            self.reconcile_stats[key] += count
+        self.reconcile_stats['sweeps'] += 1
+        self.reconcile_stats['last_sweep_seconds'] = round(elapsed, 4)
+        self.root_stats[root]['last_sweep_seconds'] = round(elapsed, 4)
+        logging.info(f"Reconciliation sweep over {len(mtimes)} directories in {root} took {elapsed:.3f}s: "
+                     f"{result['new']} new, {result['changed']} changed, {result['removed']} removed")
+        return result
+    
+    def get_data(self):
+        """
+        获取当前数据集：runs表按run_id关联回查询结果后的宽表
+        
+        返回快照视图的浅拷贝，不复制数据；调用方修改返回值时按写时复制只复制被修改的列。
+        存在冷数据时需要从磁盘读取并关联，返回的是新生成的宽表
+        """
+        snapshot = self._snapshot
+        if snapshot.cold:
+            return join_runs(snapshot.runs, snapshot.load_results())
+        return snapshot.view.copy(deep=False)
+    
+    def get_filtered_data(self, filters: Dict[str, Any], snapshot: Optional[DataSnapshot] = None) -> pd.DataFrame:
+        """
+        按/data接口的筛选条件获取数据（宽表）
+        
+        分支、规模、集群、执行类型先在runs表（每个目录一行）上计算；日期条件在按run时间排序的results上
+        二分查找得到连续的行范围；查询类型和worker通过快照的筛选索引按字典编码取值。
+        各条件的行位图按位与合并后只物化一次命中行。
+        命中的run中有冷数据时，只从磁盘读取这些run，并在合并后的数据上逐个条件筛选
+        
+        Args:
+            snapshot: 在指定快照上筛选（与同一请求中的其他查询保持一致），默认为当前快照
+        """
+        snapshot = snapshot or self._snapshot
+        runs = snapshot.runs
+        if runs.empty:
+            return pd.DataFrame()
+        run_ids = select_runs(runs, filters)
+        cold = snapshot.cold_refs(run_ids)
+        results = snapshot.load_results(run_ids) if cold else snapshot.results
+        
+        if results.empty:
+            return pd.DataFrame()
+        
+        query_types = None
+        if filters.get('query_types') and 'query_type' in results.columns:
+            query_types = filters['query_types']
+        workers = None
+        if filters.get('workers'):
+            try:
+                workers = [int(w) for w in filters['workers']]
+            except:
+                pass
+        
+        if not cold:
+            lo, hi = 0, len(results)
+            start_date, end_date = parse_date_range(filters)
+            if start_date is not None or end_date is not None:
+                lo, hi = snapshot.row_range(start_date, end_date)
+                # 日期条件已由行范围满足，其余目录级条件仍按run筛选
+                run_ids = select_runs(runs, {key: value for key, value in filters.items()
+                                             if key not in ('start_date', 'end_date')})
+            index = snapshot.filter_index
+            positions = index.select(run_ids, query_types, workers, lo, hi)
+            if positions is None:
+                return snapshot.view.copy(deep=False)
+            return index.materialize(positions)
+        
+        mask = results['run_id'].isin(run_ids).to_numpy() if run_ids is not None else None
+        if query_types is not None:
+            condition = results['query_type'].isin(query_types).to_numpy()
+            mask = condition if mask is None else mask & condition
+        if workers is not None:
+            condition = results['worker'].isin(workers).to_numpy()
+            mask = condition if mask is None else mask & condition
+        return join_runs(runs, results if mask is None else results[mask])
+    
+
+    def get_group_statistics(self, filters: Dict[str, Any], snapshot: Optional[DataSnapshot] = None) -> pd.DataFrame:
+        """
+        按/data接口的筛选条件合并分组聚合桶，得到每个(分支, 规模, 集群, worker, 执行类型, 查询类型)分组的统计量
+        
+        与对get_filtered_data的结果按分组聚合相同，但只合并日期范围内的桶，不扫描原始行（冷数据run也不需要读取）
+        """
+        snapshot = snapshot or self._snapshot
+        start_date, end_date = parse_date_range(filters)
+        return snapshot.group_buckets.merge(filters, start_date, end_date)
+    
+    def get_options(self, filters: Optional[Dict[str, Any]] = None):
+        """
+        获取筛选选项（从分面索引读取，不扫描数据集）
+        
+        不传filters时返回全局选项列表；传入/data格式的筛选条件时进入交叉筛选模式，
+        每个维度只返回在其他维度当前选择（以及日期范围）下仍有数据的选项，并附带行数
+        """
+        snapshot = self._snapshot
+        if snapshot.record_count == 0:
             logging.warning("No data available for options")
-            return options
-            
+        
         try:
-            if 'branch' in df.columns:
-                unique_branches = df['branch'].astype(str).unique()
-                options['branches'] = sorted(list(set(unique_branches)))
-            
-            if 'query_type' in df.columns:
-                unique_query_types = df['query_type'].astype(str).unique()
-                options['query_types'] = sorted(list(set(unique_query_types)))
+            if filters is None:
+                return self.facets.options()
             
-            if 'scale' in df.columns:
-                unique_scales = df['scale'].dropna().unique()
-                options['scales'] = sorted(list(set(unique_scales)))
-            
-            if 'cluster' in df.columns:
-                unique_clusters = df['cluster'].dropna().unique()
-                options['clusters'] = sorted(list(set(unique_clusters)))
-                
-            if 'phase' in df.columns:
-                unique_phases = df['phase'].astype(str).unique()
-                options['execution_types'] = sorted(list(set(unique_phases)))
-                
-            if 'worker' in df.columns:
-                unique_workers = df['worker'].dropna().unique()
-                options['workers'] = sorted(list(set(unique_workers)))
-                
+            # 日期范围是目录级条件，先在runs表上确定run范围
+            run_ids = None
+            if not snapshot.runs.empty:
+                run_ids = select_runs(snapshot.runs, {'start_date': filters.get('start_date'),
+                                                      'end_date': filters.get('end_date')})
+            return self.facets.cross_filter(filters, run_ids)
         except Exception as e:
             logging.error(f"Error getting options: {str(e)}")
-            
-        # 最终确保所有选项都已去重
-        for key in options:
-            if isinstance(options[key], list):
-                options[key] = sorted(list(set(options[key])))
-            
-        return options
+            options = {'branches': [], 'query_types': [], 'scales': [], 'clusters': [], 'execution_types': [], 'workers': []}
+            if filters is not None:
+                options['counts'] = {key: [] for key in list(options)}
+            return options
     
     def save_cache(self) -> None:
-        """保存数据到缓存文件（线程安全，避免重复保存）"""
+        """把新提交和删除的目录追加写入分段缓存（线程安全，避免重复保存）"""
         # 如果已经有保存任务在运行，则跳过
         if not self._save_lock.acquire(blocking=False):
             logging.debug("Cache save already in progress, skipping")
@@ -548,48 +1712,97 @@ class TSBSDataLoader:
             self._save_pending = False  # 重置保存标记
             
             with self.lock:
-                # 保存主数据
-                with open(self.cache_file, 'wb') as f:
-                    pickle.dump(self.df, f, protocol=pickle.HIGHEST_PROTOCOL)
-                
-                # 保存元数据
-                metadata = {
-                    'known_dirs': self.known_dirs,
-                    'last_save_time': datetime.now(),
-                    'total_records': len(self.df)
-                }
-                with open(self.metadata_file, 'wb') as f:
-                    pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
-                
-                logging.debug(f"Cache saved: {len(self.df)} records")
+                rewrite = self._cache_rewrite_pending
+                snapshot = self._snapshot
+                full_dirs = sorted(self.known_dirs)
+                fingerprints = dict(self._fingerprints)
+                unsaved = self._unsaved
+                removed = self._unsaved_removed
+                self._cache_rewrite_pending = False
+                self._unsaved = {}
+                self._unsaved_removed = {}
+            
+            try:
+                if rewrite:
+                    # 序列化快照时不持有加载器的锁，读取和写入都不被阻塞
+                    full_results = snapshot.load_results()
+                    self.store.rewrite(snapshot.runs, full_results, full_dirs, fingerprints)
+                    logging.debug(f"Cache rewritten: {len(full_results)} records")
+                elif unsaved or removed:
+                    new_runs = build_runs_frame([run for run, _ in unsaved.values()]) if unsaved else pd.DataFrame()
+                    new_results = concat_frames([results for _, results in unsaved.values()])
+                    self.store.append(new_runs, new_results, list(unsaved.keys()), removed.keys(), removed,
+                                      {dir_name: fingerprints.get(dir_name) for dir_name in unsaved})
+                    logging.debug(f"Cache segment saved: {len(unsaved)} directories, {len(new_results)} records, "
+                                  f"{len(removed)} tombstones")
+            except Exception:
+                # 保存失败时恢复待保存数据，等待下次保存
+                with self.lock:
+                    self._cache_rewrite_pending = self._cache_rewrite_pending or rewrite
+                    for dir_name, entry in unsaved.items():
+                        self._unsaved.setdefault(dir_name, entry)
+                    for dir_name, rows in removed.items():
+                        self._unsaved_removed.setdefault(dir_name, rows)
+                raise
+            
+            # 段数或墓碑过多时合并（保存本身已在后台线程中执行）
+            if self.store.needs_compaction():
+                self.store.compact()
         except Exception as e:
             logging.error(f"Error saving cache: {str(e)}")
         finally:
             self._save_lock.release()
     
     def load_cached_data(self) -> bool:
-        """从缓存文件加载数据"""
+        """
+        从分段缓存加载数据（列式段文件通过内存映射读取）
+        
+        缓存不按时间失效：加载后由load_new_directories根据目录指纹只重新加载变化的目录
+        """
         try:
-            if not os.path.exists(self.cache_file) or not os.path.exists(self.metadata_file):
+            if not self.store.exists():
                 return False
             
-            # 检查缓存文件是否太旧（超过1天）
-            cache_age = time.time() - os.path.getmtime(self.cache_file)
-            if cache_age > 86400:  # 24小时
-                logging.info("Cache file is too old, will reload all data")
+            start_time = time.time()
+            cached = self.store.load()
+            if cached is None:
                 return False
             
+            # 先在局部变量中构建runs表、分区、分面索引和分组聚合，全部成功后再一次性替换，加载失败时加载器保持不变
+            runs, results, known_dirs = cached
+            if not runs.empty and runs['run_id'].duplicated().any():
+                raise ValueError("Cached runs contain duplicate run_id values")
+            # 按run_id拆分为分区，拆分后的分区共用缓存中的分类字典
+            partitions = {}
+            if not results.empty:
+                partitions = {int(run_id): part for run_id, part in results.groupby('run_id', sort=False)}
+            categories = {col: results[col].cat.categories for col in results.columns
+                          if isinstance(results[col].dtype, pd.CategoricalDtype)}
+            facets = FacetIndex()
+            facets.rebuild(runs, results)
+            group_aggregates = GroupAggregates()
+            group_aggregates.rebuild(runs, results)
+            fingerprints = self.store.get_fingerprints()
+            
             with self.lock:
-                # 加载主数据
-                with open(self.cache_file, 'rb') as f:
-                    self.df = pickle.load(f)
-                
-                # 加载元数据
-                with open(self.metadata_file, 'rb') as f:
-                    metadata = pickle.load(f)
-                    self.known_dirs = metadata.get('known_dirs', set())
-                
-                logging.info(f"Loaded {len(self.df)} records from cache")
+                self.runs = runs
+                self.known_dirs = known_dirs
+                self._partitions = {}
+                self._partition_bytes = {}
+                self._hot_bytes = 0
+                self.cold.clear()
+                for run_id, part in partitions.items():
+                    self._add_partition(run_id, part)
+                self._categories = categories
+                self.facets = facets
+                self.group_aggregates = group_aggregates
+                self._fingerprints = fingerprints
+                if not self.runs.empty:
+                    self._next_run_id = int(self.runs['run_id'].max()) + 1
+                self._enforce_memory_budget()
+                self._publish()
+                logging.info(f"Loaded {self._snapshot.record_count} records ({len(self.runs)} runs) from cache "
+                             f"in {time.time() - start_time:.2f}s")
                 return True
                 
         except Exception as e:
@@ -597,21 +1810,45 @@ class TSBSDataLoader:
             return False
     
     def load_new_directories(self) -> None:
-        """只加载新的目录"""
-        if not os.path.exists(self.base_path):
-            return
-            
-        current_dirs = set(d for d in os.listdir(self.base_path) 
-                          if os.path.isdir(os.path.join(self.base_path, d)))
+        """根据目录指纹与所有根目录对账：加载新增和变化的目录，移除已删除的目录"""
+        start_time = time.time()
+        dir_paths, failed_roots = list_run_directories(self.base_paths)
+        current_dirs = set(dir_paths)
         
-        new_dirs = current_dirs - self.known_dirs
+        with self.lock:
+            known_dirs = set(self.known_dirs)
+            fingerprints = dict(self._fingerprints)
+            # 缓存中不记录根目录，按当前所在的根目录登记
+            for dir_name in current_dirs & known_dirs:
+                self._dir_roots[dir_name] = self._root_of(dir_paths[dir_name])
         
-        if new_dirs:
-            logging.info(f"Found {len(new_dirs)} new directories to load")
-            for dir_name in new_dirs:
-                dir_path = os.path.join(self.base_path, dir_name)
-                self.load_single_directory(dir_path)
-            
+        new_dirs = current_dirs - known_dirs
+        # 有根目录无法访问时不能判断其中的目录是否已删除
+        removed_dirs = known_dirs - current_dirs if not failed_roots else set()
+        changed_dirs = set()
+        for dir_name in current_dirs & known_dirs:
+            fingerprint = directory_fingerprint(dir_paths[dir_name])
+            if fingerprint is None:
+                # CSV已被删除，按删除处理
+                removed_dirs.add(dir_name)
+            elif fingerprint != fingerprints.get(dir_name):
+                changed_dirs.add(dir_name)
+        
+        for dir_name in removed_dirs:
+            self.remove_directory_data(os.path.join(self._dir_roots.get(dir_name, self.base_path), dir_name))
+        
+        reload_dirs = new_dirs | changed_dirs
+        if reload_dirs:
+            logging.info(f"Found {len(new_dirs)} new and {len(changed_dirs)} changed directories to load")
+            self._progress_start('reconcile', len(reload_dirs))
+            for dir_name in sort_newest_first(reload_dirs):
+                self.load_single_directory(dir_paths[dir_name])
+                self._progress_advance()
+            self.commit_staged()
+        
+        if reload_dirs or removed_dirs:
+            logging.info(f"Cache reconciled in {time.time() - start_time:.2f}s: {len(new_dirs)} new, "
+                         f"{len(changed_dirs)} changed, {len(removed_dirs)} removed directories")
             # 使用线程池异步保存更新后的缓存
             self._thread_pool.submit(self.save_cache)
         else:
@@ -620,10 +1857,7 @@ class TSBSDataLoader:
     def clear_cache(self):
         """清理缓存文件"""
         try:
-            if os.path.exists(self.cache_file):
-                os.remove(self.cache_file)
-            if os.path.exists(self.metadata_file):
-                os.remove(self.metadata_file)
+            self.store.clear()
             logging.info("Cache files cleared")
         except Exception as e:
             logging.error(f"Error clearing cache: {str(e)}")
@@ -631,16 +1865,46 @@ class TSBSDataLoader:
     def get_cache_info(self):
         """获取缓存信息"""
         info = {
-            'cache_exists': os.path.exists(self.cache_file),
+            'cache_exists': self.store.exists(),
             'cache_size': 0,
             'last_modified': None,
-            'records_count': len(self.df)
+            'records_count': self._snapshot.record_count,
+            'runs_count': len(self._snapshot.runs),
+            'data_version': self._snapshot.version,
+            'csv_fast_path_count': self.csv_stats.get('csv_fast_path', 0),
+            'csv_fallback_count': self.csv_stats.get('csv_fallback', 0),
+            'memory_budget_mb': self.memory_budget_mb,
+            'hot_mb': self._hot_bytes / 1024 / 1024
         }
+        info.update(self.cold.get_info())
+        
+        # 紧凑数据模式和规范化存储节省的内存（与每行都带目录元数据的宽表相比）
+        # 直接按runs表和内存中的各个分区统计，不构建宽表（也不合并分区）
+        try:
+            snapshot = self._snapshot
+            runs, partitions = snapshot.runs, snapshot.partitions
+            memory_bytes = sum(frame_nbytes(part) for part in partitions.values())
+            # 分区共用的分类字典只计一次
+            memory_bytes += sum(int(categories.memory_usage(deep=True)) for categories in self._categories.values())
+            unoptimized_bytes = estimate_unoptimized_bytes([part.drop(columns='run_id') for part in partitions.values()])
+            if not runs.empty:
+                memory_bytes += int(runs.memory_usage(index=False, deep=True).sum())
+                # runs表的每行在宽表中按其内存中的查询结果行数重复
+                rows = {run_id: len(part) for run_id, part in partitions.items()}
+                weights = runs['run_id'].map(rows).fillna(0).to_numpy()
+                unoptimized_bytes += estimate_unoptimized_bytes(runs.drop(columns='run_id'), weights)
+            info['memory_mb'] = memory_bytes / 1024 / 1024
+            info['memory_unoptimized_mb'] = unoptimized_bytes / 1024 / 1024
+            info['memory_saved_mb'] = max(0, unoptimized_bytes - memory_bytes) / 1024 / 1024
+        except Exception as e:
+            logging.error(f"Error estimating memory usage: {str(e)}")
         
         if info['cache_exists']:
             try:
-                info['cache_size'] = os.path.getsize(self.cache_file) / 1024 / 1024  # MB
-                info['last_modified'] = datetime.fromtimestamp(os.path.getmtime(self.cache_file))
+                store_info = self.store.get_info()
+                info.update(store_info)
+                info['cache_size'] = store_info['segment_bytes'] / 1024 / 1024  # MB
+                info['last_modified'] = datetime.fromtimestamp(self.store.last_modified())
             except Exception as e:
                 logging.error(f"Error getting cache info: {str(e)}")
         
@@ -650,12 +1914,45 @@ class TSBSDataLoader:
         """强制重新加载所有数据"""
         logging.info("Starting forced data reload...")
         with self.lock:
-            self.df = pd.DataFrame()
+            self.runs = pd.DataFrame()
+            self._partitions = {}
+            self._partition_bytes = {}
+            self._hot_bytes = 0
+            self.cold.clear()
+            self._categories = {}
+            self.facets.clear()
+            self.group_aggregates.clear()
+            self._publish()
             self.known_dirs = set()
+            self._staging = {}
+            self._unsaved = {}
+            self._unsaved_removed = {}
+            self._fingerprints = {}
+            self._dir_roots = {}
+            self._cache_rewrite_pending = True
         self.load_existing_data()
         # 使用线程池异步保存缓存
         self._thread_pool.submit(self.save_cache)
         logging.info("Forced data reload completed")
 
-# 修正基础路径为实际路径
-loader = TSBSDataLoader('/Users/yangxing/Desktop/tsbs_dist_server_gitee')
+_default_loader: Optional[TSBSDataLoader] = None
+_default_loader_lock = threading.Lock()
+
+
+def get_loader() -> TSBSDataLoader:
+    """
+    获取应用使用的默认加载器，首次调用时创建并开始后台加载
+
+    加载器不在导入本模块时创建：进程池的工作进程（forkserver/spawn方式启动时会重新导入本模块和应用主模块）
+    不会各自创建加载器、重复加载数据和写入同一个缓存目录
+    """
+    global _default_loader
+    if _default_loader is None:
+        with _default_loader_lock:
+            if _default_loader is None:
+                # 后台加载：应用立即启动，加载进度通过/api/load-progress查询
+                # TSBS_DATA_ROOTS可指定多个结果根目录（用os.pathsep分隔），每个根目录独立扫描和监控
+                data_roots = [root for root in os.environ.get('TSBS_DATA_ROOTS', '').split(os.pathsep) if root]
+                _default_loader = TSBSDataLoader(data_roots or '/Users/yangxing/Desktop/tsbs_dist_server_gitee',
+                                                 background_load=True)
+    return _default_loader
@@ -0,0 +1,180 @@
+"""
+筛选选项的分面索引
+
+按目录(run)维护(分支, 查询类型, 规模, 集群, 执行类型, worker)组合的行数，加载和删除目录时增量更新。
+/options直接从索引读取选项列表；交叉筛选模式下，每个维度的可选值按“其他维度的当前选择”计数，
+只返回在当前选择下仍有数据的选项。
+"""
+
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+import pandas as pd
+
+# 分面维度（按组合元组中的顺序）
+FACET_DIMENSIONS = ['branch', 'query_type', 'scale', 'cluster', 'phase', 'worker']
+
+# /options返回的键和/data筛选条件中的键 -> 分面维度
+OPTION_KEYS = {
+    'branches': 'branch',
+    'query_types': 'query_type',
+    'scales': 'scale',
+    'clusters': 'cluster',
+    'execution_types': 'phase',
+    'workers': 'worker'
+}
+
+# 数值维度：选项为整数，缺失值不作为选项
+INTEGER_DIMENSIONS = {'scale', 'cluster', 'worker'}
+
+
+def _normalize(dimension, value):
+    """把列中的值转换为选项值：字符串维度与astype(str)一致，数值维度为整数，缺失时返回None"""
+    if dimension in INTEGER_DIMENSIONS:
+        if value is None or pd.isna(value):
+            return None
+        return int(value)
+    return str(value)
+
+
+def parse_selection(filters: Dict[str, Any]) -> Dict[int, set]:
+    """
+    把筛选条件转换为 维度位置 -> 选中值集合
+
+    与/data接口一致：数值条件无法解析时忽略该条件，空列表表示不筛选
+    """
+    selection = {}
+    for key, dimension in OPTION_KEYS.items():
+        values = filters.get(key)
+        if not values:
+            continue
+        try:
+            if dimension in INTEGER_DIMENSIONS:
+                selected = {int(v) for v in values}
+            else:
+                selected = {str(v) for v in values}
+        except (TypeError, ValueError):
+            continue
+        selection[FACET_DIMENSIONS.index(dimension)] = selected
+    return selection
+
+
+class FacetIndex:
+    """按run维护维度组合行数的分面索引（线程安全）"""
+
+    def __init__(self) -> None:
+        self._runs: Dict[int, Counter] = {}  # run_id -> 该run的组合行数
+        self._combos: Counter = Counter()  # 所有run的组合行数之和
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _run_combos(run: Dict[str, Any], query_types: Iterable, workers: Iterable) -> Counter:
+        prefix = {dimension: _normalize(dimension, run.get(dimension))
+                  for dimension in ('branch', 'scale', 'cluster', 'phase')}
+        combos = Counter()
+        for (query_type, worker), count in Counter(zip(query_types, workers)).items():
+            combos[(prefix['branch'], _normalize('query_type', query_type), prefix['scale'],
+                    prefix['cluster'], prefix['phase'], _normalize('worker', worker))] += count
+        return combos
+
+    @staticmethod
+    def _column_values(results: pd.DataFrame, col: str) -> List[Any]:
+        if col in results.columns:
+            return results[col].tolist()
+        return [None] * len(results)
+
+    def add_run(self, run_id: int, run: Dict[str, Any], results: pd.DataFrame) -> None:
+        """登记一个run的查询结果（同一run_id重复登记时替换旧计数）"""
+        combos = self._run_combos(run, self._column_values(results, 'query_type'),
+                                  self._column_values(results, 'worker'))
+        with self._lock:
+            old = self._runs.pop(run_id, None)
+            if old:
+                self._combos.subtract(old)
+            self._runs[run_id] = combos
+            self._combos.update(combos)
+            self._combos += Counter()  # 去掉计数为0的组合
+
+    def remove_run(self, run_id: int) -> None:
+        with self._lock:
+            old = self._runs.pop(run_id, None)
+            if old:
+                self._combos.subtract(old)
+                self._combos += Counter()
+
+    def rebuild(self, runs: pd.DataFrame, results: pd.DataFrame) -> None:
+        """根据runs表和results表整体重建索引（从缓存加载后使用）"""
+        index: Dict[int, Counter] = {}
+        if not runs.empty and not results.empty:
+            run_records = {int(record['run_id']): record for record in runs.to_dict('records')}
+            for run_id, part in results.groupby('run_id', sort=False):
+                run = run_records.get(int(run_id))
+                if run is not None:
+                    index[int(run_id)] = self._run_combos(run, self._column_values(part, 'query_type'),
+                                                          self._column_values(part, 'worker'))
+        combos = Counter()
+        for run_combos in index.values():
+            combos.update(run_combos)
+        with self._lock:
+            self._runs = index
+            self._combos = combos
+
+    def clear(self) -> None:
+        with self._lock:
+            self._runs = {}
+            self._combos = Counter()
+
+    def _combo_items(self, run_ids: Optional[Iterable[int]] = None) -> List[Tuple[tuple, int]]:
+        with self._lock:
+            if run_ids is None:
+                return list(self._combos.items())
+            combos = Counter()
+            for run_id in run_ids:
+                run_combos = self._runs.get(int(run_id))
+                if run_combos:
+                    combos.update(run_combos)
+            return list(combos.items())
+
+    def options(self) -> Dict[str, list]:
+        """全局选项列表（与原有/options返回格式一致，已排序去重）"""
+        values = [set() for _ in FACET_DIMENSIONS]
+        for combo, count in self._combo_items():
+            if count <= 0:
+                continue
+            for position, value in enumerate(combo):
+                if value is not None:
+                    values[position].add(value)
+        return {key: sorted(values[FACET_DIMENSIONS.index(dimension)]) for key, dimension in OPTION_KEYS.items()}
+
+    def cross_filter(self, filters: Dict[str, Any], run_ids: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+        """
+        交叉筛选：每个维度返回在其他维度当前选择下仍有数据的选项及行数
+
+        Args:
+            filters: /data格式的筛选条件（branches、scales等）
+            run_ids: 可选的run范围（例如按日期在runs表上筛选后的结果），None表示所有run
+        Returns:
+            {'branches': [...], ..., 'counts': {'branches': [{'value': v, 'count': n}, ...], ...}}
+        """
+        selection = parse_selection(filters)
+        counts = [Counter() for _ in FACET_DIMENSIONS]
+        for combo, count in self._combo_items(run_ids):
+            if count <= 0:
+                continue
+            misses = [position for position, selected in selection.items() if combo[position] not in selected]
+            if len(misses) > 1:
+                continue
+            for position, value in enumerate(combo):
+                # 维度自身的选择不参与该维度的计数
+                if value is None or (misses and misses[0] != position):
+                    continue
+                counts[position][value] += count
+
+        result: Dict[str, Any] = {'counts': {}}
+        for key, dimension in OPTION_KEYS.items():
+            dimension_counts = counts[FACET_DIMENSIONS.index(dimension)]
+            values = sorted(dimension_counts)
+            result[key] = values
+            result['counts'][key] = [{'value': value, 'count': dimension_counts[value]} for value in values]
+        return result
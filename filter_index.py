@@ -0,0 +1,106 @@
+"""
+/data筛选的索引
+
+快照的results由各run的分区依次拼接而成，索引记录每个run的行范围，以及行级维度（查询类型、worker）的字典编码。
+目录级条件（分支、规模、集群、执行类型）先在runs表上得到选中的run，再按各run的行数展开为行位图；
+行级条件把选中值映射为字典上的查找表后按编码取值得到行位图。各条件的位图按位与合并，
+最后只按命中行的位置物化一次宽表，不生成中间DataFrame。
+"""
+
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+
+# 行级筛选维度：/data筛选条件中的键 -> results列
+ROW_DIMENSIONS = {'query_types': 'query_type', 'workers': 'worker'}
+
+
+class FilterIndex:
+    """某一快照results表上的筛选索引（只读）"""
+
+    def __init__(self, runs: pd.DataFrame, results: pd.DataFrame, run_ids: List[int], row_offsets: np.ndarray) -> None:
+        """
+        Args:
+            runs: runs表
+            results: 按run_ids顺序拼接各run分区得到的results表
+            run_ids: results中分区的顺序
+            row_offsets: 第i个分区在results中的起始行（长度为len(run_ids) + 1）
+        """
+        self.runs = runs
+        self.results = results
+        self.row_offsets = row_offsets
+        self._run_lengths = np.diff(row_offsets)
+        self._run_ids = pd.Index(run_ids, dtype=np.int64)
+        # 第i个分区的run在runs表中的位置
+        self._run_positions = pd.Index(runs['run_id']).get_indexer(run_ids) if run_ids else np.array([], dtype=np.intp)
+        self._dictionaries: Dict[str, tuple] = {}  # 列名 -> (字典, 每行的编码)
+        for col in ROW_DIMENSIONS.values():
+            if col not in results.columns:
+                continue
+            values = results[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                self._dictionaries[col] = (values.cat.categories, values.cat.codes.to_numpy())
+            else:
+                codes, uniques = pd.factorize(values.to_numpy())
+                self._dictionaries[col] = (pd.Index(uniques), codes)
+
+    def _lookup(self, col: str, values) -> Optional[np.ndarray]:
+        """选中值在字典上的查找表（末尾多一个False，对应缺失值的编码-1）"""
+        dictionary = self._dictionaries.get(col)
+        if dictionary is None:
+            return None
+        return np.append(dictionary[0].isin(values), False)
+
+    def select(self, run_ids=None, query_types=None, workers=None, lo: int = 0,
+               hi: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        计算命中行的位置
+
+        Args:
+            run_ids: 目录级条件选中的run_id，None表示不按run筛选
+            query_types / workers: 行级条件的选中值，None表示不筛选
+            lo / hi: 只在results的[lo, hi)行范围内筛选（例如日期条件得到的行范围）
+        Returns:
+            命中行在results中的位置；没有任何条件且范围是整个results时返回None
+        """
+        hi = len(self.results) if hi is None else hi
+        bitmap = None
+
+        def combine(condition):
+            nonlocal bitmap
+            bitmap = condition if bitmap is None else np.logical_and(bitmap, condition, out=bitmap)
+
+        if run_ids is not None:
+            # 选中的分区按行数展开为行位图（分区在results中连续存放）
+            selected = self._run_ids.isin(run_ids)
+            combine(np.repeat(selected, self._run_lengths)[lo:hi])
+
+        for col, values in (('query_type', query_types), ('worker', workers)):
+            if values is None:
+                continue
+            lookup = self._lookup(col, values)
+            if lookup is not None:
+                combine(lookup[self._dictionaries[col][1][lo:hi]])
+
+        if bitmap is None:
+            if lo == 0 and hi == len(self.results):
+                return None
+            return np.arange(lo, hi)
+        positions = np.flatnonzero(bitmap)
+        return positions + lo if lo else positions
+
+    def materialize(self, positions: np.ndarray) -> pd.DataFrame:
+        """只为命中行生成宽表，与join_runs(runs, results.take(positions))结果相同"""
+        if len(positions) == 0:
+            return pd.DataFrame()
+        data: Dict[str, Any] = {}
+        for col in self.results.columns:
+            if col != 'run_id':
+                data[col] = self.results[col].array.take(positions)
+        # 命中行所在的分区 -> run在runs表中的位置
+        run_positions = self._run_positions[np.searchsorted(self.row_offsets, positions, 'right') - 1]
+        for col in self.runs.columns:
+            if col != 'run_id':
+                data[col] = self.runs[col].array.take(run_positions)
+        return pd.DataFrame(data, index=self.results.index.take(positions), copy=False)
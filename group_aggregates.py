@@ -0,0 +1,303 @@
+"""
+按(分组, 日期)维护的可合并分组聚合
+
+/data的分组统计按(分支, 规模, 集群, worker, 执行类型, 查询类型)分组，分组数据只在加载或删除run时变化。
+加载run时按(分组, run日期)计算部分聚合：mean_ms的行数、和、离差平方和(M2)、最小值、最大值，
+min_ms的最小值、max_ms的最大值、import_speed的和与行数，以及med_ms的取值（中位数的中位数需要精确结果，
+近似的分位数摘要会改变评分，因此保存取值本身：每个run一个按桶排列的小数组，桶中记录取值个数med_n）。
+每个run只属于一个日期，桶按日期分区：加载或删除run时只用该日期其余run的部分聚合重建这一天的分区，
+其余日期的分区原样沿用，提交的开销与数据总量无关。
+/data只合并日期范围内的分区，不再扫描原始行：日期条件的结束时间是end_date次日零点且包含在内，
+因此恰在零点的run单独成桶（at_midnight），结束日期次日只合并这些桶。
+"""
+
+import threading
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from segment_store import concat_frames
+
+# 分组维度（与/data分组统计的分组顺序一致）
+GROUP_COLUMNS = ['branch', 'scale', 'cluster', 'worker', 'phase', 'query_type']
+# 日期分区内桶的键：分组 + run时间是否恰为零点
+BUCKET_COLUMNS = GROUP_COLUMNS + ['at_midnight']
+# 没有run时间的分区
+NO_DAY = np.iinfo(np.int64).min
+# run级维度（其余分组维度来自查询结果）
+RUN_DIMENSIONS = ['branch', 'scale', 'cluster', 'phase']
+# 部分聚合的列（med_n为桶中med_ms取值的个数）
+STAT_COLUMNS = ['n', 's', 'm2', 'mean_min', 'mean_max', 'lo', 'hi', 'speed_sum', 'speed_n', 'med_n']
+METRIC_COLUMNS = ['mean_ms', 'med_ms', 'min_ms', 'max_ms', 'import_speed']
+MERGED_COLUMNS = ['mean_ms', 'mean_count', 'mean_std', 'mean_max', 'mean_min',
+                  'med_ms', 'min_ms', 'max_ms', 'import_speed']
+
+
+def merge_partials(partials: pd.DataFrame, by) -> pd.DataFrame:
+    """
+    按by合并部分聚合：行数、和、最值直接合并，离差平方和按Chan公式合并（各部分的M2之和加上各部分均值相对总均值的偏差项）
+    """
+    grouped = partials.groupby(by, observed=True, sort=False)
+    merged = grouped.agg(n=('n', 'sum'), s=('s', 'sum'), mean_min=('mean_min', 'min'), mean_max=('mean_max', 'max'),
+                         lo=('lo', 'min'), hi=('hi', 'max'), speed_sum=('speed_sum', 'sum'),
+                         speed_n=('speed_n', 'sum'), med_n=('med_n', 'sum'))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_mean = grouped['s'].transform('sum') / grouped['n'].transform('sum')
+        part_mean = partials['s'] / partials['n']
+        spread = (partials['m2'] + partials['n'] * (part_mean - total_mean) ** 2).where(partials['n'] > 0, 0.0)
+    merged['m2'] = spread.groupby([partials[col] for col in ([by] if isinstance(by, str) else by)],
+                                  observed=True, sort=False).sum()
+    return merged
+
+
+def _row_partials(rows: pd.DataFrame, by: List[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """按by计算原始行的部分聚合，返回(按键排序的部分聚合, 按部分聚合的行顺序排列的med_ms取值)"""
+    grouped = rows.groupby(by, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    partials = grouped.agg(n=('mean_ms', 'count'), s=('mean_ms', 'sum'), mean_min=('mean_ms', 'min'),
+                           mean_max=('mean_ms', 'max'), lo=('min_ms', 'min'), hi=('max_ms', 'max'),
+                           speed_sum=('import_speed', 'sum'), speed_n=('import_speed', 'count'))
+    deviation = (rows['mean_ms'] - grouped['mean_ms'].transform('mean')) ** 2
+    partials['m2'] = deviation.groupby(codes).sum().to_numpy()
+    has_median = rows['med_ms'].notna().to_numpy()
+    partials['med_n'] = np.bincount(codes[has_median], minlength=len(partials))
+    values = rows['med_ms'].to_numpy(dtype=np.float64)[has_median]
+    values = values[np.argsort(codes[has_median], kind='stable')]
+    return partials.reset_index(), values
+
+
+def _merge_sorted(partials: pd.DataFrame, values: np.ndarray, by: List[str]) -> Tuple[pd.DataFrame, np.ndarray]:
+    """合并部分聚合（同一个键可能有多个run的部分聚合），结果按键排序，med_ms取值随桶重新排列"""
+    codes = partials.groupby(by, sort=True).ngroup().to_numpy()
+    merged = merge_partials(partials.assign(_bucket=codes), '_bucket').sort_index()
+    first = np.unique(codes, return_index=True)[1]
+    keys = partials[by].iloc[first].reset_index(drop=True)
+    merged = pd.concat([keys, merged.reset_index(drop=True)[STAT_COLUMNS]], axis=1)
+    order = np.argsort(np.repeat(codes, partials['med_n'].to_numpy()), kind='stable')
+    return merged, values[order]
+
+
+def _split_bounds(keys: np.ndarray, med_n: np.ndarray):
+    """按排序后的keys切分：返回(各键, 行边界, med_ms取值边界)"""
+    uniques, starts = np.unique(keys, return_index=True)
+    bounds = np.append(starts, len(keys))
+    value_bounds = np.concatenate([[0], np.cumsum(med_n)])[bounds]
+    return uniques.tolist(), bounds, value_bounds
+
+
+class GroupBuckets:
+    """某一数据版本的分组聚合桶（只读，发布到快照中）"""
+
+    def __init__(self, days: Dict[int, Tuple[pd.DataFrame, np.ndarray]]) -> None:
+        """
+        Args:
+            days: 日期（距1970-01-01的天数，NO_DAY表示没有run时间）->
+                (该日期的桶：BUCKET_COLUMNS + STAT_COLUMNS, 按桶顺序排列的med_ms取值，每个桶med_n个)
+        """
+        self.days = days
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for buckets, _ in self.days.values())
+
+    @staticmethod
+    def _filter_mask(buckets: pd.DataFrame, filters: Dict[str, Any]) -> np.ndarray:
+        """筛选条件对应的桶（条件的解析方式与select_runs和get_filtered_data一致，无法解析的条件被忽略）"""
+        mask = np.ones(len(buckets), dtype=bool)
+        for key, col in (('branches', 'branch'), ('execution_types', 'phase'), ('query_types', 'query_type')):
+            if filters.get(key):
+                mask &= buckets[col].isin(filters[key]).to_numpy()
+        for key, col in (('scales', 'scale'), ('clusters', 'cluster'), ('workers', 'worker')):
+            if filters.get(key):
+                try:
+                    values = [int(v) for v in filters[key]]
+                except (TypeError, ValueError):
+                    continue
+                mask &= buckets[col].isin(values).to_numpy()
+        return mask
+
+    def _select_days(self, start=None, end=None) -> List[Tuple[int, bool]]:
+        """日期范围内的分区，返回[(日期, 是否只取恰在零点的桶)]"""
+        if start is None and end is None:
+            return [(day, False) for day in self.days]
+        start_day = _day_number(start) if start is not None else None
+        end_day = _day_number(end) if end is not None else None
+        selected = []
+        for day in self.days:
+            if day == NO_DAY or (start_day is not None and day < start_day) or (end_day is not None and day > end_day):
+                continue
+            # 结束时间（次日零点）包含在内：次日只合并恰在零点的run
+            selected.append((day, day == end_day))
+        return selected
+
+    def merge(self, filters: Dict[str, Any], start=None, end=None) -> pd.DataFrame:
+        """
+        合并筛选条件命中的桶，得到每个分组的统计量
+
+        Returns:
+            以GROUP_COLUMNS为索引、按分组排序的DataFrame：mean_ms、mean_count、mean_std、mean_max、mean_min、
+            med_ms、min_ms、max_ms、import_speed（与按原始行groupby聚合的结果相同）
+        """
+        selected = self._select_days(start, end)
+        if not selected:
+            return pd.DataFrame(columns=MERGED_COLUMNS)
+        buckets = pd.concat([self.days[day][0] for day, _ in selected], ignore_index=True)
+        values = np.concatenate([self.days[day][1] for day, _ in selected])
+        mask = np.concatenate([self.days[day][0]['at_midnight'].to_numpy(dtype=bool) if midnight_only
+                               else np.ones(len(self.days[day][0]), dtype=bool) for day, midnight_only in selected])
+        mask &= self._filter_mask(buckets, filters)
+        values = values[np.repeat(mask, buckets['med_n'].to_numpy())]
+        buckets = buckets[mask].reset_index(drop=True)
+        if buckets.empty:
+            return pd.DataFrame(columns=MERGED_COLUMNS)
+
+        groups = merge_partials(buckets, GROUP_COLUMNS).sort_index()
+        n = groups['n']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats = pd.DataFrame({
+                'mean_ms': (groups['s'] / n).where(n > 0),
+                'mean_count': n,
+                'mean_std': np.sqrt(groups['m2'] / (n - 1)).where(n > 1),
+                'mean_max': groups['mean_max'],
+                'mean_min': groups['mean_min'],
+            }, index=groups.index)
+
+        # 中位数：命中桶的med_ms取值按分组求中位数（分组编号与排序后的分组顺序一致）
+        codes = buckets.groupby(GROUP_COLUMNS, sort=True).ngroup().to_numpy()
+        medians = pd.Series(values).groupby(np.repeat(codes, buckets['med_n'].to_numpy())).median()
+        stats['med_ms'] = medians.reindex(np.arange(len(groups))).to_numpy()
+
+        stats['min_ms'] = groups['lo']
+        stats['max_ms'] = groups['hi']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats['import_speed'] = (groups['speed_sum'] / groups['speed_n']).where(groups['speed_n'] > 0)
+        return stats
+
+    def get_info(self) -> Dict[str, Any]:
+        return {'days': len(self.days), 'buckets': len(self),
+                'median_values': sum(len(values) for _, values in self.days.values())}
+
+
+def _day_number(value) -> int:
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+EMPTY_BUCKETS = GroupBuckets({})
+
+
+class GroupAggregates:
+    """加载器维护的分组聚合：每个run的部分聚合和按日期分区的桶，加载和删除run时只重建涉及的日期（线程安全）"""
+
+    def __init__(self) -> None:
+        # run_id -> (日期, 该run的部分聚合：BUCKET_COLUMNS + STAT_COLUMNS, 按桶排列的med_ms取值)
+        self._runs: Dict[int, Tuple[int, pd.DataFrame, np.ndarray]] = {}
+        self._day_runs: Dict[int, set] = {}  # 日期 -> run_id集合
+        self._lock = threading.Lock()
+        self.buckets = EMPTY_BUCKETS
+
+    @staticmethod
+    def _row_frame(runs: pd.DataFrame, results: pd.DataFrame) -> pd.DataFrame:
+        """查询结果的每一行带上分组维度、日期和指标（float64），分组维度缺失的行不参与分组统计"""
+        positions = pd.Index(runs['run_id']).get_indexer(results['run_id'])
+        data: Dict[str, Any] = {'run_id': results['run_id'].to_numpy(dtype=np.int64)}
+        for col in RUN_DIMENSIONS:
+            values = runs[col] if col in runs.columns else pd.Series(np.nan, index=runs.index)
+            data[col] = _plain_values(values).take(positions)
+        for col in ('worker', 'query_type'):
+            data[col] = _plain_values(results[col]) if col in results.columns else np.full(len(results), np.nan)
+        times = pd.to_datetime(runs['datetime']).to_numpy().astype('datetime64[ns]') if 'datetime' in runs.columns \
+            else np.full(len(runs), np.datetime64('NaT', 'ns'))
+        days = times.astype('datetime64[D]')
+        day_numbers = np.where(np.isnat(days), NO_DAY, days.astype(np.int64))
+        data['day'] = day_numbers.take(positions)
+        data['at_midnight'] = (~np.isnat(times) & (times == days.astype('datetime64[ns]'))).take(positions)
+        for col in METRIC_COLUMNS:
+            if col in results.columns:
+                data[col] = results[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            elif col == 'import_speed' and col in runs.columns:
+                data[col] = runs[col].to_numpy(dtype=np.float64, na_value=np.nan).take(positions)
+            else:
+                data[col] = np.full(len(results), np.nan)
+        rows = pd.DataFrame(data)
+        return rows.dropna(subset=GROUP_COLUMNS)
+
+    def add_runs(self, runs: pd.DataFrame, results_frames: List[pd.DataFrame]) -> None:
+        """登记一批run的查询结果（run_id已存在时替换），只重建这些run所在的日期"""
+        frames = [frame for frame in results_frames if not frame.empty]
+        if runs.empty or not frames:
+            return
+        rows = self._row_frame(runs, concat_frames(frames))
+        entries = []
+        if not rows.empty:
+            # 一次计算所有新run的部分聚合，再按run切分
+            partials, values = _row_partials(rows, ['run_id', 'day'] + BUCKET_COLUMNS)
+            run_ids, bounds, value_bounds = _split_bounds(partials['run_id'].to_numpy(), partials['med_n'].to_numpy())
+            partials = partials.drop(columns='run_id')
+            for i, run_id in enumerate(run_ids):
+                part = partials.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True)
+                entries.append((run_id, int(part['day'].iat[0]), part,
+                                values[value_bounds[i]:value_bounds[i + 1]].copy()))
+        with self._lock:
+            days = self._pop_runs(runs['run_id'].tolist())
+            for run_id, day, part, run_values in entries:
+                self._runs[run_id] = (day, part, run_values)
+                self._day_runs.setdefault(day, set()).add(run_id)
+                days.add(day)
+            self._rebuild_days(days)
+
+    def remove_runs(self, run_ids) -> None:
+        """移除run（刷新或删除目录时），只重建其所在的日期"""
+        with self._lock:
+            days = self._pop_runs(run_ids)
+            if days:
+                self._rebuild_days(days)
+
+    def rebuild(self, runs: pd.DataFrame, results: pd.DataFrame) -> None:
+        """根据runs表和results表整体重建（从缓存加载后使用）"""
+        self.clear()
+        if not runs.empty and not results.empty:
+            self.add_runs(runs, [results])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._runs = {}
+            self._day_runs = {}
+            self.buckets = EMPTY_BUCKETS
+
+    def _pop_runs(self, run_ids) -> set:
+        """删除run的部分聚合，返回受影响的日期（调用方持有锁）"""
+        days = set()
+        for run_id in run_ids:
+            entry = self._runs.pop(int(run_id), None)
+            if entry is None:
+                continue
+            day = entry[0]
+            self._day_runs[day].discard(int(run_id))
+            if not self._day_runs[day]:
+                del self._day_runs[day]
+            days.add(day)
+        return days
+
+    def _rebuild_days(self, days: set) -> None:
+        """用这些日期中各run的部分聚合重建日期分区，其余分区原样沿用，发布新的只读桶集合（调用方持有锁）"""
+        partitions = dict(self.buckets.days)
+        for day in days:
+            partitions.pop(day, None)
+        entries = [self._runs[run_id] for day in days for run_id in self._day_runs.get(day, ())]
+        if entries:
+            partials = pd.concat([part for _, part, _ in entries], ignore_index=True)
+            values = np.concatenate([run_values for _, _, run_values in entries])
+            merged, values = _merge_sorted(partials, values, ['day'] + BUCKET_COLUMNS)
+            day_keys, bounds, value_bounds = _split_bounds(merged['day'].to_numpy(), merged['med_n'].to_numpy())
+            merged = merged.drop(columns='day')
+            for i, day in enumerate(day_keys):
+                partitions[day] = (merged.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True),
+                                   values[value_bounds[i]:value_bounds[i + 1]])
+        self.buckets = GroupBuckets(partitions)
+
+
+def _plain_values(values: pd.Series) -> np.ndarray:
+    """分组维度的取值（分类列取其值，与按值排序分组一致）"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object).to_numpy()
+    return values.to_numpy()
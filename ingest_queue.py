@@ -0,0 +1,144 @@
+"""
+文件监控事件的防抖合并队列
+
+watchdog的事件回调只把目录放入队列并立即返回；后台工作线程等待目录中的
+TSBS_TEST_RESULT.csv大小和修改时间在静默期内保持不变后，把就绪的目录按批次交给加载器。
+同一目录的重复创建/修改事件在队列中合并为一项。
+"""
+
+import os
+import time
+import threading
+import logging
+import weakref
+import inspect
+from typing import Optional, Dict, Any, List, Callable
+
+
+class DebouncedIngestQueue:
+    """按目录去重的防抖队列，文件稳定后批量回调ingest_func(目录路径列表)"""
+
+    def __init__(self, ingest_func: Callable[[List[str]], None], quiet_period: float = 2.0,
+                 poll_interval: float = 0.5, max_batch: int = 256, name: str = 'tsbs-ingest-queue') -> None:
+        # 绑定方法只保存弱引用，加载器被回收后工作线程自动退出
+        if inspect.ismethod(ingest_func):
+            self._ingest_ref = weakref.WeakMethod(ingest_func)
+        else:
+            self._ingest_ref = lambda: ingest_func
+        self.quiet_period = quiet_period  # 文件大小和修改时间保持不变的最短时间
+        self.poll_interval = poll_interval  # 检查文件状态的间隔
+        self.max_batch = max_batch  # 每批最多交给加载器的目录数
+        self.name = name  # 工作线程名
+        self._pending: Dict[str, Dict[str, Any]] = {}  # 目录路径 -> 事件状态
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'events': 0, 'coalesced': 0, 'batches': 0, 'ingested': 0}
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def submit(self, dir_path: str) -> None:
+        """登记目录事件（在watchdog线程中调用，不做任何IO）"""
+        now = time.monotonic()
+        with self._cond:
+            self.stats['events'] += 1
+            entry = self._pending.get(dir_path)
+            if entry is None:
+                self._pending[dir_path] = {'last_event': now, 'state': None, 'stable_since': now}
+                if len(self._pending) == 1:
+                    # 只在队列由空变为非空时唤醒工作线程，大量事件涌入时按固定间隔轮询
+                    self._cond.notify_all()
+            else:
+                self.stats['coalesced'] += 1
+                entry['last_event'] = now
+
+    def discard(self, dir_path: str) -> None:
+        """目录或CSV被删除时丢弃尚未处理的事件"""
+        with self._cond:
+            self._pending.pop(dir_path, None)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    @staticmethod
+    def _file_state(dir_path: str):
+        csv_path = os.path.join(dir_path, 'query_result', 'TSBS_TEST_RESULT.csv')
+        try:
+            st = os.stat(csv_path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _collect_ready(self) -> List[str]:
+        """
+        检查待处理目录的文件状态，返回静默期内没有新事件且文件未变化的目录
+
+        只在复制目录列表和更新事件状态时持有锁，stat在锁外进行，慢速挂载盘上submit()不会被阻塞
+        """
+        with self._cond:
+            pending = list(self._pending.items())
+        states = [(dir_path, entry, self._file_state(dir_path)) for dir_path, entry in pending]
+
+        now = time.monotonic()
+        ready = []
+        with self._cond:
+            for dir_path, entry, state in states:
+                if self._pending.get(dir_path) is not entry:
+                    continue  # 检查期间事件已被丢弃
+                if state != entry['state']:
+                    entry['state'] = state
+                    entry['stable_since'] = now
+                if now - max(entry['last_event'], entry['stable_since']) < self.quiet_period:
+                    continue
+                del self._pending[dir_path]
+                if state is None:
+                    # CSV不存在（已删除或尚未生成），丢弃事件，由删除事件负责清理数据
+                    continue
+                ready.append(dir_path)
+                if len(ready) >= self.max_batch:
+                    break
+        return ready
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                self._cond.wait(self.poll_interval)
+                if self._stopped:
+                    return
+            ready = self._collect_ready()
+
+            if not ready:
+                continue
+
+            ingest_func = self._ingest_ref()
+            if ingest_func is None:
+                return
+            try:
+                ingest_func(ready)
+                self.stats['batches'] += 1
+                self.stats['ingested'] += len(ready)
+            except Exception as e:
+                logging.error(f"Error ingesting {len(ready)} queued directories: {str(e)}")
+            finally:
+                del ingest_func
@@ -0,0 +1,102 @@
+"""
+/data响应的结果缓存
+
+按(规范化的筛选条件, 数据版本, 基准值配置版本)缓存序列化后的响应，LRU淘汰，条目数和总字节数都有上限。
+数据版本随加载器每次发布新快照递增，基准值版本由配置文件的修改时间/大小和进程内的保存计数组成，
+任一变化都会使旧条目不再命中；数据版本前进后，旧版本的条目立即清除。
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+
+def canonical_filters(filters: Dict[str, Any]) -> str:
+    """筛选条件的规范化JSON：键排序，列表值排序（选项的先后顺序不影响结果）"""
+    normalized = {}
+    for key, value in filters.items():
+        if isinstance(value, list):
+            value = sorted(value, key=lambda item: (str(type(item)), str(item)))
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def file_version(path: str) -> Optional[Tuple[int, int, int]]:
+    """文件版本：(mtime_ns, 大小, inode)，文件不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+class ResultCache:
+    """有界LRU结果缓存（线程安全）"""
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # 键 -> 序列化后的响应
+        self._bytes = 0
+        self._data_version = None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_key(filters: Dict[str, Any], data_version: int, baseline_version: Any) -> tuple:
+        return canonical_filters(filters), data_version, baseline_version
+
+    def _advance_data_version(self, data_version: int) -> None:
+        """数据版本前进时清除旧版本的条目（调用方持有锁）"""
+        if self._data_version is not None and data_version <= self._data_version:
+            return
+        if self._data_version is not None:
+            stale = [key for key in self._entries if key[1] != data_version]
+            for key in stale:
+                self._bytes -= len(self._entries.pop(key))
+            self.stats['invalidations'] += len(stale)
+        self._data_version = data_version
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            self._advance_data_version(key[1])
+            body = self._entries.get(key)
+            if body is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return body
+
+    def put(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            self._advance_data_version(key[1])
+            if self._data_version is not None and key[1] < self._data_version:
+                return  # 计算期间数据已更新，结果不再有用
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.stats['evictions'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_info(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, entries=len(self._entries), bytes=self._bytes,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes,
+                        data_version=self._data_version,
+                        hit_rate=round(self.stats['hits'] / lookups, 4) if lookups else None)
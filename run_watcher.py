@@ -0,0 +1,77 @@
+"""
+按run目录的定向监控
+
+递归监控整个结果目录会为每个run的query_result、load_result子目录都注册inotify watch，
+run目录数以万计时会耗尽inotify watch配额，启动时注册watch也很耗时。
+定向模式下observer只非递归监控顶层目录以发现新的run目录；尚未提交的run临时监控其query_result目录
+（query_result还未创建时先监控run目录本身），run的CSV提交后移除这些临时watch。
+"""
+
+import os
+import threading
+import logging
+from typing import Dict, Any, Iterable
+
+CSV_NAME = 'TSBS_TEST_RESULT.csv'
+
+
+class RunWatchRegistry:
+    """observer上为未提交run注册的临时watch：run目录名 -> {被监控路径: ObservedWatch}（线程安全）"""
+
+    def __init__(self, observer, handler) -> None:
+        self.observer = observer
+        self.handler = handler
+        self._runs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def watch_run(self, dir_path: str) -> bool:
+        """
+        为run目录注册临时watch，返回CSV是否已经存在
+
+        注册watch之前生成的CSV不会产生事件，CSV已存在时由调用方直接放入加载队列。
+        observer在分发事件时持有自身的锁，因此注册和移除watch都不在本对象的锁内进行，避免锁顺序相反
+        """
+        dir_name = os.path.basename(dir_path)
+        query_dir = os.path.join(dir_path, 'query_result')
+        target = query_dir if os.path.isdir(query_dir) else dir_path
+        with self._lock:
+            watch = self._runs.get(dir_name, {}).get(target)
+        if watch is None:
+            try:
+                watch = self.observer.schedule(self.handler, target, recursive=False)
+            except Exception as e:
+                logging.warning(f"Failed to watch {target}: {str(e)}")
+        stale = []
+        if watch is not None:
+            with self._lock:
+                watches = self._runs.setdefault(dir_name, {})
+                watches[target] = watch
+                # query_result已被监控时不再需要监控run目录本身
+                if target == query_dir:
+                    stale = [watches.pop(path) for path in list(watches) if path != target]
+        for old_watch in stale:
+            self._unschedule(old_watch)
+        return os.path.exists(os.path.join(query_dir, CSV_NAME))
+
+    def release(self, dir_names: Iterable[str]) -> int:
+        """run已提交或被删除时移除其临时watch，返回移除的watch数"""
+        with self._lock:
+            watches = [watch for dir_name in dir_names for watch in self._runs.pop(dir_name, {}).values()]
+        for watch in watches:
+            self._unschedule(watch)
+        return len(watches)
+
+    def _unschedule(self, watch) -> None:
+        try:
+            self.observer.unschedule(watch)
+        except Exception:
+            # 被监控的目录已删除时watch可能已经失效
+            pass
+
+    def watched_runs(self) -> int:
+        with self._lock:
+            return len(self._runs)
+
+    def active_watches(self) -> int:
+        with self._lock:
+            return sum(len(watches) for watches in self._runs.values())
@@ -0,0 +1,113 @@
+"""
+评分函数的数组版本
+
+与app.py中的标量评分函数（calculate_deviation_score、calculate_deviation_rate、
+calculate_import_speed_score、calculate_comprehensive_score）语义相同：10%容差区间、基准值为0时0/0得100分、
+缺失得分时按剩余权重重新归一化；输入为实际值和基准值数组，一次计算所有分组的得分。
+标量版本返回None的位置在数组中为NaN。
+"""
+
+from typing import Dict
+
+import numpy as np
+
+# 综合评分的权重：中心趋势（70%）：均值（50%）+ 中位数（20%）；离散程度（30%）：标准差（20%）+ 极差（10%）
+SCORE_WEIGHTS = (('mean', 0.5), ('median', 0.2), ('std', 0.2), ('range', 0.1))
+
+
+def _round2(values) -> np.ndarray:
+    """
+    逐元素用内置round(x, 2)舍入，与标量版本的结果相同（np.round先放大再取整，在.5附近可能与round()不同）
+
+    每次评分的分组数很少，逐元素舍入的开销可以忽略
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.array([round(value, 2) for value in values.ravel().tolist()], dtype=np.float64).reshape(values.shape)
+
+
+def _zero_baseline(baseline: np.ndarray) -> np.ndarray:
+    """标量版本中`not baseline_value`为真的位置（None按0传入；NaN为真值）"""
+    return baseline == 0
+
+
+def deviation_scores(actual, baseline) -> np.ndarray:
+    """单项指标的偏差得分：偏差率10%以内100分，超出部分每1%扣10分，最低0分；基准值为0时实际值为0得100分，否则0分"""
+    actual = np.asarray(actual, dtype=np.float64)
+    baseline = np.asarray(baseline, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.abs(actual - baseline) / baseline * 100
+        penalized = 100 - (rate - 10) * 10
+    # max(0, x)在x不大于0（包括NaN）时返回0
+    score = np.where(rate <= 10, 100.0, np.where(penalized > 0, penalized, 0.0))
+    return np.where(_zero_baseline(baseline), np.where(actual == 0, 100.0, 0.0), _round2(score))
+
+
+def deviation_rates(actual, baseline) -> np.ndarray:
+    """偏差率（%）；基准值为0时实际值为0偏差率为0，否则无法计算（NaN）"""
+    actual = np.asarray(actual, dtype=np.float64)
+    baseline = np.asarray(baseline, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = _round2(np.abs(actual - baseline) / baseline * 100)
+    return np.where(_zero_baseline(baseline), np.where(actual == 0, 0.0, np.nan), rate)
+
+
+def import_speed_scores(actual, baseline) -> np.ndarray:
+    """导入速度得分（越高越好）：达到基准值110%得100分，90%-110%之间线性计算，低于90%按百分比计分；基准值为0时为NaN"""
+    actual = np.asarray(actual, dtype=np.float64)
+    baseline = np.asarray(baseline, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = actual / baseline
+    near = _round2(90 + (ratio - 0.9) * 50)
+    below = ratio * 100
+    below = _round2(np.where(below > 0, below, 0.0))
+    score = np.where(ratio >= 0.9, np.where(ratio >= 1.1, 100.0, near), below)
+    return np.where(_zero_baseline(baseline), np.nan, score)
+
+
+def comprehensive_scores(actual: Dict[str, np.ndarray], baseline: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    综合评分
+
+    Args:
+        actual: 实际指标数组 {'mean_ms', 'med_ms', 'std_ms', 'range_ms'}，std_ms为NaN表示缺失
+        baseline: 基准指标数组，键同上；缺失的基准值按0传入
+    Returns:
+        comprehensive_score、is_passed、各项得分（mean_score等）和偏差率（mean_deviation等）数组
+    """
+    actual_std = np.asarray(actual['std_ms'], dtype=np.float64)
+    baseline_std = np.asarray(baseline['std_ms'], dtype=np.float64)
+    missing_std = np.isnan(actual_std)
+    # 实际标准差缺失时按0计算：基准标准差大于0时按偏差计分，否则100分
+    actual_std = np.where(missing_std, 0.0, actual_std)
+    std_score = deviation_scores(actual_std, baseline_std)
+    std_score = np.where(missing_std & ~(baseline_std > 0), 100.0, std_score)
+
+    scores = {
+        'mean': deviation_scores(actual['mean_ms'], baseline['mean_ms']),
+        'median': deviation_scores(actual['med_ms'], baseline['med_ms']),
+        'std': std_score,
+        'range': deviation_scores(actual['range_ms'], baseline['range_ms'])
+    }
+
+    # 按实际存在的得分累加权重（与标量版本相同的累加顺序）
+    weighted = np.zeros_like(std_score)
+    total_weight = np.zeros_like(std_score)
+    for name, weight in SCORE_WEIGHTS:
+        valid = ~np.isnan(scores[name])
+        weighted = weighted + np.where(valid, scores[name] * weight, 0.0)
+        total_weight = total_weight + np.where(valid, weight, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        final_score = np.where(total_weight > 0, weighted / total_weight, 0.0)
+
+    return {
+        'comprehensive_score': _round2(final_score),
+        'is_passed': final_score >= 90.0,
+        'mean_score': scores['mean'],
+        'median_score': scores['median'],
+        'std_score': scores['std'],
+        'range_score': scores['range'],
+        'mean_deviation': deviation_rates(actual['mean_ms'], baseline['mean_ms']),
+        'median_deviation': deviation_rates(actual['med_ms'], baseline['med_ms']),
+        'std_deviation': deviation_rates(actual_std, baseline_std),
+        'range_deviation': deviation_rates(actual['range_ms'], baseline['range_ms'])
+    }
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+/data筛选的基准测试
+Usage: python scripts/benchmark_filters.py [--runs 5000] [--rows-per-run 200]
+
+在内存中构造约100万行的数据集，对比逐个条件生成布尔掩码再关联元数据的原有流程，
+与筛选索引（位图按位与合并、只物化一次命中行）的流程，并校验两者结果一致。
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+
+QUERY_TYPES = [f'query-{i}' for i in range(25)]
+WORKERS = [1, 2, 4, 8, 16, 32, 64, 96]
+
+
+def make_staged(runs, rows_per_run):
+    """生成暂存格式的目录数据：目录名 -> (目录元数据, 查询结果, 指纹)"""
+    random.seed(7)
+    rng = np.random.default_rng(7)
+    query_types = pd.Categorical([QUERY_TYPES[i % len(QUERY_TYPES)] for i in range(rows_per_run)],
+                                 categories=QUERY_TYPES)
+    workers = np.array([WORKERS[i // len(QUERY_TYPES) % len(WORKERS)] for i in range(rows_per_run)], dtype=np.int8)
+    staged = {}
+    for i in range(runs):
+        dir_name = (f"2025_{i % 12 + 1:02d}{i % 28 + 1:02d}_{i % 24:02d}{i % 60:02d}{i % 59:02d}_"
+                    f"{random.choice(['master', 'dev', 'release'])}_scale{random.choice([100, 1000, 4000])}_"
+                    f"cluster{random.choice([1, 3])}_cpu_{random.choice(['insert', 'query'])}_wal1_replica1_dop{i}")
+        run = data_loader.parse_directory_name(dir_name)
+        run['import_speed'] = random.uniform(1e5, 2e6)
+        mean = rng.uniform(1, 100, rows_per_run).astype(np.float32)
+        results = pd.DataFrame({
+            'query_type': query_types,
+            'worker': workers,
+            'min_ms': mean / 2,
+            'mean_ms': mean,
+            'max_ms': mean * 2,
+            'med_ms': mean,
+            'query_count': np.full(rows_per_run, 1000, dtype=np.int16)
+        })
+        staged[dir_name] = (run, results, None)
+    return staged
+
+
+def mask_request(loader, filters):
+    """原有流程：每个条件在results上生成一个布尔掩码，筛选后再按run_id关联目录元数据"""
+    snapshot = loader.get_snapshot()
+    runs, results = snapshot.runs, snapshot.results
+    mask = None
+    run_ids = data_loader.select_runs(runs, filters)
+    if run_ids is not None:
+        mask = results['run_id'].isin(run_ids).to_numpy()
+    if filters.get('query_types'):
+        condition = results['query_type'].isin(filters['query_types']).to_numpy()
+        mask = condition if mask is None else mask & condition
+    if filters.get('workers'):
+        condition = results['worker'].isin([int(w) for w in filters['workers']]).to_numpy()
+        mask = condition if mask is None else mask & condition
+    return data_loader.join_runs(runs, results if mask is None else results[mask])
+
+
+def bench(label, func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<24s} {elapsed * 1000:8.2f}ms/request")
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /data filtering')
+    parser.add_argument('--runs', type=int, default=5000, help='number of synthetic runs')
+    parser.add_argument('--rows-per-run', type=int, default=200, help='query result rows per run')
+    parser.add_argument('--repeat', type=int, default=10, help='requests per scenario')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='tsbs_bench_filters_')
+    try:
+        data_path = os.path.join(work_dir, 'data')
+        os.makedirs(data_path)
+        loader = data_loader.TSBSDataLoader(data_path, cache_dir=os.path.join(work_dir, 'cache'),
+                                            memory_budget_mb=1e6, reconcile_interval=0)
+        loader.stop_file_monitor()
+        start = time.perf_counter()
+        loader._commit_runs(make_staged(args.runs, args.rows_per_run))
+        snapshot = loader.get_snapshot()
+        snapshot.results
+        print(f"Dataset: {len(snapshot.results)} rows, {len(snapshot.runs)} runs "
+              f"(built in {time.perf_counter() - start:.1f}s)")
+        start = time.perf_counter()
+        snapshot.filter_index
+        print(f"Filter index built in {(time.perf_counter() - start) * 1000:.1f}ms\n")
+
+        scenarios = {
+            'branch + worker': {'branches': ['master', 'dev'], 'workers': ['1', '8']},
+            'query types': {'query_types': QUERY_TYPES[:5]},
+            'all dimensions': {'branches': ['master'], 'scales': ['1000'], 'clusters': ['3'],
+                               'execution_types': ['query'], 'query_types': QUERY_TYPES[:10],
+                               'workers': ['4', '8', '16']},
+            'date range + branch': {'start_date': '2025-03-01', 'end_date': '2025-05-31', 'branches': ['dev']},
+        }
+        for name, filters in scenarios.items():
+            print(name)
+            before, expected = bench('boolean masks', lambda: mask_request(loader, filters), args.repeat)
+            after, actual = bench('filter index', lambda: loader.get_filtered_data(filters), args.repeat)
+            pd.testing.assert_frame_equal(actual, expected)
+            print(f"  {len(actual)} rows, speedup {before / after:.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+目录名解析和导入日志扫描的微基准测试
+Usage: python scripts/benchmark_parsing.py [--dirs 50000] [--log-mb 8] [--logs 4]
+
+对比逐次编译正则+strptime的原始解析与预编译+缓存的解析，
+以及逐行正则搜索日志与从尾部反向查找的日志扫描。
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+
+
+def legacy_parse_directory_name(dir_name):
+    """原始实现：每次调用都编译正则并使用strptime"""
+    pattern = r'(\d{4})_(\d{2})(\d{2})_(\d{6})_(.*?)_scale(\d+)_cluster(\d+)_([a-zA-Z]+?\d*)_([a-zA-Z]+)_(wal\d+)_replica(\d+)_dop(\d+)'
+    match = re.match(pattern, dir_name)
+    if not match:
+        return None
+    return {
+        'year': int(match.group(1)),
+        'month': int(match.group(2)),
+        'day': int(match.group(3)),
+        'time': match.group(4),
+        'branch': match.group(5),
+        'scale': int(match.group(6)),
+        'cluster': int(match.group(7)),
+        'test_type': match.group(8),
+        'phase': match.group(9),
+        'wal': match.group(10),
+        'replica': int(match.group(11)),
+        'dop': int(match.group(12)),
+        'dir_name': dir_name,
+        'datetime': datetime.strptime(
+            f"{match.group(1)}{match.group(2)}{match.group(3)}_{match.group(4)}",
+            '%Y%m%d_%H%M%S'
+        )
+    }
+
+
+def legacy_scan_log(log_path):
+    """原始实现：逐行解码并执行re.search"""
+    with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            m = re.search(r'actually rate ([\d.]+) rows/sec without ddl time', line)
+            if m:
+                return float(m.group(1))
+    return None
+
+
+def make_dir_names(count):
+    random.seed(42)
+    names = []
+    for i in range(count):
+        names.append(
+            f"2025_{random.randint(1, 12):02d}{random.randint(1, 28):02d}_{random.randint(0, 23):02d}{i % 60:02d}15_"
+            f"{random.choice(['master', 'dev', 'release'])}_scale{random.choice([100, 1000, 4000])}_"
+            f"cluster{random.choice([1, 3])}_cpu_{random.choice(['insert', 'query'])}_wal1_replica1_dop4"
+        )
+    return names
+
+
+def make_logs(log_dir, count, size_mb):
+    paths = []
+    line = 'INFO 2025-06-12 14:30:15 loaded batch of 10000 rows into table cpu, elapsed 12ms\n'
+    repeat = size_mb * 1024 * 1024 // len(line)
+    for i in range(count):
+        path = os.path.join(log_dir, f'load_{i}.log')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(line * repeat)
+            f.write(f'loaded 1000000 rows, actually rate {1500000 + i}.5 rows/sec without ddl time\n')
+            f.write('summary done\n')
+        paths.append(path)
+    return paths
+
+
+def bench(label, func, items, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40s} {elapsed:8.3f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark directory name parsing and log scanning')
+    parser.add_argument('--dirs', type=int, default=50000, help='number of synthetic directory names')
+    parser.add_argument('--log-mb', type=int, default=8, help='size of each synthetic log in MB')
+    parser.add_argument('--logs', type=int, default=4, help='number of synthetic logs')
+    args = parser.parse_args()
+
+    names = make_dir_names(args.dirs)
+    print(f"Directory names: {len(names)}")
+    legacy = bench('legacy parse_directory_name', legacy_parse_directory_name, names)
+    data_loader._parse_directory_name_cached.cache_clear()
+    cold = bench('parse_directory_name (cold cache)', data_loader.parse_directory_name, names)
+    warm = bench('parse_directory_name (warm cache)', data_loader.parse_directory_name, names)
+    print(f"speedup: cold {legacy / cold:.1f}x, warm {legacy / warm:.1f}x")
+
+    for name in names[:1000]:
+        assert data_loader.parse_directory_name(name) == legacy_parse_directory_name(name)
+
+    log_dir = tempfile.mkdtemp(prefix='tsbs_bench_logs_')
+    try:
+        paths = make_logs(log_dir, args.logs, args.log_mb)
+        print(f"\nLogs: {len(paths)} x {args.log_mb}MB")
+        legacy = bench('legacy line-by-line scan', legacy_scan_log, paths)
+        tail = bench('tail-first mmap scan', data_loader.scan_log_for_import_speed, paths)
+        print(f"speedup: {legacy / tail:.1f}x")
+
+        for path in paths:
+            assert data_loader.scan_log_for_import_speed(path) == legacy_scan_log(path)
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
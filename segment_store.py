@@ -0,0 +1,515 @@
+"""
+TSBS 数据缓存的分段存储
+
+每次保存只把新增目录的数据写成一个不可变的段（runs维度表和results事实表各一个文件），
+并由清单记录当前有效的段；删除或刷新目录时只在清单中为旧段记录墓碑，不重写已有数据。
+清单由检查点文件(manifest.json)和追加写入的清单日志(manifest.log)组成：每次保存只在日志末尾追加一条记录
+（本批的段、墓碑和目录指纹），日志记录数达到上限、合并或整体重写时才写入新的检查点并清空日志。
+段数或墓碑行数过多时在后台合并(compaction)成一个新段。
+多个加载器可以共用同一个缓存目录：清单的读写和段文件的删除都在缓存目录的文件锁内进行，
+每次操作前先同步其他加载器写入的检查点和日志记录；各加载器独立分配run_id，读取时按段重新编号。
+"""
+
+import os
+import json
+import pickle
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    # pyarrow为可选依赖：可用时使用Arrow IPC(Feather V2)列式缓存并通过内存映射加载
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    # 文件锁只在POSIX系统上可用，其他系统上只在进程内加锁
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def atomic_write(path, write_func):
+    """先写入同目录下的临时文件再重命名，保证进程中途崩溃时不会留下损坏的缓存文件"""
+    dir_name = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=dir_name)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_func(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _file_stamp(path):
+    """文件版本：(mtime_ns, 大小, inode)，文件不存在时返回None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def write_frame(df, path):
+    """以列式格式原子写入DataFrame（无pyarrow时退化为pickle）"""
+    if pa is not None:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+
+        def write_ipc(f):
+            # 不压缩，便于加载时直接内存映射
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+
+        atomic_write(path, write_ipc)
+    else:
+        atomic_write(path, lambda f: pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def read_frame(path):
+    """读取write_frame写入的文件；列式格式通过内存映射读取，数值列尽量零拷贝"""
+    if pa is not None:
+        source = pa.memory_map(path, 'r')
+        table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(split_blocks=True)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def unify_categories(frames):
+    """让各DataFrame中同名的分类列共用同一份字典（新类别追加在末尾），保证合并后仍为分类类型"""
+    columns = set()
+    for df in frames:
+        columns.update(col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype))
+
+    for col in columns:
+        shared = None
+        for df in frames:
+            if col not in df.columns:
+                continue
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                categories = df[col].cat.categories
+            else:
+                categories = pd.Index(df[col].dropna().unique())
+            if shared is None:
+                shared = categories
+            elif not categories.equals(shared):
+                shared = shared.append(categories[~categories.isin(shared)])
+
+        for df in frames:
+            if col not in df.columns:
+                continue
+            column = df[col]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                categories = column.cat.categories
+                if categories.equals(shared):
+                    continue
+                if shared[:len(categories)].equals(categories):
+                    # 原字典是共享字典的前缀时编码不变，只需追加类别
+                    df[col] = column.cat.add_categories(shared[len(categories):])
+                else:
+                    df[col] = column.cat.set_categories(shared)
+            else:
+                df[col] = pd.Categorical(column, categories=shared)
+    return frames
+
+
+def concat_frames(frames):
+    """合并多个DataFrame，分类列先统一字典（不修改传入的DataFrame）"""
+    frames = [df.copy(deep=False) for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(unify_categories(frames), ignore_index=True)
+
+
+def _renumber_runs(runs: pd.DataFrame, results: pd.DataFrame, first_run_id: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """把一个段的run_id按runs表的行顺序改为first_run_id起的连续值，没有对应run的查询结果行被丢弃"""
+    if runs.empty:
+        return runs, results.iloc[:0]
+    new_ids = np.arange(first_run_id, first_run_id + len(runs), dtype=np.int64)
+    positions = pd.Index(runs['run_id']).get_indexer(results['run_id'])
+    matched = positions >= 0
+    if not matched.all():
+        logging.warning(f"Dropping {int((~matched).sum())} cached records without a matching run")
+        results = results[matched]
+        positions = positions[matched]
+    runs = runs.assign(run_id=new_ids.astype(runs['run_id'].dtype))
+    results = results.assign(run_id=new_ids[positions].astype(results['run_id'].dtype))
+    return runs, results
+
+
+class SegmentStore:
+    """按目录追加写入的分段缓存，清单检查点和清单日志记录有效段和墓碑"""
+
+    MANIFEST_VERSION = 2
+
+    def __init__(self, cache_dir: str, max_segments: int = 64, max_dead_ratio: float = 0.3,
+                 checkpoint_interval: int = 256) -> None:
+        self.cache_dir = cache_dir
+        self.segment_dir = os.path.join(cache_dir, 'segments')
+        self.manifest_file = os.path.join(cache_dir, 'manifest.json')
+        self.log_file = os.path.join(cache_dir, 'manifest.log')
+        self.lock_file = os.path.join(cache_dir, 'manifest.lock')
+        self.max_segments = max_segments  # 段数超过该值时触发合并
+        self.max_dead_ratio = max_dead_ratio  # 墓碑行占比超过该值时触发合并
+        self.checkpoint_interval = checkpoint_interval  # 日志记录数达到该值时写入新的检查点
+        self.segment_ext = 'arrow' if pa is not None else 'pkl'
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd = None
+        self._manifest = self._empty_manifest()
+        self._manifest_stamp = None  # 已读取的检查点文件版本
+        self._log_offset = 0  # 已重放的日志字节数
+        self._log_records = 0  # 日志中的记录数
+
+        os.makedirs(self.segment_dir, exist_ok=True)
+        with self._locked():
+            pass
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {
+            'version': self.MANIFEST_VERSION,
+            'format': self.segment_ext,
+            'next_segment_id': 1,
+            'seq': 0,  # 已包含在检查点中的最后一条日志记录的序号
+            'segments': [],
+            'fingerprints': {},
+            'last_save_time': None
+        }
+
+    @contextmanager
+    def _locked(self):
+        """进程内加锁并持有缓存目录的文件锁，最外层进入时先同步其他加载器写入的清单"""
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1:
+                    if fcntl is not None:
+                        if self._lock_fd is None:
+                            self._lock_fd = open(self.lock_file, 'a+')
+                        fcntl.flock(self._lock_fd.fileno(), fcntl.LOCK_EX)
+                    self._sync()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_fd is not None:
+                    fcntl.flock(self._lock_fd.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """检查点文件变化时重新读取清单，然后重放日志中尚未应用的记录（调用方持有锁）"""
+        stamp = _file_stamp(self.manifest_file)
+        if stamp != self._manifest_stamp:
+            self._manifest = self._empty_manifest()
+            self._log_offset = 0
+            self._log_records = 0
+            self._manifest_stamp = stamp
+            if not self._read_manifest():
+                return
+        elif stamp is None:
+            return
+        self._replay_log()
+
+    def _read_manifest(self) -> bool:
+        """读取检查点文件，格式不匹配或损坏时视为空缓存（不再重放日志）"""
+        if not os.path.exists(self.manifest_file):
+            return False
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != self.MANIFEST_VERSION or manifest.get('format') != self.segment_ext:
+                logging.info("Cache manifest format changed, ignoring existing segments")
+                return False
+            manifest.setdefault('fingerprints', {})
+            manifest.setdefault('seq', 0)
+            self._manifest = manifest
+            return True
+        except Exception as e:
+            logging.error(f"Error reading cache manifest: {str(e)}")
+            return False
+
+    def _replay_log(self) -> None:
+        """从上次读到的位置起应用日志记录；末尾不完整的记录（写入时进程退出）被忽略，下次追加前截断"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except OSError:
+            return
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            self._log_records += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.error("Skipping corrupted cache manifest log record")
+                continue
+            if record['seq'] > self._manifest['seq']:
+                self._apply(record)
+        self._log_offset += end
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """把一条日志记录应用到内存中的清单"""
+        manifest = self._manifest
+        # 刷新的目录和被删除的目录都在旧段上记录墓碑
+        self._mark_dead(record['dead_dirs'], record['removed_rows'])
+        segment = record['segment']
+        if segment is not None:
+            manifest['segments'].append(segment)
+            manifest['next_segment_id'] = max(manifest['next_segment_id'], segment['id'] + 1)
+        for dir_name in record['removed_fingerprints']:
+            manifest['fingerprints'].pop(dir_name, None)
+        manifest['fingerprints'].update(record['fingerprints'])
+        manifest['seq'] = record['seq']
+        manifest['last_save_time'] = record['time']
+
+    def _write_manifest(self) -> None:
+        """写入包含当前全部状态的检查点并清空日志（调用方持有锁）"""
+        self._manifest['last_save_time'] = datetime.now().isoformat()
+        payload = json.dumps(self._manifest).encode('utf-8')
+        atomic_write(self.manifest_file, lambda f: f.write(payload))
+        # 检查点已包含日志中的所有记录（记录序号不大于检查点的seq），清空前进程退出也不会重复应用
+        with open(self.log_file, 'wb'):
+            pass
+        self._manifest_stamp = _file_stamp(self.manifest_file)
+        self._log_offset = 0
+        self._log_records = 0
+
+    def _append_log(self, record: Dict[str, Any]) -> None:
+        """在日志末尾追加一条记录（调用方持有锁，内存中的清单已同步到日志末尾）"""
+        line = json.dumps(record).encode('utf-8') + b'\n'
+        with open(self.log_file, 'ab') as f:
+            # 截掉末尾不完整的记录，避免与新记录拼接成一行
+            f.truncate(self._log_offset)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_offset += len(line)
+        self._log_records += 1
+
+    def _segment_path(self, segment: Dict[str, Any]) -> str:
+        return os.path.join(self.segment_dir, segment['file'])
+
+    def _new_segment(self, runs: pd.DataFrame, results: pd.DataFrame, dir_names: List[str]) -> Dict[str, Any]:
+        """写入一个新的不可变段（runs表和results表两个文件，尚未登记到清单）"""
+        segment_id = self._manifest['next_segment_id']
+        self._manifest['next_segment_id'] = segment_id + 1
+        segment = {
+            'id': segment_id,
+            'file': f'seg-{segment_id:08d}.{self.segment_ext}',
+            'runs_file': f'seg-{segment_id:08d}.runs.{self.segment_ext}',
+            'dirs': sorted(dir_names),
+            'rows': int(len(results)),
+            'dead': [],
+            'dead_rows': 0
+        }
+        write_frame(runs.reset_index(drop=True), os.path.join(self.segment_dir, segment['runs_file']))
+        write_frame(results.reset_index(drop=True), self._segment_path(segment))
+        return segment
+
+    def _read_segment(self, segment: Dict[str, Any]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """读取一个段的runs表和results表，并过滤掉墓碑目录"""
+        runs = read_frame(os.path.join(self.segment_dir, segment['runs_file']))
+        results = read_frame(self._segment_path(segment))
+        if segment['dead']:
+            dead = runs['dir_name'].isin(segment['dead'])
+            results = results[~results['run_id'].isin(runs.loc[dead, 'run_id'])]
+            runs = runs[~dead]
+        return runs, results
+
+    def _read_live(self, segments: List[Dict[str, Any]]) -> Tuple[pd.DataFrame, pd.DataFrame, set]:
+        """
+        读取并合并多个段的有效数据，返回(runs表, results表, 目录集合)
+
+        run_id只在写入它的加载器内唯一（共用缓存目录的加载器各自编号），读取时按段重新编号为从1开始的连续值
+        """
+        runs_frames = []
+        result_frames = []
+        live_dirs = set()
+        next_run_id = 1
+        for segment in segments:
+            runs, results = self._read_segment(segment)
+            runs, results = _renumber_runs(runs, results, next_run_id)
+            next_run_id += len(runs)
+            runs_frames.append(runs)
+            result_frames.append(results)
+            live_dirs.update(set(segment['dirs']) - set(segment['dead']))
+        return concat_frames(runs_frames), concat_frames(result_frames), live_dirs
+
+    def _mark_dead(self, dir_names: Iterable[str], row_counts: Optional[Dict[str, int]] = None) -> int:
+        """在包含这些目录的段上记录墓碑，返回受影响的段数"""
+        dir_names = set(dir_names)
+        touched = 0
+        for segment in self._manifest['segments']:
+            hits = dir_names.intersection(segment['dirs']).difference(segment['dead'])
+            if not hits:
+                continue
+            segment['dead'] = sorted(set(segment['dead']) | hits)
+            # 行数未知时按段内平均行数估算，仅用于判断是否需要合并
+            per_dir = segment['rows'] / max(1, len(segment['dirs']))
+            segment['dead_rows'] += sum((row_counts or {}).get(d, per_dir) for d in hits)
+            touched += 1
+        return touched
+
+    def append(self, runs: pd.DataFrame, results: pd.DataFrame, dir_names: List[str],
+               removed_dirs: Iterable[str] = (),
+               removed_rows: Optional[Dict[str, int]] = None,
+               fingerprints: Optional[Dict[str, Any]] = None) -> None:
+        """
+        追加一批目录的数据并登记删除的目录，开销只与本批数据量相关（清单日志中只追加一条记录）
+
+        Args:
+            runs: 本批新增/刷新目录的runs表（每个目录一行）
+            results: 本批目录的查询结果行（通过run_id关联runs表）
+            dir_names: 本批包含的目录名
+            removed_dirs: 需要记录墓碑的已删除目录
+            removed_rows: 已删除目录的行数（用于统计墓碑行数）
+            fingerprints: 本批目录的文件指纹，用于启动时判断目录是否变化
+        """
+        with self._locked():
+            removed_dirs = set(removed_dirs)
+            segment = None
+            if dir_names and not results.empty:
+                segment = self._new_segment(runs, results, dir_names)
+            record = {
+                'seq': self._manifest['seq'] + 1,
+                'time': datetime.now().isoformat(),
+                'dead_dirs': sorted(set(dir_names) | removed_dirs),
+                'removed_rows': dict(removed_rows or {}),
+                'segment': segment,
+                'removed_fingerprints': sorted(removed_dirs),
+                'fingerprints': dict(fingerprints or {})
+            }
+            if self._manifest_stamp is None or self._log_records >= self.checkpoint_interval:
+                self._apply(record)
+                self._write_manifest()
+            else:
+                self._append_log(record)
+                self._apply(record)
+
+    def rewrite(self, runs: pd.DataFrame, results: pd.DataFrame, dir_names: List[str],
+                fingerprints: Optional[Dict[str, Any]] = None) -> None:
+        """用完整数据集替换所有段（强制重新加载后使用）"""
+        with self._locked():
+            old_segments = self._manifest['segments']
+            self._manifest['segments'] = []
+            self._manifest['fingerprints'] = dict(fingerprints or {})
+            if dir_names and not results.empty:
+                self._manifest['segments'].append(self._new_segment(runs, results, dir_names))
+            self._write_manifest()
+            self._remove_segment_files(old_segments)
+
+    def load(self) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, set]]:
+        """读取所有有效段并过滤墓碑，返回(runs表, results表, 目录集合)；没有可用缓存时返回None"""
+        with self._locked():
+            if not os.path.exists(self.manifest_file):
+                return None
+            self._remove_orphan_files()
+            return self._read_live(self._manifest['segments'])
+
+    def get_fingerprints(self) -> Dict[str, Any]:
+        """获取清单中记录的目录指纹"""
+        with self._locked():
+            return dict(self._manifest['fingerprints'])
+
+    def needs_compaction(self) -> bool:
+        """段数过多或墓碑行占比过高时需要合并"""
+        with self._locked():
+            segments = self._manifest['segments']
+            if len(segments) > self.max_segments:
+                return True
+            total_rows = sum(s['rows'] for s in segments)
+            dead_rows = sum(s['dead_rows'] for s in segments)
+            return total_rows > 0 and dead_rows / total_rows > self.max_dead_ratio
+
+    def compact(self) -> None:
+        """把当前所有有效段合并为一个新段，并删除旧段文件（文件锁内进行，其他加载器不会同时读取这些段）"""
+        with self._locked():
+            segments = list(self._manifest['segments'])
+            if len(segments) <= 1 and not any(s['dead'] for s in segments):
+                return
+
+            runs, merged, live_dirs = self._read_live(segments)
+            self._manifest['segments'] = []
+            if live_dirs and not merged.empty:
+                self._manifest['segments'].append(self._new_segment(runs, merged, sorted(live_dirs)))
+            self._write_manifest()
+            self._remove_segment_files(segments)
+            logging.info(f"Cache compacted: {len(segments)} segments merged, {len(merged)} records kept")
+
+    def _remove_segment_files(self, segments: List[Dict[str, Any]]) -> None:
+        for segment in segments:
+            for fname in (segment['file'], segment['runs_file']):
+                try:
+                    os.remove(os.path.join(self.segment_dir, fname))
+                except OSError:
+                    pass
+
+    def _remove_orphan_files(self) -> None:
+        """删除未登记到清单中的段文件（例如写入段后、更新清单前进程退出留下的文件；调用方持有文件锁）"""
+        live_files = {s['file'] for s in self._manifest['segments']}
+        live_files.update(s['runs_file'] for s in self._manifest['segments'])
+        for fname in os.listdir(self.segment_dir):
+            if fname not in live_files:
+                try:
+                    os.remove(os.path.join(self.segment_dir, fname))
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """删除清单和所有段文件"""
+        with self._locked():
+            for fname in os.listdir(self.segment_dir):
+                try:
+                    os.remove(os.path.join(self.segment_dir, fname))
+                except OSError:
+                    pass
+            for path in (self.manifest_file, self.log_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._manifest = self._empty_manifest()
+            self._manifest_stamp = None
+            self._log_offset = 0
+            self._log_records = 0
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_file)
+
+    def last_modified(self) -> Optional[float]:
+        if not self.exists():
+            return None
+        mtime = os.path.getmtime(self.manifest_file)
+        if os.path.exists(self.log_file):
+            mtime = max(mtime, os.path.getmtime(self.log_file))
+        return mtime
+
+    def get_info(self) -> Dict[str, Any]:
+        """获取分段缓存的统计信息"""
+        with self._locked():
+            segments = self._manifest['segments']
+            size = 0
+            for segment in segments:
+                for fname in (segment['file'], segment['runs_file']):
+                    try:
+                        size += os.path.getsize(os.path.join(self.segment_dir, fname))
+                    except OSError:
+                        pass
+            return {
+                'segment_count': len(segments),
+                'segment_bytes': size,
+                'tombstone_count': sum(len(s['dead']) for s in segments),
+                'dead_rows': int(sum(s['dead_rows'] for s in segments)),
+                'total_rows': int(sum(s['rows'] for s in segments)),
+                'log_records': self._log_records
+            }
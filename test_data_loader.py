@@ -0,0 +1,1110 @@
+#!/usr/bin/env python3
+"""
+TSBSDataLoader 单元测试
+使用临时目录构造TSBS测试结果目录，验证加载、刷新和删除逻辑
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_loader
+from data_loader import TSBSDataLoader
+from ingest_queue import DebouncedIngestQueue
+from segment_store import concat_frames
+
+QUERY_TYPES = ['cpu-max-all-1', 'double-groupby-1', 'lastpoint', 'high-cpu-all']
+
+
+def make_run_dir(base_path, timestamp='2025_0612_143015', branch='master', scale=100,
+                 cluster=1, phase='insert', worker=1, import_speed=1600000.0, offset=0.0):
+    """创建一个TSBS测试结果目录，返回目录路径"""
+    dir_name = f"{timestamp}_{branch}_scale{scale}_cluster{cluster}_cpu_{phase}_wal1_replica1_dop4"
+    dir_path = os.path.join(base_path, dir_name)
+    os.makedirs(os.path.join(dir_path, 'query_result'), exist_ok=True)
+    os.makedirs(os.path.join(dir_path, 'load_result'), exist_ok=True)
+
+    lines = ['Query Type,Worker,Min(ms),Mean(ms),Max(ms),Med(ms),Query Count']
+    for i, query_type in enumerate(QUERY_TYPES):
+        base = 10.0 * (i + 1) + offset
+        lines.append(f"{query_type},{worker},{base - 5:.2f},{base:.2f},{base + 20:.2f},{base - 1:.2f},1000")
+    with open(os.path.join(dir_path, 'query_result', 'TSBS_TEST_RESULT.csv'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    with open(os.path.join(dir_path, 'load_result', 'load.log'), 'w', encoding='utf-8') as f:
+        f.write('loading data...\n')
+        f.write(f'loaded 1000000 rows, actually rate {import_speed} rows/sec without ddl time\n')
+    return dir_path
+
+
+def make_loader(base_path, **kwargs):
+    if not isinstance(base_path, list):
+        base_path = str(base_path)
+    return TSBSDataLoader(base_path, **kwargs)
+
+
+def drain_background(loader):
+    """等待加载器的后台任务（延迟保存、合并）全部完成"""
+    loader._thread_pool.shutdown(wait=True)
+    loader._thread_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tsbs-cache')
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """缓存文件写入临时目录，避免读取或污染真实缓存"""
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(cache_dir))
+    yield
+
+
+def sorted_frame(df):
+    # 分类列按类别顺序排序，不同来源的数据类别顺序可能不同，因此按字符串值排序
+    return df.sort_values(['dir_name', 'query_type'], key=lambda col: col.astype(str)).reset_index(drop=True)
+
+
+def test_load_single_directory_parses_metadata_and_import_speed(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    make_run_dir(str(data_path), import_speed=1234.5)
+
+    loader = make_loader(data_path, ingest_workers=1)
+    df = loader.get_data()
+
+    assert len(df) == len(QUERY_TYPES)
+    assert set(df['query_type']) == set(QUERY_TYPES)
+    assert (df['branch'] == 'master').all()
+    assert (df['phase'] == 'insert').all()
+    assert (df['scale'] == 100).all()
+    assert (df['import_speed'] == 1234.5).all()
+    assert df['mean_ms'].tolist() == [10.0, 20.0, 30.0, 40.0]
+
+
+def test_parallel_ingest_matches_serial(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(30):
+        make_run_dir(str(data_path), timestamp=f'2025_06{i % 28 + 1:02d}_1{i:05d}',
+                     branch=f'branch{i % 3}', worker=i % 4 + 1, offset=i)
+
+    serial = make_loader(data_path, ingest_workers=1).get_data()
+    parallel = make_loader(data_path, ingest_workers=4).get_data()
+
+    assert len(serial) == 30 * len(QUERY_TYPES)
+    pd.testing.assert_frame_equal(sorted_frame(serial), sorted_frame(parallel))
+
+
+def test_default_loader_is_created_on_first_use(tmp_path, monkeypatch):
+    """导入模块时不创建默认加载器（进程池的工作进程重新导入模块时不会各自加载数据）"""
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    make_run_dir(str(data_path))
+    monkeypatch.setenv('TSBS_DATA_ROOTS', str(data_path))
+    monkeypatch.setattr(data_loader, '_default_loader', None)
+
+    loader = data_loader.get_loader()
+    try:
+        assert data_loader.get_loader() is loader
+        assert wait_for(loader.is_ready)
+        assert len(loader.get_data()) == len(QUERY_TYPES)
+    finally:
+        loader.stop_file_monitor()
+
+
+def test_refresh_and_remove_directory(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    first = make_run_dir(str(data_path), timestamp='2025_0612_143015')
+    second = make_run_dir(str(data_path), timestamp='2025_0613_143015')
+
+    loader = make_loader(data_path, ingest_workers=1)
+    assert len(loader.get_data()) == 2 * len(QUERY_TYPES)
+
+    make_run_dir(str(data_path), timestamp='2025_0612_143015', offset=100.0)
+    version = loader.version
+    loader.load_single_directory(first)
+    loader.commit_staged()
+    # 刷新只发布一个快照：旧数据的移除和新数据的加入同时可见
+    assert loader.version == version + 1
+    df = loader.get_data()
+    refreshed = df[df['dir_name'] == os.path.basename(first)]
+    assert len(refreshed) == len(QUERY_TYPES)
+    assert refreshed['mean_ms'].min() == 110.0
+
+    loader.remove_directory_data(second)
+    df = loader.get_data()
+    assert set(df['dir_name']) == {os.path.basename(first)}
+    assert os.path.basename(second) not in loader.known_dirs
+
+
+def test_staged_directories_commit_in_batches(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    loader = make_loader(data_path, ingest_workers=1)
+    loader.commit_batch_size = 3
+    loader.commit_interval = 60
+
+    dirs = [make_run_dir(str(data_path), timestamp=f'2025_0612_14301{i}') for i in range(4)]
+    for dir_path in dirs[:2]:
+        loader.load_single_directory(dir_path)
+    # 未达到批次大小前不合并
+    assert loader.get_data().empty
+
+    loader.load_single_directory(dirs[2])
+    assert len(loader.get_data()) == 3 * len(QUERY_TYPES)
+
+    # 同一目录的重复事件在暂存区中合并
+    loader.load_single_directory(dirs[3])
+    loader.load_single_directory(dirs[3])
+    loader.commit_staged()
+    df = loader.get_data()
+    assert len(df) == 4 * len(QUERY_TYPES)
+    assert df['dir_name'].nunique() == 4
+
+
+def test_fast_csv_path_matches_robust_loader(tmp_path, monkeypatch):
+    dir_path = make_run_dir(str(tmp_path))
+
+    stats = {}
+    fast = data_loader.load_result_directory(dir_path, stats=stats)
+    assert stats == {'csv_fast_path': 1}
+
+    monkeypatch.setattr(data_loader, 'fast_csv_loader', lambda csv_path: None)
+    stats = {}
+    robust = data_loader.load_result_directory(dir_path, stats=stats)
+    assert stats == {'csv_fallback': 1}
+
+    assert fast[0] == robust[0]
+    pd.testing.assert_frame_equal(fast[1], robust[1], check_dtype=False)
+    assert pd.api.types.is_float_dtype(fast[1]['mean_ms'])
+    assert pd.api.types.is_integer_dtype(fast[1]['worker'])
+
+
+def test_fast_csv_path_falls_back_on_bad_values(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    dir_path = make_run_dir(str(data_path))
+    csv_path = os.path.join(dir_path, 'query_result', 'TSBS_TEST_RESULT.csv')
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('broken-query,n/a,1,2,3,4,5\n')
+
+    loader = make_loader(data_path, ingest_workers=1)
+    info = loader.get_cache_info()
+    assert info['csv_fallback_count'] == 1
+    assert info['csv_fast_path_count'] == 0
+    assert len(loader.get_data()) == len(QUERY_TYPES) + 1
+
+
+def test_cache_roundtrip(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(3):
+        make_run_dir(str(data_path), timestamp=f'2025_0612_14301{i}', offset=i)
+
+    loader = make_loader(data_path, ingest_workers=1)
+    # 等待后台保存任务结束后再同步保存一次
+    drain_background(loader)
+    loader.save_cache()
+    assert loader.store.exists()
+    assert not [f for f in os.listdir(loader.store.segment_dir) if f.endswith('.tmp')]
+
+    cached = make_loader(data_path, ingest_workers=1)
+    assert cached.known_dirs == loader.known_dirs
+    pd.testing.assert_frame_equal(sorted_frame(cached.get_data()), sorted_frame(loader.get_data()),
+                                  check_dtype=False)
+
+
+def test_cache_appends_segments_and_tombstones(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    first = make_run_dir(str(data_path), timestamp='2025_0612_143010')
+    second = make_run_dir(str(data_path), timestamp='2025_0612_143011')
+
+    loader = make_loader(data_path, ingest_workers=1)
+    loader.store.max_dead_ratio = 1.0  # 由测试手动触发合并
+    drain_background(loader)
+    loader.save_cache()
+    assert loader.store.get_info()['segment_count'] == 1
+
+    # 新目录只追加一个段，不重写已有段
+    third = make_run_dir(str(data_path), timestamp='2025_0612_143012')
+    loader.load_single_directory(third)
+    loader.commit_staged()
+    drain_background(loader)
+    loader.save_cache()
+    info = loader.store.get_info()
+    assert info['segment_count'] == 2
+    assert info['total_rows'] == 3 * len(QUERY_TYPES)
+
+    # 删除和刷新只在旧段上记录墓碑
+    loader.remove_directory_data(second)
+    make_run_dir(str(data_path), timestamp='2025_0612_143010', offset=50.0)
+    loader.load_single_directory(first)
+    loader.commit_staged()
+    drain_background(loader)
+    loader.save_cache()
+    info = loader.store.get_info()
+    assert info['segment_count'] == 3
+    assert info['tombstone_count'] == 2
+
+    runs, results, dirs = loader.store.load()
+    assert dirs == loader.known_dirs
+    df = data_loader.join_runs(runs, results)
+    pd.testing.assert_frame_equal(sorted_frame(df), sorted_frame(loader.get_data()), check_dtype=False,
+                                  check_categorical=False)
+
+    loader.store.compact()
+    info = loader.store.get_info()
+    assert info['segment_count'] == 1
+    assert info['tombstone_count'] == 0
+    assert len(os.listdir(loader.store.segment_dir)) == 2  # runs表和results表各一个文件
+    runs, results, dirs = loader.store.load()
+    assert dirs == loader.known_dirs
+    df = data_loader.join_runs(runs, results)
+    pd.testing.assert_frame_equal(sorted_frame(df), sorted_frame(loader.get_data()), check_dtype=False,
+                                  check_categorical=False)
+
+
+def test_segment_store_appends_to_manifest_log_and_shares_cache_dir(tmp_path):
+    """保存只在清单日志中追加记录；共用缓存目录的两个存储不会覆盖彼此的段，合并和加载不会删除对方引用的文件"""
+    from segment_store import SegmentStore
+
+    def batch(names, run_id):
+        runs = pd.DataFrame({'run_id': np.arange(run_id, run_id + len(names)), 'dir_name': names})
+        results = pd.DataFrame({'run_id': np.repeat(runs['run_id'].to_numpy(), 2), 'mean_ms': 1.0})
+        return runs, results, list(names)
+
+    cache_dir = str(tmp_path / 'shared')
+    first = SegmentStore(cache_dir, checkpoint_interval=3)
+    first.append(*batch(['a', 'b'], 0), fingerprints={'a': [1], 'b': [2]})
+    checkpoint = open(first.manifest_file, 'rb').read()
+    first.append(*batch(['c'], 2), fingerprints={'c': [3]})
+    # 追加只写日志，检查点不变
+    assert open(first.manifest_file, 'rb').read() == checkpoint
+    assert first.get_info()['log_records'] == 1
+
+    second = SegmentStore(cache_dir, checkpoint_interval=3)
+    assert second.get_fingerprints() == {'a': [1], 'b': [2], 'c': [3]}
+    second.append(*batch(['d'], 3), removed_dirs=['a'], removed_rows={'a': 2}, fingerprints={'d': [4]})
+    first.append(*batch(['b'], 4), fingerprints={'b': [5]})
+    assert first.get_info()['segment_count'] == second.get_info()['segment_count'] == 4
+
+    second.compact()
+    runs, results, dirs = first.load()
+    assert dirs == {'b', 'c', 'd'}
+    assert sorted(runs['dir_name']) == ['b', 'c', 'd'] and len(results) == 6
+    assert first.get_fingerprints() == {'b': [5], 'c': [3], 'd': [4]}
+    assert len(os.listdir(first.segment_dir)) == 2
+
+    # 日志记录数达到上限后写入新的检查点并清空日志
+    for i in range(4):
+        second.append(*batch([f'e{i}'], 10 + i))
+    assert second.get_info()['log_records'] < 3
+    assert first.load()[2] == {'b', 'c', 'd', 'e0', 'e1', 'e2', 'e3'}
+
+
+def test_loaders_sharing_cache_dir_get_unique_run_ids(tmp_path, monkeypatch):
+    """两个加载器各自编号的run写入同一个缓存目录，新加载器读取后run_id唯一；加载失败时加载器保持不变"""
+    cache_dir = str(tmp_path / 'shared')
+    roots = []
+    for r, branch in enumerate(['master', 'dev']):
+        root = tmp_path / f'r{r}'
+        root.mkdir()
+        for i in range(3):
+            make_run_dir(str(root), timestamp=f'2025_0612_14301{i}', branch=branch, offset=r * 10 + i)
+        roots.append(str(root))
+
+    writers = [make_loader(root, ingest_workers=1, cache_dir=cache_dir) for root in roots]
+    for writer in writers:
+        drain_background(writer)
+        writer.save_cache()
+    # 两个加载器都从1开始编号
+    assert set(writers[0].runs['run_id']) == set(writers[1].runs['run_id'])
+
+    loader = make_loader(roots, ingest_workers=1, cache_dir=cache_dir)
+    assert len(loader.known_dirs) == 6
+    assert loader.runs['run_id'].is_unique and len(loader.runs) == 6
+    expected = concat_frames([writer.get_data() for writer in writers])
+    pd.testing.assert_frame_equal(sorted_frame(loader.get_data()), sorted_frame(expected), check_dtype=False)
+    filtered = loader.get_filtered_data({'branches': ['dev']})
+    assert set(filtered['dir_name']) == set(writers[1].runs['dir_name'])
+    assert not loader.get_group_statistics({'branches': ['dev']}).empty
+
+    # 加载中途失败时不替换任何状态
+    runs, known_dirs, version = loader.runs, set(loader.known_dirs), loader.version
+
+    def fail(self, runs, results):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(data_loader.GroupAggregates, 'rebuild', fail)
+    assert not loader.load_cached_data()
+    assert loader.runs is runs and loader.known_dirs == known_dirs and loader.version == version
+    assert len(loader.get_filtered_data({'branches': ['dev']})) == len(filtered)
+
+
+def test_restart_reingests_only_changed_directories(tmp_path, monkeypatch):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    dirs = [make_run_dir(str(data_path), timestamp=f'2025_0612_14301{i}') for i in range(3)]
+
+    loader = make_loader(data_path, ingest_workers=1)
+    drain_background(loader)
+    loader.save_cache()
+
+    # 缓存很旧也不整体失效
+    old_time = 1_000_000_000
+    os.utime(loader.store.manifest_file, (old_time, old_time))
+
+    import shutil
+    shutil.rmtree(dirs[0])
+    make_run_dir(str(data_path), timestamp='2025_0612_143011', offset=7.0)
+    os.utime(os.path.join(dirs[1], 'query_result', 'TSBS_TEST_RESULT.csv'), ns=(1, 1))
+    new_dir = make_run_dir(str(data_path), timestamp='2025_0612_143019')
+
+    loaded = []
+    original = data_loader.load_result_directory
+    monkeypatch.setattr(data_loader, 'load_result_directory',
+                        lambda dir_path, *args, **kwargs: loaded.append(os.path.basename(dir_path))
+                        or original(dir_path, *args, **kwargs))
+
+    restarted = make_loader(data_path, ingest_workers=1)
+    assert sorted(loaded) == sorted(os.path.basename(d) for d in (dirs[1], new_dir))
+
+    df = restarted.get_data()
+    assert restarted.known_dirs == {os.path.basename(d) for d in (dirs[1], dirs[2], new_dir)}
+    assert df[df['dir_name'] == os.path.basename(dirs[1])]['mean_ms'].min() == 17.0
+    assert len(df) == 3 * len(QUERY_TYPES)
+
+
+def test_compact_schema_is_lossless_and_shared(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(3):
+        make_run_dir(str(data_path), timestamp=f'2025_0612_14301{i}', branch=f'branch{i}', offset=i + 0.1)
+
+    loader = make_loader(data_path, ingest_workers=1)
+    loader.commit_batch_size = 1  # 每个目录单独提交，验证字典合并
+    loader.load_single_directory(make_run_dir(str(data_path), timestamp='2025_0612_143019', branch='extra'))
+    # 内存统计直接按runs表和分区计算，不构建宽表
+    info = loader.get_cache_info()
+    assert loader.get_snapshot()._view is None
+    df = loader.get_data()
+    assert info['memory_unoptimized_mb'] * 1024 * 1024 == pytest.approx(data_loader.estimate_unoptimized_bytes(df))
+
+    for col in ['branch', 'phase', 'dir_name', 'query_type']:
+        assert isinstance(df[col].dtype, pd.CategoricalDtype), col
+    assert df['scale'].dtype.itemsize < 8
+    assert df['worker'].dtype.itemsize < 8
+    # 0.1的偏移无法用float32精确表示，保持float64
+    assert df['mean_ms'].dtype == 'float64'
+    assert sorted(df['branch'].unique()) == ['branch0', 'branch1', 'branch2', 'extra']
+    assert df[df['branch'] == 'branch1']['mean_ms'].min() == 11.1
+
+    assert info['memory_saved_mb'] > 0
+    assert info['memory_unoptimized_mb'] > info['memory_mb']
+
+
+def test_runs_table_filters_match_wide_view(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(6):
+        make_run_dir(str(data_path), timestamp=f'2025_06{10 + i}_143015', branch=['master', 'dev'][i % 2],
+                     scale=[100, 1000][i % 3 == 0], cluster=1 + i % 2, worker=[1, 8][i % 2], offset=i)
+
+    loader = make_loader(data_path, ingest_workers=1)
+    # 目录元数据每个目录只保存一行，查询结果中不再重复
+    assert len(loader.runs) == 6
+    assert len(loader.results) == 6 * len(QUERY_TYPES)
+    assert 'branch' not in loader.results.columns
+
+    df = loader.get_data()
+    filters = {'branches': ['master'], 'scales': ['1000'], 'start_date': '2025-06-10',
+               'end_date': '2025-06-14', 'query_types': ['lastpoint', 'high-cpu-all']}
+    expected = df[df['branch'].astype(str).isin(['master']) & df['scale'].isin([1000])
+                  & (df['datetime'] >= pd.Timestamp('2025-06-10'))
+                  & (df['datetime'] <= pd.Timestamp('2025-06-15'))
+                  & df['query_type'].isin(['lastpoint', 'high-cpu-all'])]
+    filtered = loader.get_filtered_data(filters)
+    assert len(filtered) > 0
+    pd.testing.assert_frame_equal(filtered, expected)
+
+    # 无法解析的条件被忽略，与/data接口原有行为一致
+    assert len(loader.get_filtered_data({'workers': ['x']})) == len(df)
+
+
+def test_filters_on_empty_dataset_return_empty_frame(tmp_path):
+    """没有任何run时按条件筛选返回空表（runs表此时还没有分支等列）"""
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    loader = make_loader(data_path, ingest_workers=1)
+    for filters in ({}, {'branches': ['master'], 'scales': ['100'], 'start_date': '2025-06-10'},
+                    {'query_types': ['lastpoint'], 'workers': ['1']}):
+        assert loader.get_filtered_data(filters).empty
+
+
+def test_directory_name_parser_is_memoized_and_returns_copies():
+    name = '2025_0612_143015_master_scale100_cluster3_cpu_insert_wal1_replica2_dop4'
+    meta = data_loader.parse_directory_name(name)
+    assert meta['datetime'] == datetime(2025, 6, 12, 14, 30, 15)
+    assert (meta['scale'], meta['cluster'], meta['replica'], meta['phase']) == (100, 3, 2, 'insert')
+
+    meta['branch'] = 'changed'
+    assert data_loader.parse_directory_name(name)['branch'] == 'master'
+
+    loose = data_loader.parse_directory_name('2025_0612_143015_dev_scale10_cluster1_x-y_dop2')
+    assert loose['phase'] == 'unknown' and loose['dop'] == 2
+    assert data_loader.parse_directory_name('2025_1312_143015_dev_scale10_cluster1_x-y_dop2') is None
+    assert data_loader.parse_directory_name('not_a_run') is None
+
+
+def test_import_speed_log_scan_from_tail(tmp_path):
+    log_path = tmp_path / 'load.log'
+    with open(log_path, 'w', encoding='utf-8') as f:
+        f.write('noise line without rate\n' * 200000)
+        f.write('loaded 1000000 rows, actually rate 1234.5 rows/sec without ddl time\n')
+        f.write('actually rate unknown\n')
+        f.write('done\n')
+    assert data_loader.scan_log_for_import_speed(str(log_path)) == 1234.5
+
+    empty = tmp_path / 'empty.log'
+    empty.write_text('')
+    assert data_loader.scan_log_for_import_speed(str(empty)) is None
+
+    run_dir = make_run_dir(str(tmp_path), import_speed=987.25)
+    assert data_loader.extract_import_speed(run_dir) == 987.25
+
+
+def fast_ingest_queues(loader):
+    """缩短各根目录加载队列的静默期，加快测试"""
+    for queue in loader._ingest_queues.values():
+        queue.quiet_period = 0.2
+        queue.poll_interval = 0.05
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_ingest_queue_coalesces_events_and_batches(tmp_path):
+    batches = []
+    queue = DebouncedIngestQueue(batches.append, quiet_period=0.3, poll_interval=0.05)
+    queue.start()
+    try:
+        dirs = [make_run_dir(str(tmp_path), timestamp=f'2025_0612_14301{i}') for i in range(3)]
+        for _ in range(5):
+            for dir_path in dirs:
+                queue.submit(dir_path)
+        # CSV不存在的目录在静默期后被丢弃
+        queue.submit(str(tmp_path / 'missing'))
+
+        assert wait_for(lambda: queue.pending_count() == 0)
+        assert len(batches) == 1
+        assert sorted(batches[0]) == sorted(dirs)
+        assert queue.stats['coalesced'] == 12
+
+        # 文件仍在写入时等待大小稳定
+        csv_path = os.path.join(dirs[0], 'query_result', 'TSBS_TEST_RESULT.csv')
+        queue.submit(dirs[0])
+        for _ in range(6):
+            time.sleep(0.1)
+            with open(csv_path, 'a', encoding='utf-8') as f:
+                f.write("extra-query,1,1.0,2.0,3.0,2.0,1000\n")
+        assert len(batches) == 1
+        assert wait_for(lambda: len(batches) == 2)
+        assert batches[1] == [dirs[0]]
+    finally:
+        queue.stop(timeout=1)
+
+
+def test_ingest_queue_stats_files_without_holding_the_lock(tmp_path, monkeypatch):
+    """慢速挂载盘上stat阻塞时，submit()和discard()不被阻塞"""
+    batches = []
+    entered = threading.Event()
+    release = threading.Event()
+    original = DebouncedIngestQueue._file_state
+
+    def slow_file_state(dir_path):
+        entered.set()
+        release.wait(5)
+        return original(dir_path)
+
+    monkeypatch.setattr(DebouncedIngestQueue, '_file_state', staticmethod(slow_file_state))
+    queue = DebouncedIngestQueue(batches.append, quiet_period=0.1, poll_interval=0.05)
+    queue.start()
+    try:
+        first = make_run_dir(str(tmp_path), timestamp='2025_0612_143010')
+        second = make_run_dir(str(tmp_path), timestamp='2025_0612_143011')
+        queue.submit(first)
+        assert entered.wait(5)
+        start = time.monotonic()
+        queue.submit(second)
+        queue.submit(first)
+        queue.discard(second)
+        assert time.monotonic() - start < 0.5
+        release.set()
+        assert wait_for(lambda: queue.pending_count() == 0)
+        assert batches == [[first]]
+    finally:
+        release.set()
+        queue.stop(timeout=1)
+
+
+def test_file_monitor_ingests_new_directories_through_queue(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    make_run_dir(str(data_path), timestamp='2025_0612_143010')
+    loader = make_loader(data_path, ingest_workers=1)
+    fast_ingest_queues(loader)
+
+    for i in range(3):
+        make_run_dir(str(data_path), timestamp=f'2025_0612_14302{i}', offset=i)
+    assert wait_for(lambda: len(loader.get_data()) == 4 * len(QUERY_TYPES))
+    assert loader._ingest_queues[str(data_path)].stats['ingested'] >= 3
+
+
+def test_partitioned_store_replaces_and_drops_single_runs(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    dirs = [make_run_dir(str(data_path), timestamp=f'2025_0612_14301{i}', offset=i) for i in range(4)]
+    loader = make_loader(data_path, ingest_workers=1)
+    assert len(loader._partitions) == 4
+    before = len(loader.get_data())
+
+    untouched = {run_id: part for run_id, part in loader._partitions.items()}
+    version = loader.version
+    loader.remove_directory_data(dirs[0])
+    assert loader.version > version
+    assert len(loader._partitions) == 3
+    # 其他目录的分区对象不被复制或重建
+    assert all(loader._partitions[run_id] is untouched[run_id] for run_id in loader._partitions)
+    assert len(loader.get_data()) == before - len(QUERY_TYPES)
+
+    with open(os.path.join(dirs[1], 'query_result', 'TSBS_TEST_RESULT.csv'), 'a', encoding='utf-8') as f:
+        f.write("new-query,1,1.0,2.0,3.0,2.0,1000\n")
+    loader.load_single_directory(dirs[1])
+    loader.commit_staged()
+    df = loader.get_data()
+    assert len(loader._partitions) == 3
+    assert len(df) == 3 * len(QUERY_TYPES) + 1
+    assert isinstance(df['query_type'].dtype, pd.CategoricalDtype)
+    assert sorted(df[df['dir_name'] == os.path.basename(dirs[1])]['query_type'].astype(str)) == \
+        sorted(QUERY_TYPES + ['new-query'])
+
+
+def test_snapshots_are_versioned_and_zero_copy(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    make_run_dir(str(data_path), timestamp='2025_0612_143010')
+    loader = make_loader(data_path, ingest_workers=1)
+
+    snapshot = loader.get_snapshot()
+    df = loader.get_data()
+    assert np.shares_memory(df['mean_ms'].to_numpy(), snapshot.view['mean_ms'].to_numpy())
+
+    # 修改返回值不影响快照
+    df.loc[df.index[0], 'mean_ms'] = -1.0
+    df['extra'] = 1
+    assert (snapshot.view['mean_ms'] > 0).all()
+    assert 'extra' not in loader.get_data().columns
+
+    # 新数据发布为新版本，旧快照保持不变
+    loader.load_single_directory(make_run_dir(str(data_path), timestamp='2025_0612_143011'))
+    loader.commit_staged()
+    assert loader.version > snapshot.version
+    assert len(snapshot.view) == len(QUERY_TYPES)
+    assert len(loader.get_data()) == 2 * len(QUERY_TYPES)
+
+
+def brute_force_facets(df, filters):
+    """直接扫描宽表计算交叉筛选计数，作为分面索引的参照"""
+    columns = {'branches': 'branch', 'query_types': 'query_type', 'scales': 'scale',
+               'clusters': 'cluster', 'execution_types': 'phase', 'workers': 'worker'}
+    masks = {}
+    for key, col in columns.items():
+        if filters.get(key):
+            if col in ('scale', 'cluster', 'worker'):
+                masks[key] = df[col].isin([int(v) for v in filters[key]])
+            else:
+                masks[key] = df[col].astype(str).isin(filters[key])
+    expected = {}
+    for key, col in columns.items():
+        mask = pd.Series(True, index=df.index)
+        for other, other_mask in masks.items():
+            if other != key:
+                mask &= other_mask
+        counts = df[mask][col].astype(str if col in ('branch', 'query_type', 'phase') else int).value_counts()
+        expected[key] = sorted((value, int(count)) for value, count in counts.items())
+    return expected
+
+
+def test_facet_index_matches_scan_and_updates_incrementally(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    dirs = []
+    for i in range(6):
+        dirs.append(make_run_dir(str(data_path), timestamp=f'2025_06{10 + i}_143015', branch=['master', 'dev'][i % 2],
+                                 scale=[100, 1000, 4000][i % 3], cluster=1 + i % 2,
+                                 phase=['insert', 'query'][i // 3], worker=[1, 8][i % 2]))
+    loader = make_loader(data_path, ingest_workers=1)
+
+    df = loader.get_data()
+    options = loader.get_options()
+    assert options['branches'] == ['dev', 'master']
+    assert options['scales'] == [100, 1000, 4000]
+    assert options['query_types'] == sorted(QUERY_TYPES)
+    assert options['execution_types'] == ['insert', 'query']
+
+    for filters in [{}, {'branches': ['master']}, {'branches': ['dev'], 'scales': ['100', '4000']},
+                    {'execution_types': ['query'], 'workers': ['8'], 'query_types': ['lastpoint']}]:
+        crossed = loader.get_options(filters)
+        expected = brute_force_facets(df, filters)
+        for key, pairs in expected.items():
+            assert [(c['value'], c['count']) for c in crossed['counts'][key]] == pairs, (filters, key)
+            assert crossed[key] == [value for value, _ in pairs]
+
+    # 日期范围在runs表上限定run范围
+    crossed = loader.get_options({'start_date': '2025-06-14', 'end_date': '2025-06-20'})
+    assert sum(c['count'] for c in crossed['counts']['branches']) == 2 * len(QUERY_TYPES)
+
+    for i in (1, 3, 5):
+        shutil.rmtree(dirs[i])
+        loader.remove_directory_data(dirs[i])
+    assert loader.get_options()['branches'] == ['master']
+
+    drain_background(loader)
+    loader.save_cache()
+    restarted = make_loader(data_path, ingest_workers=1)
+    assert restarted.get_options() == loader.get_options()
+    assert restarted.get_options({'scales': ['100']}) == loader.get_options({'scales': ['100']})
+
+
+def test_background_load_reports_progress_and_loads_newest_first(tmp_path, monkeypatch):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(5):
+        make_run_dir(str(data_path), timestamp=f'2025_06{10 + i}_143015', offset=i)
+
+    order = []
+    release = threading.Event()
+    original = data_loader.load_result_directory
+
+    def slow_load(dir_path, *args, **kwargs):
+        order.append(os.path.basename(dir_path)[:16])
+        release.wait(5)
+        return original(dir_path, *args, **kwargs)
+
+    monkeypatch.setattr(data_loader, 'load_result_directory', slow_load)
+    loader = make_loader(data_path, ingest_workers=1, background_load=True)
+
+    # 构造函数立即返回，加载进度可查询
+    progress = loader.get_load_progress()
+    assert not progress['ready']
+    assert progress['state'] == 'loading'
+    release.set()
+
+    assert loader.wait_until_ready(10)
+    progress = loader.get_load_progress()
+    assert progress['ready'] and progress['state'] == 'ready'
+    assert progress['dirs_done'] == progress['dirs_total'] == 5
+    assert progress['eta_seconds'] == 0.0
+    assert progress['records_count'] == 5 * len(QUERY_TYPES)
+    assert order == [f'2025_06{10 + i}_143015' for i in reversed(range(5))]
+
+
+def test_memory_budget_spills_oldest_runs_to_cold_partitions(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(6):
+        make_run_dir(str(data_path), timestamp=f'2025_0{3 + i % 3}{10 + i}_143015', branch=['master', 'dev'][i % 2],
+                     worker=[1, 8][i % 2], offset=i)
+
+    reference = make_loader(data_path, ingest_workers=1)
+    one_run = data_loader.frame_nbytes(next(iter(reference._partitions.values())))
+    loader = make_loader(data_path, ingest_workers=1, cache_dir=str(tmp_path / 'cold-cache'),
+                         memory_budget_mb=2.5 * one_run / 1024 / 1024)
+
+    # 超出预算的run按时间从早到晚溢写，内存中只保留较新的run
+    info = loader.get_cache_info()
+    assert info['cold_runs'] > 0 and info['cold_files'] > 0
+    assert len(loader._partitions) + info['cold_runs'] == 6
+    assert loader._hot_bytes <= loader.memory_budget_mb * 1024 * 1024
+    runs = loader.runs.set_index('run_id')['datetime']
+    cold_times = runs[list(loader._snapshot.cold)]
+    hot_times = runs[list(loader._partitions)]
+    assert cold_times.max() < hot_times.min()
+    assert info['records_count'] == 6 * len(QUERY_TYPES)
+
+    # 查询涉及冷数据时按需读取，结果与全部在内存中时一致
+    pd.testing.assert_frame_equal(sorted_frame(loader.get_data()), sorted_frame(reference.get_data()),
+                                  check_categorical=False)
+    for filters in ({'start_date': '2025-03-01', 'end_date': '2025-03-31'},
+                    {'branches': ['dev'], 'query_types': ['lastpoint']},
+                    {'start_date': '2025-05-01', 'workers': ['1']}):
+        pd.testing.assert_frame_equal(sorted_frame(loader.get_filtered_data(filters)),
+                                      sorted_frame(reference.get_filtered_data(filters)),
+                                      check_categorical=False)
+
+    # 删除冷数据中的目录
+    cold_dir = loader.runs.set_index('run_id').loc[next(iter(loader._snapshot.cold)), 'dir_name']
+    loader.remove_directory_data(str(data_path / cold_dir))
+    assert cold_dir not in set(loader.get_data()['dir_name'].astype(str))
+    assert loader._snapshot.record_count == 5 * len(QUERY_TYPES)
+    loader.stop_file_monitor()
+    reference.stop_file_monitor()
+
+
+def test_targeted_watch_mode_watches_only_pending_runs(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    make_run_dir(str(data_path), timestamp='2025_0612_143010')
+    # 启动时还没有结果的run目录（测试正在运行）
+    pending = data_path / '2025_0612_143020_master_scale100_cluster1_cpu_insert_wal1_replica1_dop4'
+    pending.mkdir()
+    loader = make_loader(data_path, ingest_workers=1, watch_mode='targeted')
+    fast_ingest_queues(loader)
+
+    # 已提交的run不占用watch：顶层目录一个，未提交的run一个
+    info = loader.get_watch_info()
+    assert info['mode'] == 'targeted' and info['running']
+    assert info['pending_runs'] == 1 and info['active_watches'] == 2
+
+    # query_result出现后改为监控query_result，CSV提交后移除临时watch
+    (pending / 'query_result').mkdir()
+    time.sleep(0.3)
+    make_run_dir(str(data_path), timestamp='2025_0612_143020', offset=1)
+    make_run_dir(str(data_path), timestamp='2025_0612_143030', offset=2)
+    assert wait_for(lambda: len(loader.get_data()) == 3 * len(QUERY_TYPES))
+    assert wait_for(lambda: loader.get_watch_info()['active_watches'] == 1)
+    assert loader.get_watch_info()['pending_runs'] == 0
+
+    # 删除run目录由顶层watch发现
+    shutil.rmtree(data_path / pending.name)
+    assert wait_for(lambda: len(loader.get_data()) == 2 * len(QUERY_TYPES))
+    loader.stop_file_monitor()
+    assert not loader.get_watch_info()['running']
+
+
+def test_reconciler_picks_up_missed_directories(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(3):
+        make_run_dir(str(data_path), timestamp=f'2025_0612_14301{i}', offset=i)
+    loader = make_loader(data_path, ingest_workers=1, reconcile_interval=0)
+    # 模拟事件丢失：停止observer，只保留加载队列
+    for observer in loader._observers.values():
+        observer.stop()
+        observer.join()
+    fast_ingest_queues(loader)
+
+    # 第一次对账只记录基线
+    assert loader.reconcile_once() == {'new': 0, 'changed': 0, 'removed': 0}
+
+    new_dir = make_run_dir(str(data_path), timestamp='2025_0612_143020', offset=5)
+    removed_dir = next(path for path in data_path.iterdir() if path.name.startswith('2025_0612_143010'))
+    shutil.rmtree(removed_dir)
+    changed_dir = make_run_dir(str(data_path), timestamp='2025_0612_143011')
+    shutil.rmtree(changed_dir)
+    time.sleep(0.01)
+    make_run_dir(str(data_path), timestamp='2025_0612_143011', offset=7)
+
+    assert loader.reconcile_once() == {'new': 1, 'changed': 1, 'removed': 1}
+    assert loader.reconcile_stats['sweeps'] == 2
+    assert loader.reconcile_stats['last_sweep_seconds'] is not None
+
+    def loaded():
+        df = loader.get_data()
+        means = df.groupby(df['dir_name'].astype(str))['mean_ms'].min()
+        return (len(df) == 3 * len(QUERY_TYPES) and removed_dir.name not in means.index
+                and means.get(os.path.basename(changed_dir)) == 17.0
+                and means.get(os.path.basename(new_dir)) == 15.0)
+    assert wait_for(loaded)
+
+    # 没有变化时不重复提交
+    assert loader.reconcile_once() == {'new': 0, 'changed': 0, 'removed': 0}
+    loader.stop_file_monitor()
+
+
+def test_multiple_roots_are_loaded_watched_and_reported_independently(tmp_path):
+    roots = [tmp_path / 'disk1', tmp_path / 'disk2']
+    for root in roots:
+        root.mkdir()
+    make_run_dir(str(roots[0]), timestamp='2025_0612_143010')
+    make_run_dir(str(roots[1]), timestamp='2025_0612_143020', branch='dev', offset=1)
+    loader = make_loader([str(root) for root in roots], ingest_workers=1, reconcile_interval=0)
+    fast_ingest_queues(loader)
+
+    df = loader.get_data()
+    assert set(df['branch'].astype(str)) == {'master', 'dev'}
+    assert len(loader.get_watch_info()['roots']) == 2
+    assert all(root['running'] for root in loader.get_watch_info()['roots'])
+
+    # 每个根目录有各自的加载队列和工作线程
+    make_run_dir(str(roots[1]), timestamp='2025_0612_143030', offset=2)
+    assert wait_for(lambda: len(loader.get_data()) == 3 * len(QUERY_TYPES))
+    assert loader._ingest_queues[str(roots[1])].stats['ingested'] == 1
+    assert loader._ingest_queues[str(roots[0])].stats['ingested'] == 0
+
+    report = {entry['root']: entry for entry in loader.get_ingest_report()['roots']}
+    assert report[str(roots[0])]['runs'] == 1 and report[str(roots[1])]['runs'] == 2
+    assert report[str(roots[1])]['dirs_loaded'] == 2
+    assert report[str(roots[1])]['rows_loaded'] == 2 * len(QUERY_TYPES)
+    assert report[str(roots[1])]['dirs_per_second'] > 0
+
+    # 对账只移除本根目录中已删除的run（停止observer模拟事件丢失）
+    for observer in loader._observers.values():
+        observer.stop()
+        observer.join()
+    removed_dir = next(roots[0].iterdir())
+    shutil.rmtree(removed_dir)
+    assert loader.reconcile_once(str(roots[1]))['removed'] == 0
+    assert loader.reconcile_once(str(roots[0]))['removed'] == 1
+    assert removed_dir.name not in set(loader.get_data()['dir_name'].astype(str))
+    assert len(loader.get_data()) == 2 * len(QUERY_TYPES)
+    loader.stop_file_monitor()
+
+
+def test_date_filters_use_time_ordered_row_ranges(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    timestamps = ['2025_0131_235959', '2025_0201_000000', '2025_0215_120000', '2025_0301_000000',
+                  '2025_0302_000000', '2025_0105_080000', '2025_0228_230000']
+    for i, timestamp in enumerate(timestamps):
+        make_run_dir(str(data_path), timestamp=timestamp, branch=['master', 'dev'][i % 2], offset=i)
+    loader = make_loader(data_path, ingest_workers=1)
+
+    # results中的分区按run时间排序
+    snapshot = loader.get_snapshot()
+    df = loader.get_data()
+    assert df['datetime'].is_monotonic_increasing
+    assert snapshot.row_range() == (0, len(snapshot.results))
+
+    for start, end in [('2025-02-01', '2025-02-28'), ('2025-01-31', None), (None, '2025-01-31'),
+                       ('2025-03-02', '2025-03-02'), ('2025-04-01', '2025-05-01'), ('2025-02-10', '2025-02-01'),
+                       ('bad', '2025-02-15')]:
+        filters = {'start_date': start, 'end_date': end, 'branches': ['master']}
+        mask = df['branch'].astype(str) == 'master'
+        if start and start != 'bad':
+            mask &= df['datetime'] >= pd.Timestamp(start)
+        if end:
+            mask &= df['datetime'] <= pd.Timestamp(end) + pd.Timedelta(days=1)
+        filtered = loader.get_filtered_data(filters)
+        if not mask.any():
+            assert filtered.empty
+            continue
+        pd.testing.assert_frame_equal(filtered, df[mask])
+
+
+def test_filter_index_matches_boolean_masks(tmp_path):
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    for i in range(12):
+        make_run_dir(str(data_path), timestamp=f'2025_0{1 + i % 4}{10 + i}_143015', branch=['master', 'dev', 'rel'][i % 3],
+                     scale=[100, 1000][i % 2], cluster=1 + i % 3, phase=['insert', 'query'][i % 4 // 2],
+                     worker=[1, 8, 16][i % 3], offset=i)
+    loader = make_loader(data_path, ingest_workers=1)
+    df = loader.get_data()
+
+    rng = np.random.default_rng(3)
+    options = {'branches': ['master', 'dev', 'rel', 'none'], 'scales': ['100', '1000'], 'clusters': ['1', '2', '3'],
+               'execution_types': ['insert', 'query'], 'query_types': QUERY_TYPES + ['missing'],
+               'workers': ['1', '8', '16', 'x']}
+    for _ in range(60):
+        filters = {key: list(rng.choice(values, size=rng.integers(1, 3), replace=False))
+                   for key, values in options.items() if rng.random() < 0.4}
+        if rng.random() < 0.3:
+            filters['start_date'] = '2025-02-01'
+        mask = np.ones(len(df), dtype=bool)
+        for key, col in (('branches', 'branch'), ('execution_types', 'phase'), ('query_types', 'query_type')):
+            if key in filters:
+                mask &= df[col].astype(str).isin(filters[key]).to_numpy()
+        for key, col in (('scales', 'scale'), ('clusters', 'cluster'), ('workers', 'worker')):
+            if key in filters and 'x' not in filters[key]:
+                mask &= df[col].isin([int(v) for v in filters[key]]).to_numpy()
+        if 'start_date' in filters:
+            mask &= (df['datetime'] >= pd.Timestamp(filters['start_date'])).to_numpy()
+
+        filtered = loader.get_filtered_data(filters)
+        if not mask.any():
+            assert filtered.empty, filters
+        else:
+            pd.testing.assert_frame_equal(filtered, df[mask], obj=str(filters))
+
+
+def test_result_cache_keys_and_invalidation():
+    """结果缓存：筛选条件规范化、LRU淘汰、数据版本前进后清除旧条目"""
+    from result_cache import ResultCache
+
+    cache = ResultCache(max_entries=2)
+    key = cache.make_key({'branches': ['dev', 'master'], 'metric': 'mean_ms'}, 1, 'b1')
+    assert cache.get(key) is None
+    cache.put(key, b'one')
+    # 键顺序和列表值顺序不影响命中
+    assert cache.get(cache.make_key({'metric': 'mean_ms', 'branches': ['master', 'dev']}, 1, 'b1')) == b'one'
+    # 基准值版本不同则不命中
+    assert cache.get(cache.make_key({'branches': ['dev', 'master'], 'metric': 'mean_ms'}, 1, 'b2')) is None
+
+    cache.put(cache.make_key({'metric': 'max_ms'}, 1, 'b1'), b'two')
+    cache.put(cache.make_key({'metric': 'min_ms'}, 1, 'b1'), b'three')
+    assert cache.get(key) is None  # 最久未使用的条目被淘汰
+
+    # 数据版本前进后旧版本的条目被清除，旧版本的计算结果不再写入
+    assert cache.get(cache.make_key({'metric': 'min_ms'}, 2, 'b1')) is None
+    cache.put(cache.make_key({'metric': 'max_ms'}, 1, 'b1'), b'stale')
+    info = cache.get_info()
+    assert info['entries'] == 0
+    assert info['hits'] == 1 and info['misses'] == 4
+    assert info['evictions'] == 1 and info['invalidations'] == 2
+
+
+def test_grouped_statistics_match_per_group_aggregation():
+    """向量化的分组统计与逐组调用calculate_improved_aggregation的结果一致"""
+    import app
+
+    rng = np.random.default_rng(5)
+    n = 300
+    df = pd.DataFrame({
+        'branch': pd.Categorical(rng.choice(['master', 'dev'], n)),
+        'scale': rng.choice([100, 1000], n).astype(np.int16),
+        'cluster': rng.choice([1, 3], n).astype(np.int8),
+        'worker': rng.choice([1, 8], n).astype(np.int8),
+        'phase': pd.Categorical(rng.choice(['insert', 'query'], n)),
+        # 'Lastpoint'与'lastpoint'转换后的metric key相同，以排在最后的分组为准
+        'query_type': pd.Categorical(rng.choice(QUERY_TYPES + ['Lastpoint'], n)),
+        'mean_ms': rng.uniform(1, 100, n).astype(np.float32),
+        'med_ms': rng.uniform(1, 100, n).astype(np.float32),
+        'min_ms': rng.uniform(0, 1, n).astype(np.float32),
+        'max_ms': rng.uniform(100, 200, n).astype(np.float32),
+        'import_speed': rng.uniform(1e5, 2e6, n).astype(np.float32)
+    })
+    # 部分分组只有一条记录（按range/4估算标准差），部分指标缺失
+    df.loc[rng.random(n) < 0.2, 'med_ms'] = np.nan
+    df.loc[rng.random(n) < 0.1, ['min_ms', 'max_ms']] = np.nan
+    single = pd.DataFrame([{'branch': 'master', 'scale': 4000, 'cluster': 1, 'worker': 2, 'phase': 'query',
+                            'query_type': 'high-cpu-all', 'mean_ms': 5.0, 'med_ms': np.nan,
+                            'min_ms': 1.0, 'max_ms': 9.0, 'import_speed': np.nan}])
+    df = pd.concat([df, single.astype(df.dtypes.to_dict())], ignore_index=True)
+
+    expected = {}
+    group_columns = ['branch', 'scale', 'cluster', 'worker', 'phase', 'query_type']
+    ordered = app.sort_categorical_columns(df, group_columns)
+    for (branch, scale, cluster, worker, phase, query_type), group_df in ordered.groupby(group_columns, observed=True):
+        stats = expected.setdefault(f"{scale}_{cluster}_{phase}_{worker}", {})
+        stats[query_type.lower()] = app.calculate_improved_aggregation(group_df)
+        if group_df['import_speed'].notna().any():
+            stats['import_speed'] = float(group_df['import_speed'].mean())
+
+    actual = app.calculate_grouped_statistics(df)
+    assert list(actual) == list(expected)
+    for stats_key, stats in expected.items():
+        assert list(actual[stats_key]) == list(stats)
+        for metric_key, values in stats.items():
+            assert actual[stats_key][metric_key] == pytest.approx(values, rel=1e-6), (stats_key, metric_key)
+    assert actual['4000_1_query_2']['high-cpu-all'] == {'mean_ms': 5.0, 'med_ms': 5.0, 'std_ms': 2.0,
+                                                         'range_ms': 8.0, 'min_ms': 1.0, 'max_ms': 9.0}
+
+
+def test_scoring_is_computed_per_group_and_attached_to_rows():
+    """评分按(统计键, 查询类型)分组计算一次后展开到各行，保留原索引，没有基准值的行为空"""
+    import app
+
+    table = pd.DataFrame({
+        'scale': np.array([100, 100, 100, 1000], dtype=np.int16),
+        'cluster': np.array([1, 1, 1, 1], dtype=np.int8),
+        'phase': pd.Categorical(['query'] * 4),
+        'worker': np.array([8, 8, 8, 8], dtype=np.int8),
+        'query_type': pd.Categorical(['lastpoint', 'lastpoint', 'High_CPU all', 'lastpoint']),
+        'mean_ms': np.array([10.0, 12.0, 30.0, 50.0], dtype=np.float32),
+        'med_ms': np.array([9.0, 11.0, 29.0, 49.0], dtype=np.float32),
+        'min_ms': np.array([5.0, 6.0, 20.0, 40.0], dtype=np.float32),
+        'max_ms': np.array([20.0, 22.0, 40.0, 60.0], dtype=np.float32),
+        'import_speed': np.array([1.5e6] * 4, dtype=np.float32)
+    }, index=[30, 10, 20, 40])
+    baseline = {'mean_ms': 11.0, 'med_ms': 10.0, 'std_ms': 1.0, 'range_ms': 16.0}
+    baselines = {'100_1_query_8': {'import_speed': 1.6e6, 'lastpoint': baseline, 'high-cpu-all': 30.0}}
+    grouped_stats = app.calculate_grouped_statistics(table)
+
+    scored = app.add_scoring_to_table_data(table.copy(), grouped_stats, baselines)
+    assert list(scored.index) == [30, 10, 20, 40]
+    expected = app.calculate_comprehensive_score(grouped_stats['100_1_query_8']['lastpoint'], baseline)
+    assert scored.loc[[30, 10], 'query_comprehensive_score'].tolist() == [expected['comprehensive_score']] * 2
+    assert scored.loc[[30, 10], 'query_mean_baseline'].tolist() == [11.0, 11.0]
+    # 数值形式的Master基准值只计算平均延迟百分比
+    assert pd.isna(scored.at[20, 'query_comprehensive_score'])
+    assert scored.at[20, 'mean_ms_baseline_pct'] == round(app.calculate_performance_percentage_reverse(30.0, 30.0), 2)
+    assert scored.loc[[30, 10, 20], 'import_speed_score'].nunique() == 1
+    # 没有基准值的配置不评分
+    assert scored.loc[40, ['import_speed_score', 'query_comprehensive_score', 'std_ms']].isna().all()
+
+
+def test_group_aggregates_match_grouping_filtered_rows(tmp_path):
+    """合并(分组, 日期)聚合桶得到的分组统计与对筛选后的原始行分组聚合一致，刷新和删除run后同步更新"""
+    import app
+
+    data_path = tmp_path / 'data'
+    data_path.mkdir()
+    # 同一天多个run、恰在零点的run（结束日期次日零点包含在内）
+    timestamps = ['2025_0131_235959', '2025_0201_000000', '2025_0201_093000', '2025_0215_120000',
+                  '2025_0215_180000', '2025_0301_000000', '2025_0302_000000', '2025_0105_080000']
+    dirs = [make_run_dir(str(data_path), timestamp=timestamp, branch=['master', 'dev'][i % 2],
+                         scale=[100, 1000][i % 3 == 0], phase=['insert', 'query'][i % 4 == 1],
+                         worker=[1, 8][i % 2], offset=i * 3.7, import_speed=1.2e6 + i * 1e5)
+            for i, timestamp in enumerate(timestamps)]
+    loader = make_loader(data_path, ingest_workers=1)
+
+    rng = np.random.default_rng(11)
+    dates = [None, '2025-01-31', '2025-02-01', '2025-02-15', '2025-02-28', '2025-03-01', 'bad']
+
+    def check():
+        for _ in range(40):
+            filters = {'start_date': rng.choice(dates), 'end_date': rng.choice(dates)}
+            for key, values in (('branches', ['master', 'dev']), ('scales', ['100', '1000']),
+                                ('workers', ['1', '8']), ('query_types', QUERY_TYPES[:2])):
+                if rng.random() < 0.4:
+                    filters[key] = list(rng.choice(values, rng.integers(1, len(values) + 1), replace=False))
+            filtered = loader.get_filtered_data(filters)
+            merged = loader.get_group_statistics(filters)
+            if filtered.empty:
+                assert merged.empty, filters
+                continue
+            expected = app.calculate_grouped_statistics(filtered)
+            actual = app.calculate_grouped_statistics(filtered, merged)
+            assert list(actual) == list(expected), filters
+            for stats_key, stats in expected.items():
+                assert list(actual[stats_key]) == list(stats)
+                for metric_key, values in stats.items():
+                    assert actual[stats_key][metric_key] == pytest.approx(values, rel=1e-9), (filters, metric_key)
+
+    check()
+    # 2月28日的范围只包含3月1日零点的run
+    merged = loader.get_group_statistics({'start_date': '2025-02-28', 'end_date': '2025-02-28'})
+    assert len(merged) == len(QUERY_TYPES)
+    assert set(merged.index.get_level_values('branch')) == {'dev'}
+
+    make_run_dir(str(data_path), timestamp='2025_0215_120000', branch='dev', scale=1000, worker=8, offset=500.0)
+    loader.load_single_directory(dirs[3])
+    loader.commit_staged()
+    shutil.rmtree(dirs[4])
+    loader.remove_directory_data(dirs[4])
+    check()
+    assert loader.get_group_statistics({'start_date': '2025-02-15', 'end_date': '2025-02-15'})['max_ms'].min() > 500
+
+    drain_background(loader)
+    reloaded = make_loader(data_path, ingest_workers=1)
+    pd.testing.assert_frame_equal(reloaded.get_group_statistics({}), loader.get_group_statistics({}))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-q'])
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+评分函数数组版本的单元测试
+用随机生成的实际值/基准值（包含0、负数、NaN、容差边界等特殊值）验证与app.py中标量版本的结果逐个相同
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+import app
+import score_kernels
+
+SPECIAL_VALUES = [0.0, -0.0, 1.0, -3.5, 0.9, 1.1, 100.0, 110.0, 90.0, 1e-9, 1e12, float('nan')]
+
+
+def random_values(rng, n):
+    """随机值中混入特殊值，以及相对基准值恰好落在容差边界附近的值"""
+    values = rng.uniform(-50, 500, n) * rng.choice([1e-3, 1.0, 1e3], n)
+    values = np.round(values, rng.choice([0, 1, 2, 3, 6]))
+    special = rng.random(n) < 0.3
+    values[special] = rng.choice(SPECIAL_VALUES, special.sum())
+    return values
+
+
+def same(expected, actual):
+    """标量版本返回None对应数组版本的NaN"""
+    if expected is None:
+        return math.isnan(actual)
+    if isinstance(expected, float) and math.isnan(expected):
+        return math.isnan(actual)
+    return expected == actual
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_deviation_kernels_match_scalar_versions(seed):
+    rng = np.random.default_rng(seed)
+    baseline = random_values(rng, 3000)
+    # 一部分实际值取在基准值的容差边界附近
+    actual = np.where(rng.random(3000) < 0.3, baseline * rng.choice([0.9, 1.1, 1.2, 0.0], 3000), random_values(rng, 3000))
+
+    scores = score_kernels.deviation_scores(actual, baseline)
+    rates = score_kernels.deviation_rates(actual, baseline)
+    import_scores = score_kernels.import_speed_scores(actual, baseline)
+    for i, (a, b) in enumerate(zip(actual.tolist(), baseline.tolist())):
+        assert same(app.calculate_deviation_score(a, b), scores[i]), (a, b)
+        assert same(app.calculate_deviation_rate(a, b), rates[i]), (a, b)
+        assert same(app.calculate_import_speed_score(a, b), import_scores[i]), (a, b)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_comprehensive_scores_match_scalar_version(seed):
+    rng = np.random.default_rng(100 + seed)
+    n = 2000
+    keys = ('mean_ms', 'med_ms', 'std_ms', 'range_ms')
+    baseline = {key: np.abs(random_values(rng, n)) for key in keys}
+    baseline = {key: np.where(np.isnan(values), 0.0, values) for key, values in baseline.items()}
+    actual = {key: np.where(rng.random(n) < 0.5, baseline[key] * rng.uniform(0.8, 1.3, n), np.abs(random_values(rng, n)))
+              for key in keys}
+    # 实际标准差缺失
+    actual['std_ms'][rng.random(n) < 0.2] = np.nan
+
+    result = score_kernels.comprehensive_scores(actual, baseline)
+    for i in range(n):
+        actual_metrics = {key: actual[key][i] for key in keys}
+        if math.isnan(actual_metrics['std_ms']):
+            actual_metrics['std_ms'] = None
+        expected = app.calculate_comprehensive_score(
+            {key: float(value) if value is not None else None for key, value in actual_metrics.items()},
+            {key: float(baseline[key][i]) for key in keys}
+        )
+        assert same(expected['comprehensive_score'], result['comprehensive_score'][i]), i
+        assert expected['is_passed'] == result['is_passed'][i], i
+        for name, value in expected['detail_scores'].items():
+            assert same(value, result[name][i]), (i, name)
+        for name, value in expected['deviation_rates'].items():
+            assert same(value, result[name][i]), (i, name)